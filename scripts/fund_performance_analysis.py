@@ -11,18 +11,59 @@
 
 import pandas as pd
 import numpy as np
-from scipy import stats
 from datetime import datetime
 from pathlib import Path
 import json
 import warnings
 warnings.filterwarnings('ignore')
 
+from funds_core import (
+    DEFAULT_AUM_WEIGHTING,
+    DEFAULT_CONFIDENCE,
+    DEFAULT_PARTIAL_HISTORY,
+    DEFAULT_RESAMPLES,
+    DEFAULT_SEGMENT_KEYS,
+    MIN_PARTIAL_MONTHS,
+    PARTIAL_HISTORY_TREATMENTS,
+    TOP_FRACTION,
+    CsvSink,
+    FundDataset,
+    ResultTable,
+    ReturnPanel,
+    UniverseIndex,
+    aggregate_quantiles,
+    annualize_log_returns,
+    block_bootstrap_returns,
+    block_month_counts,
+    bootstrap_excess_returns,
+    grouped_descending_ranks,
+    last_observed_dates,
+    partial_history_periods,
+    passive_benchmark,
+    peak_memory_mb,
+    percentile_interval,
+    period_annualized_returns,
+    load_fund_attributes,
+    report_memory,
+    report_peak_memory,
+    segment_groups,
+    segment_name,
+    segment_title,
+    select_top_fractions_grouped,
+    stream_period_panel,
+    window_aum_weights,
+    window_risk_metrics,
+    window_significance,
+)
+
 
 class FundPerformanceAnalyzer:
     """ファンドパフォーマンス分析クラス"""
     
-    def __init__(self, base_date: str, data_dir: str = "../data"):
+    def __init__(self, base_date: str, data_dir: str = "../data", analysis_period_months: int = 36,
+                 float32_returns: bool = False, aum_weighting: str = DEFAULT_AUM_WEIGHTING,
+                 segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None, top_fractions=(TOP_FRACTION,),
+                 partial_history: str = DEFAULT_PARTIAL_HISTORY, min_months: int = MIN_PARTIAL_MONTHS):
         """
         初期化
         
@@ -32,38 +73,113 @@ class FundPerformanceAnalyzer:
             基準日（YYYY-MM-DD形式）
         data_dir : str
             データディレクトリパス
+        analysis_period_months : int
+            分析期間（月数）。36以外を指定した場合も出力カラム名
+            （annualized_return_3y 等）は互換性のため変更しません
+        float32_returns : bool
+            月次リターンを float32 で保持するか（精度への影響は funds_core.loader.load_monthly_returns を参照）
+        aum_weighting : str
+            AUM加重のウェイト（funds_core.weighting.AUM_WEIGHTINGS）。'latest' はファンド属性の aum_latest、
+            'start' / 'end' / 'average' は月次データの aum 列の分析期間初月・最終月・平均（年率リターン表に
+            aum_weight 列として付加）
+        segment_keys : sequence of str
+            セグメントのキー列（既定はヘッジ区分。investment_style, management_company,
+            expense_bucket（信託報酬の区分）などの組合せも可）
+        passive_keys : sequence of str, optional
+            パッシブファンドを対応付けるキー列（segment_keys の一部。省略時は segment_keys）
+        top_fractions : sequence of float
+            集計する上位の割合（例: (0.1, 0.25, 0.5)）。上位50％は常に含め、それ以外の割合は
+            summary_statistics.csv の追加行・ランキングの is_top_10 等の列として出力
+        partial_history : str
+            分析期間の途中で設定・償還されたファンドの扱い（funds_core.universe.PARTIAL_HISTORY_TREATMENTS）。
+            'exclude' は分析期間すべてのデータがあるファンドのみ、'available' は期間中に存続しており
+            min_months か月以上のデータがあるファンドをデータのある月数で年率換算、'cash' はデータの
+            ない月をリターン0として分析期間全体で年率換算（年率リターン表に data_months 列を付加。
+            リスク調整後指標は全期間のデータが必要、月ブロックブートストラップではデータのない月をリターン0として扱う）
+        min_months : int
+            'available' / 'cash' で含めるファンドの最低データ月数
         """
+        if partial_history not in PARTIAL_HISTORY_TREATMENTS:
+            raise ValueError(f"途中設定・償還ファンドの扱いは {PARTIAL_HISTORY_TREATMENTS} のいずれかです: {partial_history}")
+        if not all(0 < fraction <= 1 for fraction in top_fractions):
+            raise ValueError(f"上位の割合は 0 より大きく 1 以下である必要があります: {list(top_fractions)}")
         self.base_date = pd.to_datetime(base_date)
         self.data_dir = Path(data_dir)
-        self.analysis_period_months = 36
+        self.analysis_period_months = analysis_period_months
+        self.float32_returns = float32_returns
+        self.aum_weighting = aum_weighting
+        self.weight_col = 'aum_latest' if aum_weighting == 'latest' else 'aum_weight'
+        self.segment_keys = tuple(segment_keys)
+        self.passive_keys = tuple(passive_keys) if passive_keys is not None else None
+        # 上位50％を先頭に、追加の割合は昇順
+        self.top_fractions = (TOP_FRACTION, *sorted(set(top_fractions) - {TOP_FRACTION}))
+        self.partial_history = partial_history
+        self.min_months = min_months
         
         # データ格納用
         self.fund_attributes = None
+        self.universe = None
         self.monthly_returns = None
+        self.return_panel = None
         self.analysis_results = {}
+        self.excluded_funds = None
+        self.outliers = None
+        self.streamed_returns = None
+        
+    def analysis_period(self) -> tuple:
+        """分析期間（開始日, 終了日）：基準日から分析期間分さかのぼる"""
+        end_date = self.base_date
+        start_date = end_date - pd.DateOffset(months=self.analysis_period_months - 1)
+        return start_date, end_date
+    
+    def load_data(self, dataset: FundDataset = None, chunksize: int = None, daily_nav: bool = False):
+        """
+        データファイルの読み込み
         
-    def load_data(self):
-        """データファイルの読み込み"""
+        Parameters:
+        -----------
+        dataset : FundDataset, optional
+            読み込み済みのデータセット。指定した場合はファイルを読み込まずに共有します
+        chunksize : int, optional
+            指定した場合、monthly_returns.csv をこの行数ずつ読み込み、分析期間の
+            フィルタと異常値チェックをチャンクごとに行って、期間内のファンド × 月の
+            リターンだけを保持します（メモリ使用量はファイルの行数によらない）
+        daily_nav : bool
+            monthly_returns.csv の代わりに daily_nav.csv（日次基準価額）を読み込み、
+            月末の基準価額と分配金から月次リターンを計算するか
+            （chunksize は日次データの1チャンクの行数として使用）
+        """
         print("=" * 80)
         print("データ読み込み開始")
         print("=" * 80)
         
-        # ファンド属性データ
-        attr_path = self.data_dir / "fund_attributes.csv"
-        if not attr_path.exists():
-            raise FileNotFoundError(f"ファンド属性データが見つかりません: {attr_path}")
-        
-        self.fund_attributes = pd.read_csv(attr_path)
+        peak_before = peak_memory_mb()
+        if chunksize is not None and not daily_nav:
+            self.fund_attributes = load_fund_attributes(self.data_dir)
+            print(f"✓ ファンド属性データ読み込み完了: {len(self.fund_attributes)} ファンド")
+            
+            start_date, end_date = self.analysis_period()
+            self.streamed_returns = stream_period_panel(self.data_dir, start_date, end_date, chunksize)
+            self.monthly_returns = None
+            print(f"✓ 月次リターンデータ読み込み完了（{chunksize}行ずつ）: {self.streamed_returns.rows_read} レコード"
+                  f"（分析期間内 {self.streamed_returns.n_records} レコード）")
+            report_peak_memory(peak_before)
+            return self
+        
+        # 初回は列指向キャッシュを作成し、以降はキャッシュから読み込む
+        if dataset is None and daily_nav:
+            # 日次基準価額から月次リターンを計算し、以降は月次リターンと同じ経路で分析
+            dataset = FundDataset.load_daily_nav(self.data_dir, chunksize)
+        elif dataset is None:
+            dataset = FundDataset.load(self.data_dir, float32_returns=self.float32_returns)
+        
+        self.fund_attributes = dataset.fund_attributes
         print(f"✓ ファンド属性データ読み込み完了: {len(self.fund_attributes)} ファンド")
         
-        # 月次リターンデータ
-        returns_path = self.data_dir / "monthly_returns.csv"
-        if not returns_path.exists():
-            raise FileNotFoundError(f"月次リターンデータが見つかりません: {returns_path}")
-        
-        self.monthly_returns = pd.read_csv(returns_path)
-        self.monthly_returns['month_end_date'] = pd.to_datetime(self.monthly_returns['month_end_date'])
-        print(f"✓ 月次リターンデータ読み込み完了: {len(self.monthly_returns)} レコード")
+        self.monthly_returns = dataset.monthly_returns
+        source = "（日次基準価額から計算）" if daily_nav else ""
+        print(f"✓ 月次リターンデータ読み込み完了{source}: {len(self.monthly_returns)} レコード")
+        report_memory(self.monthly_returns, peak_before)
         
         return self
     
@@ -73,57 +189,86 @@ class FundPerformanceAnalyzer:
         print("データ品質チェックとクレンジング")
         print("=" * 80)
         
-        # 基準日から36か月前の開始日を計算
-        end_date = self.base_date
-        start_date = end_date - pd.DateOffset(months=self.analysis_period_months - 1)
+        # 基準日から分析期間分さかのぼった開始日を計算
+        start_date, end_date = self.analysis_period()
         
         print(f"分析期間: {start_date.strftime('%Y-%m-%d')} ～ {end_date.strftime('%Y-%m-%d')}")
         
-        # 期間内のリターンデータをフィルタ
-        self.monthly_returns = self.monthly_returns[
-            (self.monthly_returns['month_end_date'] >= start_date) &
-            (self.monthly_returns['month_end_date'] <= end_date)
-        ]
-        
-        # 各ファンドの月次データ数をカウント
-        month_counts = self.monthly_returns.groupby('fund_id').size()
-        
-        # 36か月のデータがあるファンドのみ採用
-        valid_funds = month_counts[month_counts == self.analysis_period_months].index
-        excluded_funds = month_counts[month_counts < self.analysis_period_months].index
-        
-        print(f"\n36か月データ要件:")
+        if self.streamed_returns is not None:
+            # チャンク読み込み時は期間フィルタ・集計済み
+            month_counts = self.streamed_returns.month_counts()
+        else:
+            # 期間内のリターンデータをフィルタ
+            self.monthly_returns = self.monthly_returns[
+                (self.monthly_returns['month_end_date'] >= start_date) &
+                (self.monthly_returns['month_end_date'] <= end_date)
+            ]
+            
+            # 各ファンドの月次データ数をカウント
+            month_counts = self.monthly_returns.groupby('fund_id', observed=True).size()
+        
+        # 設定日・償還日による時点ユニバース（償還日のない償還済みファンドは期間内のデータの最終月で償還）
+        if self.streamed_returns is not None:
+            last_observed = last_observed_dates(self.streamed_returns.to_panel())
+        else:
+            last_observed = self.monthly_returns.groupby('fund_id', observed=True)['month_end_date'].max()
+            last_observed.index = pd.Index(np.asarray(last_observed.index), name='fund_id')
+        self.universe = UniverseIndex.from_attributes(self.fund_attributes, last_observed)
+        print(f"分析期間中に存続したファンド（設定日・償還日）: {self.universe.period_alive_count(start_date, end_date)} 本")
+        
+        # 分析期間すべての月次データがあるファンドを採用
+        # （'available' / 'cash' は期間中に存続し min_months か月以上のデータがあるファンドも採用）
+        alive = self.universe.take(month_counts.index).period_alive(start_date, end_date)
+        valid, _ = partial_history_periods(month_counts.to_numpy(), self.analysis_period_months, alive,
+                                           self.partial_history, self.min_months)
+        valid_funds = month_counts[valid].index
+        excluded_funds = month_counts[~valid].index
+        
+        print(f"\n{self.analysis_period_months}か月データ要件:")
         print(f"  - 条件を満たすファンド: {len(valid_funds)} 本")
+        if self.partial_history != 'exclude':
+            partial = int((valid & (month_counts.to_numpy() < self.analysis_period_months)).sum())
+            print(f"    （うち途中設定・償還で{self.min_months}か月以上のデータがあるファンド: {partial} 本、扱い: {self.partial_history}）")
         print(f"  - 除外されたファンド: {len(excluded_funds)} 本")
         
-        # 除外ファンドリストを保存
+        # 除外ファンドリスト（save_results で保存）
         if len(excluded_funds) > 0:
-            excluded_df = pd.DataFrame({
+            required_months = self.analysis_period_months if self.partial_history == 'exclude' else self.min_months
+            self.excluded_funds = pd.DataFrame({
                 'fund_id': excluded_funds,
                 'data_months': month_counts[excluded_funds],
-                'exclusion_reason': '36か月未満のトラックレコード'
+                'exclusion_reason': np.where(
+                    (self.partial_history == 'exclude') | alive[~valid],
+                    f'{required_months}か月未満のトラックレコード',
+                    '分析期間中に存続していない（設定日・償還日）'
+                )
             })
-            excluded_df.to_csv(self.data_dir.parent / "output" / "excluded_funds_insufficient_data.csv", 
-                             index=False, encoding='utf-8-sig')
         
         # 有効なファンドのみに絞り込み
-        self.monthly_returns = self.monthly_returns[self.monthly_returns['fund_id'].isin(valid_funds)]
         self.fund_attributes = self.fund_attributes[self.fund_attributes['fund_id'].isin(valid_funds)]
         
-        # 異常値チェック（±50%を超えるリターン）
-        outliers = self.monthly_returns[
-            (self.monthly_returns['monthly_return'] > 0.5) | 
-            (self.monthly_returns['monthly_return'] < -0.5)
-        ]
+        if self.streamed_returns is not None:
+            # 異常値はチャンクごとに抽出済み
+            self.return_panel = self.streamed_returns.to_panel(valid_funds)
+            outliers = self.streamed_returns.outliers(valid_funds)
+            record_count = int(month_counts[valid_funds].sum())
+        else:
+            self.monthly_returns = self.monthly_returns[self.monthly_returns['fund_id'].isin(valid_funds)]
+            
+            # 異常値チェック（±50%を超えるリターン）
+            outliers = self.monthly_returns[
+                (self.monthly_returns['monthly_return'] > 0.5) | 
+                (self.monthly_returns['monthly_return'] < -0.5)
+            ]
+            record_count = len(self.monthly_returns)
         
         if len(outliers) > 0:
             print(f"\n⚠ 異常値検出: {len(outliers)} レコード（±50%超）")
-            outliers.to_csv(self.data_dir.parent / "output" / "outliers_detected.csv", 
-                          index=False, encoding='utf-8-sig')
+            self.outliers = outliers
         
         print(f"\n✓ クレンジング完了")
         print(f"  - 有効ファンド数: {len(self.fund_attributes)}")
-        print(f"  - 有効リターンレコード数: {len(self.monthly_returns)}")
+        print(f"  - 有効リターンレコード数: {record_count}")
         
         return self
     
@@ -133,84 +278,134 @@ class FundPerformanceAnalyzer:
         print("3年年率リターン（CAGR）計算")
         print("=" * 80)
         
-        results = []
-        
-        for fund_id in self.fund_attributes['fund_id']:
-            fund_returns = self.monthly_returns[
-                self.monthly_returns['fund_id'] == fund_id
-            ].sort_values('month_end_date')
-            
-            if len(fund_returns) != self.analysis_period_months:
-                continue
-            
-            # 幾何平均による年率リターン計算
-            # R_ann = (∏(1 + r_t))^(12/36) - 1
-            monthly_returns = fund_returns['monthly_return'].values
-            cumulative_return = np.prod(1 + monthly_returns)
-            annualized_return = cumulative_return ** (12 / self.analysis_period_months) - 1
-            
-            # ファンド属性を取得
-            fund_attr = self.fund_attributes[self.fund_attributes['fund_id'] == fund_id].iloc[0]
-            
-            results.append({
-                'fund_id': fund_id,
-                'fund_name': fund_attr['fund_name'],
-                'fund_type': fund_attr['fund_type'],
-                'currency_hedge': fund_attr['currency_hedge'],
-                'expense_ratio': fund_attr['expense_ratio'],
-                'aum_latest': fund_attr['aum_latest'],
-                'annualized_return_3y': annualized_return,
-                'cumulative_return_3y': cumulative_return - 1
-            })
+        # ファンド × 月のパネルを一度だけ構築し、全ファンドを一括計算
+        # （チャンク読み込み時は validate_and_clean_data で構築済み）
+        if self.streamed_returns is None:
+            self.return_panel = ReturnPanel.from_long(self.monthly_returns)
         
-        self.annualized_returns = pd.DataFrame(results)
+        # 幾何平均による年率リターン計算
+        # R_ann = (∏(1 + r_t))^(12/分析期間月数) - 1
+        if self.partial_history == 'exclude':
+            annualized_return, cumulative_return = period_annualized_returns(
+                self.return_panel, self.analysis_period_months
+            )
+        else:
+            # 途中設定・償還ファンドはデータのある月数（'available'）または分析期間（'cash'）で年率換算
+            start_date, end_date = self.analysis_period()
+            data_months = self.return_panel.observation_counts()
+            alive = self.universe.take(self.return_panel.fund_ids).period_alive(start_date, end_date)
+            included, period_months = partial_history_periods(data_months, self.analysis_period_months, alive,
+                                                              self.partial_history, self.min_months)
+            annualized_return, cumulative_return = annualize_log_returns(self.return_panel.log_return_sums(),
+                                                                         period_months)
+            annualized_return[~included] = np.nan
+            cumulative_return[~included] = np.nan
+        
+        # ファンド属性と対応付け（属性データの並び順を維持）
+        attributes, panel_rows = self.return_panel.align_attributes(self.fund_attributes, self.segment_keys)
+        complete = ~np.isnan(annualized_return[panel_rows])
+        self.annualized_returns = attributes[complete].assign(
+            annualized_return_3y=annualized_return[panel_rows][complete],
+            cumulative_return_3y=cumulative_return[panel_rows][complete]
+        ).reset_index(drop=True)
+        if self.partial_history != 'exclude':
+            self.annualized_returns['data_months'] = data_months[panel_rows][complete]
+        
+        if self.aum_weighting != 'latest':
+            # 分析期間の月末AUMから加重のウェイトを計算（AUMがないファンドは aum_latest）
+            if self.streamed_returns is not None:
+                aum = self.streamed_returns.aum_matrix(self.return_panel.fund_ids)
+            else:
+                aum = self.return_panel.expand_column(self.monthly_returns, 'aum')
+            weights = window_aum_weights(aum[panel_rows], attributes['aum_latest'].to_numpy(dtype=np.float64),
+                                         [0], self.return_panel.n_months, self.aum_weighting)[:, 0]
+            self.annualized_returns['aum_weight'] = weights[complete]
         print(f"✓ {len(self.annualized_returns)} ファンドの年率リターンを計算")
         
         return self
     
+    def calculate_risk_metrics(self, risk_free_rate: float = 0.0):
+        """
+        リスク調整後指標の計算（funds_core.metrics）
+        
+        分析期間の月次リターンから、ボラティリティ・シャープレシオ・ソルティノレシオ・
+        最大ドローダウンと、同じセグメントのパッシブ平均をベンチマークとする
+        トラッキングエラー・インフォメーションレシオ・ベータ・アルファを計算し、
+        年率リターン表に列として付加します。
+        
+        Parameters:
+        -----------
+        risk_free_rate : float
+            無リスク金利（年率）
+        """
+        print("\n" + "=" * 80)
+        print("リスク調整後指標計算")
+        print("=" * 80)
+        
+        panel = self.return_panel
+        rows = panel.fund_ids.get_indexer(self.annualized_returns['fund_id'])
+        values = panel.values[rows]
+        benchmark = passive_benchmark(values, self.annualized_returns, self.segment_keys, self.passive_keys)
+        metrics = window_risk_metrics(values, benchmark, [0], panel.n_months, risk_free_rate)
+        for name, metric in metrics.items():
+            self.annualized_returns[name] = metric[:, 0]
+        
+        print(f"✓ {len(self.annualized_returns)} ファンドのリスク調整後指標を計算（無リスク金利 {risk_free_rate:.2%}）")
+        print(f"  - ベンチマークのないファンド: {int(np.isnan(metrics['beta'][:, 0]).sum())} 本")
+        
+        return self
+    
+    @staticmethod
+    def top_label(top_fraction: float) -> str:
+        """上位の割合の表示名（例: 上位10%）"""
+        return f"上位{top_fraction * 100:g}%"
+    
     def rank_and_segment_funds(self):
-        """ランキングと上位50％の抽出"""
+        """
+        ランキングと上位50％の抽出
+
+        全セグメントの順位（セグメント番号での lexsort）と上位50％（セグメントごとの
+        np.partition）を funds_core.ranking で一括計算し、セグメントごとのランキング表に
+        分けます。上位50％以外の割合（top_fractions）の上位フラグ（is_top_10 等）も
+        同じ partition から求めます。
+        """
         print("\n" + "=" * 80)
         print("ランキングと上位50％抽出")
         print("=" * 80)
         
-        # ヘッジ区分ごとに処理
-        for hedge_status in ['なし', 'あり']:
-            print(f"\n【為替ヘッジ: {hedge_status}】")
-            
-            # アクティブファンドのみ抽出
-            active_funds = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'アクティブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ].copy()
-            
-            if len(active_funds) == 0:
-                print(f"  ⚠ アクティブファンドが存在しません")
-                continue
-            
-            # 降順にソート
-            active_funds = active_funds.sort_values('annualized_return_3y', ascending=False).reset_index(drop=True)
-            active_funds['rank'] = active_funds.index + 1
-            
-            # 上位50％の閾値
-            top_50_count = int(np.ceil(0.5 * len(active_funds)))
-            active_funds['is_top_50'] = active_funds['rank'] <= top_50_count
+        # アクティブ・パッシブ（S&P500連動）ファンドのセグメント番号
+        fund_returns = self.annualized_returns
+        active, passive, passive_of = segment_groups(fund_returns, self.segment_keys, self.passive_keys)
+        returns = fund_returns['annualized_return_3y'].to_numpy(dtype=np.float64)[None, :]
+        selections = dict(zip(self.top_fractions, select_top_fractions_grouped(
+            returns, active.codes, len(active.labels), self.top_fractions
+        )))
+        selection = selections[TOP_FRACTION]
+        ranked = fund_returns.assign(rank=grouped_descending_ranks(returns, active.codes)[0],
+                                     is_top_50=selection.member[0])
+        for top_fraction, other in selections.items():
+            if top_fraction != TOP_FRACTION:
+                ranked[f"is_top_{top_fraction * 100:g}"] = other.member[0]
+        
+        for code, segment in enumerate(active.labels.to_dict('records')):
+            print(f"\n【{segment_title(segment)}】")
+            
+            active_funds = ranked[active.codes == code].sort_values('rank', kind='mergesort').reset_index(drop=True)
+            passive_funds = fund_returns[(passive.codes == passive_of[code]) & (passive_of[code] >= 0)]
+            top_50_count = int(selection.top_count[0, code])
             
             print(f"  - アクティブファンド総数: {len(active_funds)}")
             print(f"  - 上位50％本数: {top_50_count}")
-            print(f"  - 上位50％閾値リターン: {active_funds.iloc[top_50_count - 1]['annualized_return_3y']:.4f}")
-            
-            # パッシブファンド（S&P500連動）
-            passive_funds = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'パッシブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]
-            
+            print(f"  - 上位50％閾値リターン: {selection.threshold[0, code]:.4f}")
+            for top_fraction, other in selections.items():
+                if top_fraction != TOP_FRACTION:
+                    print(f"  - {self.top_label(top_fraction)}: {other.top_count[0, code]} 本"
+                          f"（閾値リターン {other.threshold[0, code]:.4f}）")
             print(f"  - パッシブファンド数: {len(passive_funds)}")
             
             # 結果を保存
-            key = f"hedge_{hedge_status}"
-            self.analysis_results[key] = {
+            self.analysis_results[segment_name(segment)] = {
+                'segment': segment,
                 'active_funds': active_funds,
                 'passive_funds': passive_funds,
                 'top_50_count': top_50_count
@@ -218,77 +413,57 @@ class FundPerformanceAnalyzer:
         
         return self
     
+    def _single_window(self) -> tuple:
+        """分析期間を1ウィンドウとした年率リターン（ファンド数 × 1）と開始月・終了月"""
+        returns = self.annualized_returns['annualized_return_3y'].to_numpy(dtype=np.float64)[:, None]
+        months = self.return_panel.months
+        return returns, [months[0]], [months[-1]]
+    
     def calculate_aggregate_statistics(self):
-        """集計統計量の計算"""
+        """
+        集計統計量の計算（全セグメント・全上位割合を funds_core.aggregation.aggregate_quantiles で一括計算）
+        
+        上位50％以外の割合（top_fractions）は、top_fraction 列の値が異なる追加行として出力します
+        （active_top50_mean, excess_top50 の列はその割合の上位の値）。
+        """
         print("\n" + "=" * 80)
         print("集計統計量計算")
         print("=" * 80)
         
-        summary_results = []
+        returns, start_dates, end_dates = self._single_window()
+        quantiles = aggregate_quantiles(returns, self.annualized_returns, start_dates, end_dates,
+                                        self.top_fractions, weight_col=self.weight_col,
+                                        segment_keys=self.segment_keys, passive_keys=self.passive_keys)
         
-        for hedge_status in ['なし', 'あり']:
-            key = f"hedge_{hedge_status}"
-            
-            if key not in self.analysis_results:
-                continue
-            
-            data = self.analysis_results[key]
-            active_funds = data['active_funds']
-            passive_funds = data['passive_funds']
-            
-            if len(active_funds) == 0 or len(passive_funds) == 0:
+        summary_results = []
+        for segment in quantiles:
+            keys = {key: segment[key] for key in self.segment_keys}
+            top_fraction = segment['top_fraction']
+            
+            for weighting, suffix in (('等金額', 'equal'), ('AUM加重', 'aum')):
+                summary_results.append({
+                    **keys,
+                    'weighting': weighting,
+                    'top_fraction': top_fraction,
+                    'active_all_mean': segment[f'active_all_mean_{suffix}'],
+                    'active_top50_mean': segment[f'active_top_mean_{suffix}'],
+                    'passive_mean': segment[f'passive_mean_{suffix}'],
+                    'excess_all': segment[f'excess_all_{suffix}'],
+                    'excess_top50': segment[f'excess_top_{suffix}']
+                })
+            
+            if top_fraction != TOP_FRACTION:
+                excess_top_equal = segment['excess_top_equal']
+                print(f"    - 超過リターン（{self.top_label(top_fraction)}）: "
+                      f"{excess_top_equal:.4f} ({excess_top_equal*100:.2f}%)")
                 continue
             
-            print(f"\n【為替ヘッジ: {hedge_status}】")
-            
-            # アクティブ全体
-            active_all_equal_weight = active_funds['annualized_return_3y'].mean()
-            active_all_aum_weight = np.average(
-                active_funds['annualized_return_3y'],
-                weights=active_funds['aum_latest']
-            )
-            
-            # アクティブ上位50％
-            top_50_funds = active_funds[active_funds['is_top_50']]
-            active_top50_equal_weight = top_50_funds['annualized_return_3y'].mean()
-            active_top50_aum_weight = np.average(
-                top_50_funds['annualized_return_3y'],
-                weights=top_50_funds['aum_latest']
-            )
-            
-            # パッシブ
-            passive_equal_weight = passive_funds['annualized_return_3y'].mean()
-            passive_aum_weight = np.average(
-                passive_funds['annualized_return_3y'],
-                weights=passive_funds['aum_latest']
-            )
-            
-            # 超過リターン
-            excess_all_equal = active_all_equal_weight - passive_equal_weight
-            excess_all_aum = active_all_aum_weight - passive_aum_weight
-            excess_top50_equal = active_top50_equal_weight - passive_equal_weight
-            excess_top50_aum = active_top50_aum_weight - passive_aum_weight
-            
-            summary_results.append({
-                'currency_hedge': hedge_status,
-                'weighting': '等金額',
-                'active_all_mean': active_all_equal_weight,
-                'active_top50_mean': active_top50_equal_weight,
-                'passive_mean': passive_equal_weight,
-                'excess_all': excess_all_equal,
-                'excess_top50': excess_top50_equal
-            })
-            
-            summary_results.append({
-                'currency_hedge': hedge_status,
-                'weighting': 'AUM加重',
-                'active_all_mean': active_all_aum_weight,
-                'active_top50_mean': active_top50_aum_weight,
-                'passive_mean': passive_aum_weight,
-                'excess_all': excess_all_aum,
-                'excess_top50': excess_top50_aum
-            })
-            
+            print(f"\n【{segment_title(keys)}】")
+            active_all_equal_weight = segment['active_all_mean_equal']
+            active_top50_equal_weight = segment['active_top_mean_equal']
+            passive_equal_weight = segment['passive_mean_equal']
+            excess_all_equal = segment['excess_all_equal']
+            excess_top50_equal = segment['excess_top_equal']
             print(f"  等金額平均:")
             print(f"    - アクティブ全体: {active_all_equal_weight:.4f} ({active_all_equal_weight*100:.2f}%)")
             print(f"    - アクティブ上位50%: {active_top50_equal_weight:.4f} ({active_top50_equal_weight*100:.2f}%)")
@@ -300,144 +475,180 @@ class FundPerformanceAnalyzer:
         
         return self
     
-    def perform_statistical_tests(self):
-        """統計的検定の実行"""
+    def calculate_bootstrap_intervals(self, n_resamples: int = DEFAULT_RESAMPLES, block_length: int = None,
+                                      confidence: float = DEFAULT_CONFIDENCE, seed: int = 0):
+        """
+        超過リターンのブートストラップ信頼区間
+        
+        アクティブ・パッシブそれぞれの中でファンドを復元抽出し（各リサンプルで
+        top_fractions の各割合の上位を選び直す）、summary_statistics の各行（上位50％
+        以外の割合の追加行を含む）に excess_all / excess_top50 のパーセンタイル
+        信頼区間の列を追加します。
+        
+        Parameters:
+        -----------
+        n_resamples : int
+            リサンプル数
+        block_length : int, optional
+            指定した場合、月もブロック長 block_length の循環ブロックブートストラップで
+            抽出し、リサンプルごとに年率リターンを再計算します
+        confidence : float
+            信頼水準
+        seed : int
+            乱数シード（同じシードなら同じ結果）
+        """
         print("\n" + "=" * 80)
-        print("統計的検定")
+        print(f"ブートストラップ信頼区間（{n_resamples}回"
+              f"{f'、月ブロック長{block_length}' if block_length else ''}、{confidence:.0%}）")
         print("=" * 80)
         
-        test_results = []
+        rng = np.random.default_rng(seed)
+        panel = self.return_panel
+        if block_length:
+            # 全セグメント・全ファンドに同じ月系列を適用する
+            month_counts = block_month_counts(rng, panel.n_months, n_resamples, block_length)
+            log_returns = panel.log_returns()
+            panel_index = pd.Index(panel.fund_ids)
         
-        for hedge_status in ['なし', 'あり']:
-            key = f"hedge_{hedge_status}"
-            
-            if key not in self.analysis_results:
-                continue
-            
-            data = self.analysis_results[key]
+        intervals = {}
+        for data in self.analysis_results.values():
             active_funds = data['active_funds']
             passive_funds = data['passive_funds']
             
             if len(active_funds) == 0 or len(passive_funds) == 0:
                 continue
             
-            print(f"\n【為替ヘッジ: {hedge_status}】")
-            
-            # アクティブ全体 vs パッシブ
-            active_all_returns = active_funds['annualized_return_3y'].values
-            passive_returns = passive_funds['annualized_return_3y'].values
-            
-            # t検定
-            t_stat_all, p_value_all = stats.ttest_ind(active_all_returns, passive_returns)
-            
-            # Cohen's d（効果量）
-            pooled_std_all = np.sqrt(
-                ((len(active_all_returns) - 1) * np.var(active_all_returns, ddof=1) +
-                 (len(passive_returns) - 1) * np.var(passive_returns, ddof=1)) /
-                (len(active_all_returns) + len(passive_returns) - 2)
-            )
-            cohens_d_all = (np.mean(active_all_returns) - np.mean(passive_returns)) / pooled_std_all
-            
-            # Mann-Whitney U検定
-            u_stat_all, p_value_mw_all = stats.mannwhitneyu(
-                active_all_returns, passive_returns, alternative='two-sided'
-            )
-            
-            print(f"\n  アクティブ全体 vs パッシブ:")
-            print(f"    - t検定: t={t_stat_all:.4f}, p={p_value_all:.4f}")
-            print(f"    - Cohen's d: {cohens_d_all:.4f}")
-            print(f"    - Mann-Whitney: U={u_stat_all:.2f}, p={p_value_mw_all:.4f}")
-            
-            test_results.append({
-                'currency_hedge': hedge_status,
-                'comparison': 'アクティブ全体 vs パッシブ',
-                't_statistic': t_stat_all,
-                'p_value_ttest': p_value_all,
-                'cohens_d': cohens_d_all,
-                'u_statistic': u_stat_all,
-                'p_value_mannwhitney': p_value_mw_all,
-                'significant_5pct': p_value_all < 0.05
-            })
-            
-            # アクティブ上位50% vs パッシブ
-            top_50_returns = active_funds[active_funds['is_top_50']]['annualized_return_3y'].values
-            
-            t_stat_top50, p_value_top50 = stats.ttest_ind(top_50_returns, passive_returns)
-            
-            pooled_std_top50 = np.sqrt(
-                ((len(top_50_returns) - 1) * np.var(top_50_returns, ddof=1) +
-                 (len(passive_returns) - 1) * np.var(passive_returns, ddof=1)) /
-                (len(top_50_returns) + len(passive_returns) - 2)
+            if block_length:
+                active_returns, passive_returns = (
+                    block_bootstrap_returns(log_returns[panel_index.get_indexer(funds['fund_id'])],
+                                            month_counts, self.analysis_period_months)
+                    for funds in (active_funds, passive_funds)
+                )
+            else:
+                active_returns = active_funds['annualized_return_3y'].values
+                passive_returns = passive_funds['annualized_return_3y'].values
+            
+            samples = bootstrap_excess_returns(
+                active_returns, active_funds[self.weight_col].values,
+                passive_returns, passive_funds[self.weight_col].values,
+                rng, n_resamples, self.top_fractions
             )
-            cohens_d_top50 = (np.mean(top_50_returns) - np.mean(passive_returns)) / pooled_std_top50
             
-            u_stat_top50, p_value_mw_top50 = stats.mannwhitneyu(
-                top_50_returns, passive_returns, alternative='two-sided'
-            )
+            print(f"\n【{segment_title(data['segment'])}】")
+            for top_fraction, fraction_samples in samples.items():
+                for weighting, suffix in (('等金額', 'equal'), ('AUM加重', 'aum')):
+                    row = {}
+                    for column in ('excess_all', 'excess_top50'):
+                        lower, upper = percentile_interval(fraction_samples[f'{column}_{suffix}'], confidence)
+                        row[f'{column}_ci_lower'] = lower
+                        row[f'{column}_ci_upper'] = upper
+                    intervals[(*data['segment'].values(), top_fraction, weighting)] = row
+                    print(f"  {weighting}: 超過リターン（全体）[{row['excess_all_ci_lower']:.4f}, {row['excess_all_ci_upper']:.4f}]"
+                          f"、（{self.top_label(top_fraction)}）[{row['excess_top50_ci_lower']:.4f}, {row['excess_top50_ci_upper']:.4f}]")
+        
+        if len(self.summary_statistics) == 0:
+            print("  ⚠ アクティブ・パッシブの両方を含むセグメントがありません")
+            return self
+        
+        ci_columns = pd.DataFrame([
+            intervals.get(tuple(key), {})
+            for key in self.summary_statistics[[*self.segment_keys, 'top_fraction', 'weighting']].itertuples(index=False)
+        ], index=self.summary_statistics.index)
+        self.summary_statistics = pd.concat([self.summary_statistics, ci_columns], axis=1)
+        
+        return self
+    
+    def perform_statistical_tests(self, permutation_seed: int = 0):
+        """
+        統計的検定の実行（全セグメント・全比較を funds_core.aggregation.window_significance で一括計算）
+        
+        Parameters:
+        -----------
+        permutation_seed : int
+            並べ替え検定（モンテカルロとなる場合）の乱数シード
+        """
+        print("\n" + "=" * 80)
+        print("統計的検定")
+        print("=" * 80)
+        
+        # t検定（Student / Welch）、Cohen's d（効果量）、Mann-Whitney U検定、
+        # 平均差の並べ替え検定（小標本は全組合せの正確検定）
+        returns, start_dates, end_dates = self._single_window()
+        tests = window_significance(returns, self.annualized_returns, start_dates, end_dates,
+                                    seed=permutation_seed, segment_keys=self.segment_keys,
+                                    passive_keys=self.passive_keys)
+        
+        test_results = []
+        for test in tests:
+            keys = {key: test[key] for key in self.segment_keys}
+            if test['comparison'].startswith('アクティブ全体'):
+                print(f"\n【{segment_title(keys)}】")
             
-            print(f"\n  アクティブ上位50% vs パッシブ:")
-            print(f"    - t検定: t={t_stat_top50:.4f}, p={p_value_top50:.4f}")
-            print(f"    - Cohen's d: {cohens_d_top50:.4f}")
-            print(f"    - Mann-Whitney: U={u_stat_top50:.2f}, p={p_value_mw_top50:.4f}")
+            print(f"\n  {test['comparison']}:")
+            print(f"    - t検定: t={test['t_statistic']:.4f}, p={test['p_value_ttest']:.4f}")
+            print(f"    - Cohen's d: {test['cohens_d']:.4f}")
+            print(f"    - Mann-Whitney: U={test['u_statistic']:.2f}, p={test['p_value_mannwhitney']:.4f}")
+            print(f"    - 並べ替え検定: p={test['p_value_permutation']:.4f}（{test['n_permutations']}通り）")
             
             test_results.append({
-                'currency_hedge': hedge_status,
-                'comparison': 'アクティブ上位50% vs パッシブ',
-                't_statistic': t_stat_top50,
-                'p_value_ttest': p_value_top50,
-                'cohens_d': cohens_d_top50,
-                'u_statistic': u_stat_top50,
-                'p_value_mannwhitney': p_value_mw_top50,
-                'significant_5pct': p_value_top50 < 0.05
+                **keys,
+                'comparison': test['comparison'],
+                't_statistic': test['t_statistic'],
+                'p_value_ttest': test['p_value_ttest'],
+                'cohens_d': test['cohens_d'],
+                'u_statistic': test['u_statistic'],
+                'p_value_mannwhitney': test['p_value_mannwhitney'],
+                'significant_5pct': test['significant_5pct'],
+                't_statistic_welch': test['t_statistic_welch'],
+                'p_value_welch': test['p_value_welch'],
+                'p_value_permutation': test['p_value_permutation'],
+                'n_permutations': test['n_permutations']
             })
         
         self.test_results = pd.DataFrame(test_results)
         
         return self
     
+    def result_tables(self):
+        """
+        保存対象の結果表
+        
+        Returns:
+        --------
+        list of ResultTable
+            出力ファイル名・DataFrame・表示名
+        """
+        tables = [
+            ResultTable("annualized_returns_3y.csv", self.annualized_returns, "年率リターン一覧"),
+            ResultTable("summary_statistics.csv", self.summary_statistics, "集計統計量"),
+            ResultTable("statistical_tests.csv", self.test_results, "統計検定結果"),
+        ]
+        
+        # セグメント別の詳細ランキング
+        for name, data in self.analysis_results.items():
+            tables.append(ResultTable(
+                f"ranking_active_{name}.csv",
+                data['active_funds'],
+                f"ランキング（{segment_title(data['segment'])}）"
+            ))
+        
+        # データ品質チェックの記録
+        if self.excluded_funds is not None:
+            tables.append(ResultTable("excluded_funds_insufficient_data.csv", self.excluded_funds, "除外ファンドリスト"))
+        if self.outliers is not None:
+            tables.append(ResultTable("outliers_detected.csv", self.outliers, "異常値リスト"))
+        
+        return tables
+    
     def save_results(self, output_dir: str = "../output"):
         """結果の保存"""
         print("\n" + "=" * 80)
         print("結果保存")
         print("=" * 80)
         
-        output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True)
-        
-        # 年率リターン一覧
-        self.annualized_returns.to_csv(
-            output_path / "annualized_returns_3y.csv",
-            index=False, encoding='utf-8-sig'
-        )
-        print(f"✓ 年率リターン一覧保存: annualized_returns_3y.csv")
-        
-        # 集計統計量
-        self.summary_statistics.to_csv(
-            output_path / "summary_statistics.csv",
-            index=False, encoding='utf-8-sig'
-        )
-        print(f"✓ 集計統計量保存: summary_statistics.csv")
-        
-        # 統計検定結果
-        self.test_results.to_csv(
-            output_path / "statistical_tests.csv",
-            index=False, encoding='utf-8-sig'
-        )
-        print(f"✓ 統計検定結果保存: statistical_tests.csv")
-        
-        # ヘッジ区分別の詳細ランキング
-        for hedge_status in ['なし', 'あり']:
-            key = f"hedge_{hedge_status}"
-            if key in self.analysis_results:
-                active_funds = self.analysis_results[key]['active_funds']
-                filename = f"ranking_active_hedge_{hedge_status}.csv"
-                active_funds.to_csv(
-                    output_path / filename,
-                    index=False, encoding='utf-8-sig'
-                )
-                print(f"✓ ランキング保存（ヘッジ{hedge_status}）: {filename}")
+        CsvSink(output_dir).submit(self.result_tables())
         
-        print(f"\n✓ すべての結果を {output_path} に保存しました")
+        print(f"\n✓ すべての結果を {Path(output_dir)} に保存しました")
         
         return self
 
@@ -445,26 +656,44 @@ class FundPerformanceAnalyzer:
 def main():
     """メイン実行関数"""
     
-    # 基準日の設定（ここを変更してください）
+    # 基準日・分析期間の設定（ここを変更してください）
     BASE_DATE = "2024-09-30"  # サンプルデータの最終日に合わせて修正
+    ANALYSIS_PERIOD_MONTHS = 36
+    CHUNKSIZE = None  # 月次リターンをチャンク読み込みする場合の行数（None: 一括読み込み）
+    DAILY_NAV = False  # daily_nav.csv（日次基準価額）から月次リターンを計算する場合は True
+    AUM_WEIGHTING = 'latest'  # AUM加重のウェイト（'latest' / 'start' / 'end' / 'average'）
+    SEGMENT_KEYS = ['currency_hedge']  # セグメントのキー列（例: ['currency_hedge', 'investment_style']）
+    PASSIVE_KEYS = None  # パッシブを対応付けるキー列（None: SEGMENT_KEYS と同じ）
+    TOP_FRACTIONS = [0.5]  # 集計する上位の割合（例: [0.1, 0.25, 0.5]）
+    RISK_FREE_RATE = 0.0  # シャープレシオ等の無リスク金利（年率）
+    PARTIAL_HISTORY = 'exclude'  # 期間途中で設定・償還されたファンドの扱い（'exclude' / 'available' / 'cash'）
+    MIN_MONTHS = 12  # 'available' / 'cash' で含めるファンドの最低データ月数
+    BOOTSTRAP_RESAMPLES = 10000  # ブートストラップのリサンプル数
+    BOOTSTRAP_BLOCK_LENGTH = None  # 月のブロックブートストラップのブロック長（None: ファンドのみ抽出）
     
     print("\n")
     print("=" * 80)
     print("日本籍米国株式アクティブ投信パフォーマンス検証")
     print("=" * 80)
     print(f"基準日: {BASE_DATE}")
-    print(f"分析期間: 過去36か月")
+    print(f"分析期間: 過去{ANALYSIS_PERIOD_MONTHS}か月")
     print("=" * 80)
     
     try:
         # 分析実行
-        analyzer = FundPerformanceAnalyzer(base_date=BASE_DATE)
+        analyzer = FundPerformanceAnalyzer(base_date=BASE_DATE, analysis_period_months=ANALYSIS_PERIOD_MONTHS,
+                                           aum_weighting=AUM_WEIGHTING, segment_keys=SEGMENT_KEYS,
+                                           passive_keys=PASSIVE_KEYS, top_fractions=TOP_FRACTIONS,
+                                           partial_history=PARTIAL_HISTORY, min_months=MIN_MONTHS)
         
-        analyzer.load_data() \
+        analyzer.load_data(chunksize=CHUNKSIZE, daily_nav=DAILY_NAV) \
                 .validate_and_clean_data() \
                 .calculate_annualized_returns() \
+                .calculate_risk_metrics(risk_free_rate=RISK_FREE_RATE) \
                 .rank_and_segment_funds() \
                 .calculate_aggregate_statistics() \
+                .calculate_bootstrap_intervals(n_resamples=BOOTSTRAP_RESAMPLES,
+                                               block_length=BOOTSTRAP_BLOCK_LENGTH) \
                 .perform_statistical_tests() \
                 .save_results()
         
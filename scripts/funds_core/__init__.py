@@ -0,0 +1,143 @@
+"""
+ファンドパフォーマンス分析の共通ライブラリ
+
+- loader: CSV読み込み・列指向キャッシュ・データセット
+- streaming: 月次リターンのチャンク読み込み（期間内のファンド × 月のみ保持）
+- daily: 日次基準価額からの月次リターン計算（月末値・分配金調整）
+- panel: ファンド × 月のリターンパネル
+- cagr: 年率リターン（CAGR）カーネル
+- aggregation: セグメント集計（等金額・AUM加重、上位50％・複数の上位割合）
+- ranking: 上位抽出・順位付けカーネル（全ウィンドウ一括）
+- metrics: リスク調整後指標（ボラティリティ・シャープ・ソルティノ・最大DD・TE・IR・ベータ／アルファ）
+- parallel: ローリングウィンドウの並列計算（共有メモリ＋プロセスプール）
+- permutation: 平均差の並べ替え検定（正確／早期打ち切り付きモンテカルロ）
+- significance: 2標本検定カーネル（t検定・Cohen's d・Mann-Whitney、全グループ一括）
+- bootstrap: 超過リターンのブートストラップ信頼区間（ファンド・月ブロック）
+- incremental: ローリング分析の差分更新（累積和の状態保存・変更検出）
+- weighting: AUM加重のウェイト（最新AUM・ウィンドウ時点のAUM）
+- segmentation: セグメント分割（任意のキー列の組合せ、整数のセグメント番号で一括集計）
+- universe: 時点ユニバース（設定日・償還日による存続区間、途中設定・償還ファンドの扱い）
+- sink: 結果CSVの書き出し（同期・非同期）
+- charts: 図の描画ジョブ（データ＋仕様、プロセスプールでの並列描画・マニフェスト・変更のない図の描画省略・プレビュー／最終の描画プロファイル）
+- report: HTMLレポート（LTTB で間引いた推移、ファンドの系列は float32 チャンクで埋め込み・選択時に読み込み）
+"""
+
+from .aggregation import (
+    ACTIVE,
+    PASSIVE,
+    RETURN_COLUMN,
+    TOP_FRACTION,
+    aggregate_quantiles,
+    aggregate_segment,
+    aggregate_windows,
+    grouped_means,
+    masked_means,
+    rank_active_funds,
+    segment_groups,
+    window_significance,
+)
+from .bootstrap import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_RESAMPLES,
+    block_bootstrap_returns,
+    block_month_counts,
+    bootstrap_excess_returns,
+    percentile_interval,
+    resample_indices,
+)
+from .cagr import (
+    MONTHS_PER_YEAR,
+    annualize_log_returns,
+    period_annualized_returns,
+    prefix_annualized_returns,
+    rolling_annualized_returns,
+)
+from .charts import (
+    DEFAULT_RENDER_PROFILE,
+    FIGURE_FORMATS,
+    RENDER_PROFILES,
+    FigureJob,
+    apply_profile,
+    cache_stats,
+    job_fingerprint,
+    load_manifest,
+    profile_directory,
+    render_figure,
+    render_figures,
+    write_manifest,
+)
+from .daily import DailyNavAggregator, load_daily_nav_returns
+from .incremental import (
+    attributes_digest,
+    load_rolling_state,
+    new_window_starts,
+    panel_aum_latest,
+    save_rolling_state,
+    segment_spec,
+    state_path,
+    universe_spec,
+)
+from .loader import (
+    FundDataset,
+    load_fund_attributes,
+    iter_daily_nav,
+    iter_monthly_returns,
+    load_monthly_returns,
+    peak_memory_mb,
+    read_csv_cached,
+    report_memory,
+    report_peak_memory,
+)
+from .metrics import RISK_METRICS, passive_benchmark, window_max_drawdowns, window_risk_metrics
+from .panel import FUND_ATTRIBUTE_COLUMNS, ReturnPanel
+from .parallel import SharedArray, analyze_windows_parallel
+from .permutation import PermutationTests, clopper_pearson, permutation_tests
+from .ranking import (
+    TopSelection,
+    grouped_descending_ranks,
+    select_top_fraction,
+    select_top_fractions,
+    select_top_fraction_grouped,
+    select_top_fractions_grouped,
+)
+from .report import (
+    BAND_PERCENTILES,
+    CHUNK_FUNDS,
+    OVERVIEW_POINTS,
+    REPORT_NAME,
+    build_html_report,
+    encode_chunks,
+    encode_figure,
+    json_values,
+    lttb_indices,
+    overview_levels,
+    segment_bands,
+    write_html_report,
+)
+from .segmentation import (
+    DEFAULT_SEGMENT_KEYS,
+    EXPENSE_BUCKET,
+    HEDGE_STATUSES,
+    Segmentation,
+    expense_ratio_buckets,
+    grouped_sums,
+    key_values,
+    match_segments,
+    pad_grouped,
+    segment_codes,
+    segment_name,
+    segment_title,
+)
+from .significance import TwoSampleTests, two_sample_tests
+from .sink import CsvSink, ResultTable, write_table
+from .streaming import DEFAULT_CHUNKSIZE, StreamingPeriodPanel, stream_period_panel
+from .universe import (
+    DEFAULT_PARTIAL_HISTORY,
+    MIN_PARTIAL_MONTHS,
+    PARTIAL_HISTORY_TREATMENTS,
+    UniverseIndex,
+    last_observed_dates,
+    partial_history_periods,
+    partial_history_returns,
+)
+from .weighting import AUM_WEIGHTINGS, DEFAULT_AUM_WEIGHTING, window_aum_weights
@@ -0,0 +1,452 @@
+"""
+セグメント集計
+
+ヘッジ区分などのセグメントごとに、アクティブ全体・アクティブ上位50％・パッシブの
+等金額平均とAUM加重平均、および超過リターンを計算します。
+メイン分析・ローリング分析・可視化で同じ集計ロジックを共有します。
+全ウィンドウ・全セグメントの集計と検定は segmentation のセグメント番号を使って一括で行います。
+上位10％・25％など複数の上位割合の集計（aggregate_quantiles）も、1回の順位付けから求めます。
+"""
+
+import numpy as np
+import pandas as pd
+
+from .permutation import permutation_tests
+from .ranking import select_top_fraction_grouped, select_top_fractions_grouped
+from .segmentation import (
+    DEFAULT_SEGMENT_KEYS,
+    grouped_sums,
+    match_segments,
+    pad_grouped,
+    segment_codes,
+)
+from .significance import two_sample_tests
+
+ACTIVE = 'アクティブ'
+PASSIVE = 'パッシブ'
+RETURN_COLUMN = 'annualized_return_3y'
+WEIGHT_COLUMN = 'aum_latest'
+TOP_FRACTION = 0.5
+
+
+def rank_active_funds(active_funds: pd.DataFrame, return_col: str = RETURN_COLUMN,
+                      top_fraction: float = TOP_FRACTION) -> tuple:
+    """
+    アクティブファンドを年率リターンの降順に並べ、上位 ⌈top_fraction × N⌉ 本を抽出する
+
+    同順位は元の並び順を維持します（安定ソート。ranking モジュールと同じ規則）。
+
+    Returns:
+    --------
+    tuple
+        (rank, is_top_50 列を付加したランキング, 上位本数)
+    """
+    ranked = active_funds.sort_values(return_col, ascending=False, kind='mergesort').reset_index(drop=True)
+    ranked['rank'] = ranked.index + 1
+    top_count = int(np.ceil(top_fraction * len(ranked)))
+    ranked['is_top_50'] = ranked['rank'] <= top_count
+    return ranked, top_count
+
+
+def aggregate_segment(ranked_active: pd.DataFrame, passive_funds: pd.DataFrame,
+                      return_col: str = RETURN_COLUMN, weight_col: str = WEIGHT_COLUMN) -> dict:
+    """
+    セグメントの等金額平均・AUM加重平均と超過リターンを計算する
+
+    Parameters:
+    -----------
+    ranked_active : pd.DataFrame
+        rank_active_funds でランク付けしたアクティブファンド
+    passive_funds : pd.DataFrame
+        パッシブファンド
+    return_col : str
+        集計対象のリターン列
+    weight_col : str
+        AUM加重に用いる列
+
+    Returns:
+    --------
+    dict
+        本数・平均・超過リターン（キーはローリング分析結果のカラム名に対応）
+    """
+    top_funds = ranked_active[ranked_active['is_top_50']]
+
+    # 等金額平均
+    active_all_mean = ranked_active[return_col].mean()
+    active_top50_mean = top_funds[return_col].mean()
+    passive_mean = passive_funds[return_col].mean()
+
+    # AUM加重平均
+    active_all_aum = np.average(ranked_active[return_col], weights=ranked_active[weight_col])
+    active_top50_aum = np.average(top_funds[return_col], weights=top_funds[weight_col])
+    passive_aum = np.average(passive_funds[return_col], weights=passive_funds[weight_col])
+
+    return {
+        'active_count': len(ranked_active),
+        'passive_count': len(passive_funds),
+        'top_50_count': len(top_funds),
+        'active_all_mean_equal': active_all_mean,
+        'active_top50_mean_equal': active_top50_mean,
+        'passive_mean_equal': passive_mean,
+        'excess_all_equal': active_all_mean - passive_mean,
+        'excess_top50_equal': active_top50_mean - passive_mean,
+        'active_all_mean_aum': active_all_aum,
+        'active_top50_mean_aum': active_top50_aum,
+        'passive_mean_aum': passive_aum,
+        'excess_all_aum': active_all_aum - passive_aum,
+        'excess_top50_aum': active_top50_aum - passive_aum
+    }
+
+
+def segment_groups(fund_attributes: pd.DataFrame, segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None) -> tuple:
+    """
+    アクティブ・パッシブファンドのセグメント分割
+
+    Parameters:
+    -----------
+    fund_attributes : pd.DataFrame
+        ファンド属性（fund_type とキー列を含む）
+    segment_keys : sequence of str
+        セグメントのキー列
+    passive_keys : sequence of str, optional
+        パッシブファンドを対応付けるキー列（segment_keys の一部。省略時は segment_keys）
+
+    Returns:
+    --------
+    tuple
+        (アクティブの Segmentation, パッシブの Segmentation,
+         各アクティブセグメントに対応するパッシブのセグメント番号（なければ -1）)
+    """
+    passive_keys = segment_keys if passive_keys is None else passive_keys
+    fund_type = fund_attributes['fund_type'].to_numpy()
+    active = segment_codes(fund_attributes, segment_keys, fund_type == ACTIVE)
+    passive = segment_codes(fund_attributes, passive_keys, fund_type == PASSIVE)
+    return active, passive, match_segments(active, passive)
+
+
+def masked_means(values: np.ndarray, mask: np.ndarray, weights: np.ndarray) -> tuple:
+    """
+    行ごとのマスク付き等金額平均・加重平均（対象がない行はNaN）
+
+    weights は values にブロードキャストできる shape（同じ shape、ファンド数の1次元配列、
+    1 × ファンド数など）です。
+    """
+    masked = np.where(mask, values, 0.0)
+    weights = np.where(mask, np.broadcast_to(weights, values.shape), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        equal = masked.sum(axis=1) / mask.sum(axis=1)
+        weighted = (masked * weights).sum(axis=1) / weights.sum(axis=1)
+    return equal, weighted
+
+
+def grouped_means(values: np.ndarray, mask: np.ndarray, weights: np.ndarray,
+                  group_codes: np.ndarray, n_groups: int) -> tuple:
+    """
+    行ごと・グループごとのマスク付き本数・等金額平均・加重平均（対象がないセルはNaN）
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        shape: 行数 × ファンド数
+    mask : np.ndarray
+        集計対象のブールマスク（values と同じ shape）
+    weights : np.ndarray
+        ウェイト（values にブロードキャストできる shape）
+    group_codes : np.ndarray
+        各ファンドのグループ番号（-1 は対象外）
+    n_groups : int
+        グループ数
+
+    Returns:
+    --------
+    tuple
+        (本数, 等金額平均, 加重平均)。shape: 行数 × グループ数
+    """
+    weights = np.broadcast_to(weights, values.shape)
+    count = grouped_sums(np.ones(values.shape), mask, group_codes, n_groups).astype(np.int64)
+    total = grouped_sums(values, mask, group_codes, n_groups)
+    weight_total = grouped_sums(weights, mask, group_codes, n_groups)
+    weighted_total = grouped_sums(values * weights, mask, group_codes, n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return count, total / count, weighted_total / weight_total
+
+
+def _to_segments(passive_stat: np.ndarray, passive_of: np.ndarray, fill) -> np.ndarray:
+    """パッシブのグループごとの値を、対応するアクティブのセグメントの並びに展開する"""
+    matched = passive_of >= 0
+    out = np.full((passive_stat.shape[0], len(passive_of)), fill, dtype=passive_stat.dtype)
+    out[:, matched] = passive_stat[:, passive_of[matched]]
+    return out
+
+
+def _window_values(window_returns: np.ndarray, fund_attributes: pd.DataFrame, weight_col: str,
+                   window_weights: np.ndarray) -> tuple:
+    """年率リターン・ウェイトを ウィンドウ × ファンド の向きに揃える"""
+    values = np.asarray(window_returns, dtype=np.float64).T
+    if window_weights is None:
+        weights = fund_attributes[weight_col].to_numpy(dtype=np.float64)[None, :]
+    else:
+        weights = np.asarray(window_weights, dtype=np.float64).T
+    return values, weights
+
+
+def _base_means(values: np.ndarray, weights: np.ndarray, active, passive, passive_of: np.ndarray) -> dict:
+    """上位の割合によらない平均（アクティブ全体・対応するパッシブ。shape: ウィンドウ数 × セグメント数）"""
+    valid = ~np.isnan(values)
+    _, active_all_mean, active_all_aum = grouped_means(values, valid, weights, active.codes, len(active.labels))
+    passive_count, passive_mean, passive_aum = (
+        _to_segments(stat, passive_of, fill)
+        for stat, fill in zip(grouped_means(values, valid, weights, passive.codes, len(passive.labels)),
+                              (0, np.nan, np.nan))
+    )
+    return {
+        'passive_count': passive_count,
+        'active_all_mean_equal': active_all_mean,
+        'passive_mean_equal': passive_mean,
+        'active_all_mean_aum': active_all_aum,
+        'passive_mean_aum': passive_aum,
+    }
+
+
+def aggregate_windows(window_returns: np.ndarray, fund_attributes: pd.DataFrame,
+                      window_start_dates, window_end_dates, top_fraction: float = TOP_FRACTION,
+                      weight_col: str = WEIGHT_COLUMN, window_weights: np.ndarray = None,
+                      segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None) -> list:
+    """
+    全ウィンドウ・全セグメントの集計を一括で行う
+
+    セグメントは segment_keys の値の組合せ（既定はヘッジ区分）です。上位抽出は
+    ranking.select_top_fraction_grouped（同順位は元の並び順が上位）、平均は
+    (ウィンドウ, セグメント) の通し番号に対する np.bincount で計算します。
+    ウィンドウ・セグメントごとにアクティブ・パッシブを抽出して rank_active_funds →
+    aggregate_segment を呼ぶ場合と同じ結果になります（浮動小数点の加算順序による
+    1e-15程度の差を除く）。アクティブ・パッシブのいずれかが存在しない
+    ウィンドウ × セグメントは結果に含めません。
+
+    Parameters:
+    -----------
+    window_returns : np.ndarray
+        年率リターン（shape: ファンド数 × ウィンドウ数、行は fund_attributes の並び順。
+        ウィンドウ全期間のデータがないファンドはNaN）
+    fund_attributes : pd.DataFrame
+        ファンド属性（fund_type とセグメントのキー列を含む）
+    window_start_dates, window_end_dates : sequence of pd.Timestamp
+        各ウィンドウの開始月・終了月
+    top_fraction : float
+        上位として抽出する割合
+    weight_col : str
+        AUM加重に用いる列
+    window_weights : np.ndarray, optional
+        ウィンドウごとのAUM加重のウェイト（shape: ファンド数 × ウィンドウ数、
+        weighting.window_aum_weights の出力）。指定した場合は weight_col の代わりに使用
+    segment_keys : sequence of str
+        セグメントのキー列
+    passive_keys : sequence of str, optional
+        パッシブファンドを対応付けるキー列（segment_keys の一部。省略時は segment_keys）
+
+    Returns:
+    --------
+    list
+        ウィンドウ × セグメントごとの集計結果（ウィンドウ順、ローリング分析結果の1行に対応）
+    """
+    values, weights = _window_values(window_returns, fund_attributes, weight_col, window_weights)
+    active, passive, passive_of = segment_groups(fund_attributes, segment_keys, passive_keys)
+    n_active = len(active.labels)
+
+    # ウィンドウ × セグメント
+    selection = select_top_fraction_grouped(values, active.codes, n_active, top_fraction)
+    base = _base_means(values, weights, active, passive, passive_of)
+    _, active_top50_mean, active_top50_aum = grouped_means(values, selection.member, weights, active.codes, n_active)
+
+    stats = {
+        'active_count': selection.valid_count,
+        'passive_count': base['passive_count'],
+        'top_50_count': selection.top_count,
+        'active_all_mean_equal': base['active_all_mean_equal'],
+        'active_top50_mean_equal': active_top50_mean,
+        'passive_mean_equal': base['passive_mean_equal'],
+        'excess_all_equal': base['active_all_mean_equal'] - base['passive_mean_equal'],
+        'excess_top50_equal': active_top50_mean - base['passive_mean_equal'],
+        'active_all_mean_aum': base['active_all_mean_aum'],
+        'active_top50_mean_aum': active_top50_aum,
+        'passive_mean_aum': base['passive_mean_aum'],
+        'excess_all_aum': base['active_all_mean_aum'] - base['passive_mean_aum'],
+        'excess_top50_aum': active_top50_aum - base['passive_mean_aum']
+    }
+
+    segments = active.labels.to_dict('records')
+    results = []
+    for window_idx, (start_date, end_date) in enumerate(zip(window_start_dates, window_end_dates)):
+        for segment_idx, segment in enumerate(segments):
+            if stats['active_count'][window_idx, segment_idx] == 0 or stats['passive_count'][window_idx, segment_idx] == 0:
+                continue
+            results.append({
+                'window_start': start_date,
+                'window_end': end_date,
+                **segment,
+                **{key: column[window_idx, segment_idx].item() for key, column in stats.items()}
+            })
+    return results
+
+
+def aggregate_quantiles(window_returns: np.ndarray, fund_attributes: pd.DataFrame,
+                        window_start_dates, window_end_dates, top_fractions=(TOP_FRACTION,),
+                        weight_col: str = WEIGHT_COLUMN, window_weights: np.ndarray = None,
+                        segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None) -> list:
+    """
+    全ウィンドウ・全セグメントについて、複数の上位割合（上位10％・25％・50％など）の集計を一括で行う
+
+    上位抽出は ranking.select_top_fractions_grouped で、セグメントごとに1回の np.partition から全割合の閾値を求めます。
+    各割合の結果は aggregate_windows に top_fraction を指定した場合と同じで、
+    対象ウィンドウ × セグメントも aggregate_windows と同じです。
+
+    Parameters:
+    -----------
+    window_returns : np.ndarray
+        年率リターン（shape: ファンド数 × ウィンドウ数、行は fund_attributes の並び順）
+    fund_attributes : pd.DataFrame
+        ファンド属性（fund_type とセグメントのキー列を含む）
+    window_start_dates, window_end_dates : sequence of pd.Timestamp
+        各ウィンドウの開始月・終了月
+    top_fractions : sequence of float
+        上位として抽出する割合
+    weight_col : str
+        AUM加重に用いる列
+    window_weights : np.ndarray, optional
+        ウィンドウごとのAUM加重のウェイト（aggregate_windows と同じ）
+    segment_keys : sequence of str
+        セグメントのキー列
+    passive_keys : sequence of str, optional
+        パッシブファンドを対応付けるキー列（省略時は segment_keys）
+
+    Returns:
+    --------
+    list
+        ウィンドウ × セグメント × 上位割合ごとの集計結果（top_fraction, top_count, top_threshold と
+        active_top_mean_equal / _aum, excess_top_equal / _aum などを含む）
+    """
+    values, weights = _window_values(window_returns, fund_attributes, weight_col, window_weights)
+    active, passive, passive_of = segment_groups(fund_attributes, segment_keys, passive_keys)
+    n_active = len(active.labels)
+
+    selections = select_top_fractions_grouped(values, active.codes, n_active, top_fractions)
+    base = _base_means(values, weights, active, passive, passive_of)
+    top_means = [grouped_means(values, selection.member, weights, active.codes, n_active)[1:]
+                 for selection in selections]
+    active_count = selections[0].valid_count if selections else np.zeros((values.shape[0], n_active), dtype=np.int64)
+
+    segments = active.labels.to_dict('records')
+    results = []
+    for window_idx, (start_date, end_date) in enumerate(zip(window_start_dates, window_end_dates)):
+        for segment_idx, segment in enumerate(segments):
+            cell = (window_idx, segment_idx)
+            if active_count[cell] == 0 or base['passive_count'][cell] == 0:
+                continue
+            common = {key: column[cell].item() for key, column in base.items()}
+            for top_fraction, selection, (top_mean, top_aum) in zip(top_fractions, selections, top_means):
+                results.append({
+                    'window_start': start_date,
+                    'window_end': end_date,
+                    **segment,
+                    'top_fraction': top_fraction,
+                    'active_count': active_count[cell].item(),
+                    'passive_count': common['passive_count'],
+                    'top_count': selection.top_count[cell].item(),
+                    'top_threshold': selection.threshold[cell].item(),
+                    'active_all_mean_equal': common['active_all_mean_equal'],
+                    'active_top_mean_equal': top_mean[cell].item(),
+                    'passive_mean_equal': common['passive_mean_equal'],
+                    'excess_all_equal': common['active_all_mean_equal'] - common['passive_mean_equal'],
+                    'excess_top_equal': top_mean[cell].item() - common['passive_mean_equal'],
+                    'active_all_mean_aum': common['active_all_mean_aum'],
+                    'active_top_mean_aum': top_aum[cell].item(),
+                    'passive_mean_aum': common['passive_mean_aum'],
+                    'excess_all_aum': common['active_all_mean_aum'] - common['passive_mean_aum'],
+                    'excess_top_aum': top_aum[cell].item() - common['passive_mean_aum']
+                })
+    return results
+
+
+def window_significance(window_returns: np.ndarray, fund_attributes: pd.DataFrame,
+                        window_start_dates, window_end_dates,
+                        top_fraction: float = TOP_FRACTION, seed: int = 0,
+                        segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None) -> list:
+    """
+    全ウィンドウ・全セグメントのアクティブ vs パッシブの検定を一括で行う
+
+    「アクティブ全体 vs パッシブ」「アクティブ上位50% vs パッシブ」の全ウィンドウ × セグメントを
+    NaN 埋めの行列（segmentation.pad_grouped）にまとめ、significance.two_sample_tests と
+    permutation.permutation_tests に一度だけ渡します。対象ウィンドウ × セグメントは
+    aggregate_windows と同じです。
+
+    Parameters:
+    -----------
+    window_returns : np.ndarray
+        年率リターン（shape: ファンド数 × ウィンドウ数、行は fund_attributes の並び順）
+    fund_attributes : pd.DataFrame
+        ファンド属性
+    window_start_dates, window_end_dates : sequence of pd.Timestamp
+        各ウィンドウの開始月・終了月
+    top_fraction : float
+        上位として抽出する割合
+    seed : int
+        並べ替え検定（モンテカルロ）の乱数シード
+    segment_keys : sequence of str
+        セグメントのキー列
+    passive_keys : sequence of str, optional
+        パッシブファンドを対応付けるキー列（省略時は segment_keys）
+
+    Returns:
+    --------
+    list
+        ウィンドウ × セグメント × 比較ごとの検定結果（ウィンドウ順）
+    """
+    values = np.asarray(window_returns, dtype=np.float64).T
+    active, passive, passive_of = segment_groups(fund_attributes, segment_keys, passive_keys)
+    n_windows, n_active, n_passive = values.shape[0], len(active.labels), len(passive.labels)
+    valid = ~np.isnan(values)
+    top = select_top_fraction_grouped(values, active.codes, n_active, top_fraction).member
+
+    # (ウィンドウ, セグメント) の組（ウィンドウ順）と、対応するパッシブのグループ
+    window_idx, segment_idx = np.nonzero(np.broadcast_to(passive_of >= 0, (n_windows, n_active)))
+    if len(window_idx) == 0:
+        return []
+    comparisons = ('アクティブ全体', 'アクティブ上位50%')
+    x_groups = [pad_grouped(values, mask, active.codes, n_active)[window_idx * n_active + segment_idx]
+                for mask in (valid, top)]
+    width = max(group.shape[1] for group in x_groups)
+    x = np.full((len(comparisons) * len(window_idx), width), np.nan)
+    for i, group in enumerate(x_groups):
+        x[i * len(window_idx):(i + 1) * len(window_idx), :group.shape[1]] = group
+    y = np.tile(pad_grouped(values, valid, passive.codes, n_passive)[window_idx * n_passive + passive_of[segment_idx]],
+                (len(comparisons), 1))
+
+    tests = two_sample_tests(x, y)
+    permutation = permutation_tests(x, y, np.random.default_rng(seed))
+
+    segments = active.labels.to_dict('records')
+    results = []
+    for pair, (window, segment) in enumerate(zip(window_idx, segment_idx)):
+        for i, comparison in enumerate(comparisons):
+            g = i * len(window_idx) + pair
+            if tests.n1[g] == 0 or tests.n2[g] == 0:
+                continue
+            results.append({
+                'window_start': window_start_dates[window],
+                'window_end': window_end_dates[window],
+                **segments[segment],
+                'comparison': f'{comparison} vs パッシブ',
+                'active_count': tests.n1[g].item(),
+                'passive_count': tests.n2[g].item(),
+                't_statistic': tests.t_student[g].item(),
+                'p_value_ttest': tests.p_student[g].item(),
+                't_statistic_welch': tests.t_welch[g].item(),
+                'p_value_welch': tests.p_welch[g].item(),
+                'cohens_d': tests.cohens_d[g].item(),
+                'u_statistic': tests.u_statistic[g].item(),
+                'p_value_mannwhitney': tests.p_mannwhitney[g].item(),
+                'significant_5pct': bool(tests.p_student[g] < 0.05),
+                'p_value_permutation': permutation.p_value[g].item(),
+                'n_permutations': permutation.n_permutations[g].item()
+            })
+    return results
@@ -0,0 +1,135 @@
+"""
+ブートストラップ信頼区間
+
+超過リターン（アクティブ全体・上位50% − パッシブ）の信頼区間を、
+リサンプリングの添字行列を一度に生成して全リサンプルをまとめて計算します。
+
+- ファンドのリサンプリング：アクティブ・パッシブそれぞれの中で復元抽出
+  （各リサンプルで上位50％・上位10％などの各割合を選び直します）
+- 月のブロックブートストラップ（任意）：ブロック長 L の循環ブロックで月を復元抽出し、
+  全ファンドに同じ月系列を適用して年率リターンを再計算します（ファンド間の相関を保持）
+
+乱数は np.random.Generator で与え、同じシードなら同じ結果になります。
+"""
+
+import numpy as np
+
+from .aggregation import TOP_FRACTION, masked_means
+from .cagr import annualize_log_returns
+from .ranking import select_top_fractions
+
+# 既定のリサンプル数・信頼水準
+DEFAULT_RESAMPLES = 10000
+DEFAULT_CONFIDENCE = 0.95
+
+
+def resample_indices(rng: np.random.Generator, n: int, n_resamples: int) -> np.ndarray:
+    """復元抽出の添字行列（shape: リサンプル数 × n）"""
+    return rng.integers(0, n, size=(n_resamples, n))
+
+
+def block_month_counts(rng: np.random.Generator, n_months: int, n_resamples: int,
+                       block_length: int) -> np.ndarray:
+    """
+    循環ブロックブートストラップで抽出した各月の出現回数
+
+    長さ block_length のブロックを起点一様・循環で ⌈n_months / block_length⌉ 個抽出し、
+    先頭から n_months か月分を用います。対数リターンの合計は
+    「出現回数 × 対数リターン」の和になるため、出現回数行列だけを返します。
+
+    Returns:
+    --------
+    np.ndarray
+        月の出現回数（shape: リサンプル数 × n_months）
+    """
+    if block_length < 1:
+        raise ValueError("block_length は1以上である必要があります")
+    n_blocks = -(-n_months // block_length)
+    starts = rng.integers(0, n_months, size=(n_resamples, n_blocks))
+    months = (starts[:, :, None] + np.arange(block_length)).reshape(n_resamples, -1)[:, :n_months] % n_months
+    flat = (np.arange(n_resamples)[:, None] * n_months + months).ravel()
+    return np.bincount(flat, minlength=n_resamples * n_months).reshape(n_resamples, n_months)
+
+
+def block_bootstrap_returns(log_returns: np.ndarray, month_counts: np.ndarray, period_months: int) -> np.ndarray:
+    """
+    月の出現回数から各リサンプルの年率リターンを計算する
+
+    Parameters:
+    -----------
+    log_returns : np.ndarray
+        対数リターン（shape: ファンド数 × 月数）
+    month_counts : np.ndarray
+        block_month_counts の出力（shape: リサンプル数 × 月数）
+    period_months : int
+        年率換算の期間（月数）
+
+    Returns:
+    --------
+    np.ndarray
+        年率リターン（shape: リサンプル数 × ファンド数）
+    """
+    annualized, _ = annualize_log_returns(month_counts @ log_returns.T, period_months)
+    return annualized
+
+
+def bootstrap_excess_returns(active_returns: np.ndarray, active_weights: np.ndarray,
+                             passive_returns: np.ndarray, passive_weights: np.ndarray,
+                             rng: np.random.Generator, n_resamples: int = DEFAULT_RESAMPLES,
+                             top_fractions=(TOP_FRACTION,)) -> dict:
+    """
+    ファンドを復元抽出して超過リターンのブートストラップ分布を計算する
+
+    Parameters:
+    -----------
+    active_returns, passive_returns : np.ndarray
+        年率リターン。1次元（ファンド数）の場合は全リサンプルで共通、
+        2次元（リサンプル数 × ファンド数）の場合は月のブロックブートストラップ等で
+        リサンプルごとに再計算したもの
+    active_weights, passive_weights : np.ndarray
+        AUM加重に用いる重み（ファンド数）
+    rng : np.random.Generator
+        乱数生成器
+    n_resamples : int
+        リサンプル数
+    top_fractions : sequence of float
+        上位として抽出する割合（リサンプルごとに、1回の np.partition で全割合を選び直す）
+
+    Returns:
+    --------
+    dict
+        キーは top_fractions の各割合、値は「aggregate_segment と同じ超過リターン名 →
+        shape: リサンプル数 の配列」の dict（全割合で同じリサンプルを用います）
+    """
+    def draw(returns, weights):
+        rows = resample_indices(rng, len(weights), n_resamples)
+        returns = np.asarray(returns, dtype=np.float64)
+        if returns.ndim == 1:
+            sampled = returns[rows]
+        else:
+            sampled = np.take_along_axis(returns, rows, axis=1)
+        return sampled, np.asarray(weights, dtype=np.float64)[rows]
+
+    active, active_w = draw(active_returns, active_weights)
+    passive, passive_w = draw(passive_returns, passive_weights)
+
+    active_all_mean, active_all_aum = masked_means(active, ~np.isnan(active), active_w)
+    passive_mean, passive_aum = masked_means(passive, ~np.isnan(passive), passive_w)
+
+    samples = {}
+    for top_fraction, selection in zip(top_fractions, select_top_fractions(active, top_fractions)):
+        active_top50_mean, active_top50_aum = masked_means(active, selection.member, active_w)
+        samples[top_fraction] = {
+            'excess_all_equal': active_all_mean - passive_mean,
+            'excess_top50_equal': active_top50_mean - passive_mean,
+            'excess_all_aum': active_all_aum - passive_aum,
+            'excess_top50_aum': active_top50_aum - passive_aum
+        }
+    return samples
+
+
+def percentile_interval(samples: np.ndarray, confidence: float = DEFAULT_CONFIDENCE) -> tuple:
+    """パーセンタイル法の信頼区間（下限, 上限）"""
+    alpha = (1 - confidence) / 2
+    lower, upper = np.nanquantile(samples, [alpha, 1 - alpha])
+    return float(lower), float(upper)
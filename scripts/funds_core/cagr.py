@@ -0,0 +1,109 @@
+"""
+年率リターン（CAGR）カーネル
+
+リターンパネルの対数リターン合計から、単一期間・ローリングウィンドウの
+年率リターンを全ファンド一括で計算します。
+"""
+
+import numpy as np
+
+from .panel import ReturnPanel
+
+# 年率換算に用いる1年あたりの月数
+MONTHS_PER_YEAR = 12
+
+
+def annualize_log_returns(log_sums: np.ndarray, period_months: int) -> tuple:
+    """
+    対数リターン合計から年率リターンと累積リターンを計算する
+
+    R_ann = (∏(1 + r_t))^(12/期間月数) - 1 = exp(Σlog(1 + r_t) × 12/期間月数) - 1
+
+    Parameters:
+    -----------
+    log_sums : np.ndarray
+        対数リターン合計
+    period_months : int
+        計算期間（月数）
+
+    Returns:
+    --------
+    tuple
+        (年率リターン, 累積リターン)
+    """
+    annualized = np.expm1(log_sums * (MONTHS_PER_YEAR / period_months))
+    cumulative = np.expm1(log_sums)
+    return annualized, cumulative
+
+
+def period_annualized_returns(panel: ReturnPanel, period_months: int) -> tuple:
+    """
+    パネル全期間の年率リターン・累積リターン
+
+    観測月数が period_months に満たないファンドはNaNとします。
+
+    Returns:
+    --------
+    tuple
+        (年率リターン, 累積リターン)。shape: ファンド数
+    """
+    annualized, cumulative = annualize_log_returns(panel.log_return_sums(), period_months)
+    incomplete = panel.observation_counts() != period_months
+    annualized[incomplete] = np.nan
+    cumulative[incomplete] = np.nan
+    return annualized, cumulative
+
+
+def rolling_annualized_returns(panel: ReturnPanel, window_starts: np.ndarray, window_months: int) -> np.ndarray:
+    """
+    全ウィンドウの年率リターン行列
+
+    対数リターンの累積和の差分で各ウィンドウの合計を求めます。
+    欠損月を含むウィンドウはNaNとします。
+
+    Parameters:
+    -----------
+    panel : ReturnPanel
+        リターンパネル
+    window_starts : np.ndarray
+        ウィンドウ起点の月インデックス
+    window_months : int
+        ウィンドウ長（月数）
+
+    Returns:
+    --------
+    np.ndarray
+        年率リターン（shape: ファンド数 × ウィンドウ数）
+    """
+    log_prefix, count_prefix = panel.prefix_sums()
+    return prefix_annualized_returns(log_prefix, count_prefix, window_starts, window_months)
+
+
+def prefix_annualized_returns(log_prefix: np.ndarray, count_prefix: np.ndarray,
+                              window_starts: np.ndarray, window_months: int) -> np.ndarray:
+    """
+    累積和（ReturnPanel.prefix_sums の形式）から全ウィンドウの年率リターン行列を計算する
+
+    Parameters:
+    -----------
+    log_prefix : np.ndarray
+        対数リターン累積和（shape: ファンド数 × (月数 + 1)）
+    count_prefix : np.ndarray
+        観測月数累積和（shape: ファンド数 × (月数 + 1)）
+    window_starts : np.ndarray
+        ウィンドウ起点の月インデックス
+    window_months : int
+        ウィンドウ長（月数）
+
+    Returns:
+    --------
+    np.ndarray
+        年率リターン（shape: ファンド数 × ウィンドウ数）
+    """
+    window_starts = np.asarray(window_starts)
+    window_ends = window_starts + window_months
+    log_sums = log_prefix[:, window_ends] - log_prefix[:, window_starts]
+    counts = count_prefix[:, window_ends] - count_prefix[:, window_starts]
+    annualized, _ = annualize_log_returns(log_sums, window_months)
+    annualized[counts != window_months] = np.nan
+    return annualized
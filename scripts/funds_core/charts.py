@@ -0,0 +1,403 @@
+"""
+図の描画ジョブ
+
+可視化の各図を「データ（NumPy配列・数値）＋仕様（タイトル・解像度など）」だけを持つ
+FigureJob として表し、pyplot の状態を共有せずに matplotlib.figure.Figure へ描画します。
+ジョブは互いに独立しているため、プロセスプール（各ワーカーは Agg バックエンド）で
+並列に描画でき、直列で描画した場合と同じファイルになります。
+
+描画結果はジョブの発行順に並べたマニフェスト（ファイル名・種類・タイトル・SHA-256・サイズ）として
+返し、figure_manifest.json に保存します。完了順ではなく発行順のため、ワーカー数によらず同じ内容です
+（描画時間 seconds を除く）。
+
+マニフェストには各ジョブのフィンガープリント（データ・仕様・描画設定のハッシュ）も記録し、
+次回の描画時にフィンガープリントが一致し、ファイルが記録した SHA-256 のまま残っているジョブは
+描画を省略します（キャッシュヒット）。ヒット・ミスの件数はマニフェストの cache に記録します。
+
+描画プロファイル（RENDER_PROFILES）で解像度・余白の詰め方・出力先を切り替えます。
+- final: 300dpi・bbox_inches='tight'（出力ディレクトリ直下）
+- preview: 低解像度・余白を詰めない（preview/ サブディレクトリ、SVG も可）
+プロファイルごとに出力先とマニフェストが分かれるため、プレビューを繰り返しても final のキャッシュは
+無効にならず、final ではデータ・仕様が前回の final から変わった図だけを描画します。
+比較の基準を「前回のプレビュー」ではなく「前回の final」としているのは、前回のプレビュー以降は
+変わっていなくても、それ以前のプレビューで変えた図は final の画像が古いままだからです
+（プレビュー中に変えて元に戻した図は、final の画像が最新のため描画しません）。
+各図の描画時間はマニフェストの seconds に記録します（キャッシュヒットの図は前回描画したときの時間）。
+"""
+
+import hashlib
+import io
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+
+# 図の既定の解像度
+DEFAULT_DPI = 300
+# プレビューの解像度
+PREVIEW_DPI = 72
+# マニフェストのファイル名
+MANIFEST_NAME = "figure_manifest.json"
+# 描画関数の版（描画内容を変えたときに増やし、キャッシュを無効にする）
+RENDER_VERSION = 2
+
+# 描画プロファイル（dpi: 解像度（None はジョブの仕様・DEFAULT_DPI）、tight: bbox_inches='tight' で余白を詰めるか、
+# directory: 出力ディレクトリ内の出力先）
+RENDER_PROFILES = {
+    'final': {'dpi': None, 'tight': True, 'directory': ''},
+    'preview': {'dpi': PREVIEW_DPI, 'tight': False, 'directory': 'preview'},
+}
+DEFAULT_RENDER_PROFILE = 'final'
+# 出力形式（拡張子）
+FIGURE_FORMATS = ('png', 'svg')
+
+# 描画時に適用する matplotlib の設定（日本語フォント）
+CHART_RC_PARAMS = {
+    'font.family': 'Noto Sans CJK JP',
+    'axes.unicode_minus': False,
+}
+
+# filename: 出力ファイル名（拡張子で形式を決める）
+# kind: 描画関数の種類（RENDERERS のキー）
+# data: 描画に使うデータ（NumPy配列・数値・文字列のみ）
+# spec: タイトル・表示名（label）・解像度（dpi）・余白を詰めるか（tight）などの仕様
+FigureJob = namedtuple('FigureJob', ['filename', 'kind', 'data', 'spec'])
+
+
+def profile_directory(output_dir, profile: str = DEFAULT_RENDER_PROFILE) -> Path:
+    """描画プロファイルの出力先（存在しない場合は作成）"""
+    path = Path(output_dir) / RENDER_PROFILES[profile]['directory']
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def apply_profile(job: FigureJob, profile: str = DEFAULT_RENDER_PROFILE, figure_format: str = None) -> FigureJob:
+    """
+    ジョブに描画プロファイルを適用する
+
+    final で形式を変えない場合はジョブをそのまま返します（フィンガープリントも変わらない）。
+
+    Parameters:
+    -----------
+    job : FigureJob
+        描画ジョブ
+    profile : str
+        描画プロファイル（RENDER_PROFILES のキー）
+    figure_format : str, optional
+        出力形式（FIGURE_FORMATS、省略時はジョブのファイル名の拡張子）
+
+    Returns:
+    --------
+    FigureJob
+        解像度・余白の仕様と拡張子を反映したジョブ
+    """
+    settings = RENDER_PROFILES[profile]
+    spec = dict(job.spec)
+    if settings['dpi'] is not None:
+        spec['dpi'] = settings['dpi']
+    if not settings['tight']:
+        spec['tight'] = False
+    filename = job.filename if figure_format is None else str(Path(job.filename).with_suffix('.' + figure_format))
+    if spec == job.spec and filename == job.filename:
+        return job
+    return job._replace(filename=filename, spec=spec)
+
+
+def _render_histogram(fig, data, spec):
+    """アクティブ・パッシブの年率リターン分布のヒストグラム"""
+    axes = fig.subplots(1, 2)
+    fig.suptitle(spec['title'], fontsize=16, fontweight='bold')
+    active, passive = data['active'], data['passive']
+
+    # アクティブのヒストグラム
+    axes[0].hist(active, bins=20, alpha=0.7, color='steelblue', edgecolor='black')
+    axes[0].axvline(data['active_mean'], color='red', linestyle='--', linewidth=2,
+                    label=f"平均: {data['active_mean']:.2f}%")
+    axes[0].axvline(data['active_median'], color='green', linestyle='--', linewidth=2,
+                    label=f"中央値: {data['active_median']:.2f}%")
+    axes[0].set_xlabel(spec['xlabel'], fontsize=12)
+    axes[0].set_ylabel('ファンド数', fontsize=12)
+    axes[0].set_title('アクティブファンド', fontsize=14)
+    axes[0].legend()
+    axes[0].grid(alpha=0.3)
+
+    # パッシブの参照線を追加
+    if len(passive) > 0:
+        axes[0].axvline(data['passive_mean'], color='orange', linestyle=':', linewidth=2,
+                        label=f"パッシブ平均: {data['passive_mean']:.2f}%")
+        axes[0].legend()
+
+    # 比較ヒストグラム
+    axes[1].hist(active, bins=20, alpha=0.5, color='steelblue',
+                 label=f'アクティブ (n={len(active)})', edgecolor='black')
+    if len(passive) > 0:
+        axes[1].hist(passive, bins=10, alpha=0.5, color='orange',
+                     label=f'パッシブ (n={len(passive)})', edgecolor='black')
+    axes[1].set_xlabel(spec['xlabel'], fontsize=12)
+    axes[1].set_ylabel('ファンド数', fontsize=12)
+    axes[1].set_title('アクティブ vs パッシブ', fontsize=14)
+    axes[1].legend()
+    axes[1].grid(alpha=0.3)
+
+
+def _render_boxplot(fig, data, spec):
+    """アクティブ・パッシブの年率リターンの箱ひげ図"""
+    ax = fig.subplots()
+    data_to_plot = [data['active']]
+    labels = ['アクティブ']
+    if len(data['passive']) > 0:
+        data_to_plot.append(data['passive'])
+        labels.append('パッシブ')
+
+    bp = ax.boxplot(data_to_plot, labels=labels, patch_artist=True, showmeans=True, meanline=True)
+
+    # 色設定
+    colors = ['steelblue', 'orange']
+    for patch, color in zip(bp['boxes'], colors[:len(data_to_plot)]):
+        patch.set_facecolor(color)
+        patch.set_alpha(0.6)
+
+    ax.set_ylabel(spec['ylabel'], fontsize=12)
+    ax.set_title(spec['title'], fontsize=14, fontweight='bold')
+    ax.grid(axis='y', alpha=0.3)
+
+
+def _render_rolling(fig, data, spec):
+    """ローリング超過リターン推移（等金額平均・AUM加重平均の2段）"""
+    axes = fig.subplots(2, 1)
+    fig.suptitle(spec['title'], fontsize=16, fontweight='bold')
+    window_end = data['window_end']
+
+    # 等金額平均は既定の色、AUM加重平均は C2 / C3
+    for ax, weighting, name, colors in ((axes[0], 'equal', '等金額平均', ({}, {})),
+                                        (axes[1], 'aum', 'AUM加重平均', ({'color': 'C2'}, {'color': 'C3'}))):
+        ax.plot(window_end, data[f'excess_all_{weighting}'],
+                marker='o', label='アクティブ全体 vs パッシブ', linewidth=2, **colors[0])
+        ax.plot(window_end, data[f'excess_top50_{weighting}'],
+                marker='s', label='アクティブ上位50% vs パッシブ', linewidth=2, **colors[1])
+        ax.axhline(0, color='black', linestyle='--', linewidth=1)
+        ax.set_ylabel(f'超過リターン (%, {name})', fontsize=12)
+        ax.set_title(name, fontsize=14)
+        ax.legend()
+        ax.grid(alpha=0.3)
+    axes[1].set_xlabel('ウィンドウ終了月', fontsize=12)
+
+
+def _render_comparison(fig, data, spec):
+    """セグメントごとのアクティブ全体・上位50%・パッシブの平均の棒グラフ"""
+    axes = fig.subplots(1, data['n_panels'], squeeze=False)[0]
+    fig.suptitle(spec['title'], fontsize=16, fontweight='bold')
+
+    for panel in data['panels']:
+        ax = axes[panel['index']]
+        bars = ax.bar(panel['categories'], panel['values'],
+                      color=['steelblue', 'darkblue', 'orange'],
+                      alpha=0.7, edgecolor='black', linewidth=1.5)
+
+        # 値ラベル（負の値は棒の下端の外側）
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2., height, f'{height:.2f}%',
+                    ha='center', va='bottom' if height >= 0 else 'top', fontsize=11, fontweight='bold')
+
+        ax.set_ylabel(spec['ylabel'], fontsize=12)
+        ax.set_title(panel['title'], fontsize=14)
+        ax.grid(axis='y', alpha=0.3)
+        if min(panel['values']) >= 0:
+            ax.set_ylim(bottom=0)
+        else:
+            ax.axhline(0, color='black', linewidth=1)
+
+
+RENDERERS = {
+    'histogram': _render_histogram,
+    'boxplot': _render_boxplot,
+    'rolling': _render_rolling,
+    'comparison': _render_comparison,
+}
+
+
+def _update_digest(digest, value):
+    """ジョブのデータ・仕様を型と構造を含めてハッシュに加える（辞書はキー順）"""
+    if isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value):
+            _update_digest(digest, key)
+            _update_digest(digest, value[key])
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _update_digest(digest, item)
+        digest.update(b']')
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(f"ndarray:{value.dtype.str}:{value.shape}:".encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.ndarray):
+        _update_digest(digest, value.tolist())
+    else:
+        if isinstance(value, np.generic):
+            value = value.item()
+        digest.update(f"{type(value).__name__}:{value!r};".encode('utf-8'))
+
+
+def job_fingerprint(job: FigureJob) -> str:
+    """
+    ジョブのフィンガープリント
+
+    ファイル名・種類・データ・仕様に加え、描画結果に影響する設定（RENDER_VERSION・
+    CHART_RC_PARAMS・既定の解像度・matplotlib の版）のハッシュです。
+    """
+    digest = hashlib.sha256()
+    _update_digest(digest, [RENDER_VERSION, CHART_RC_PARAMS, DEFAULT_DPI, metadata.version('matplotlib'),
+                            job.filename, job.kind, job.data, job.spec])
+    return digest.hexdigest()
+
+
+def render_figure(job: FigureJob, output_dir, fingerprint: str = None) -> dict:
+    """
+    ジョブを1枚の図として描画・保存する
+
+    pyplot を使わずに Figure を直接作成するため、プロセス内の他の図の状態に影響されません。
+
+    Parameters:
+    -----------
+    job : FigureJob
+        描画ジョブ
+    output_dir : str or Path
+        出力ディレクトリ
+    fingerprint : str, optional
+        ジョブのフィンガープリント（省略時は job_fingerprint で計算）
+
+    Returns:
+    --------
+    dict
+        マニフェストの1行（filename, kind, title, sha256, bytes, seconds: 描画・保存の時間, fingerprint, cached=False）
+    """
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    figure_format = Path(job.filename).suffix.lstrip('.')
+    # SVG は日時を埋め込まず、要素IDの乱数を固定して同じ内容なら同じファイルにする
+    rc_params, metadata = CHART_RC_PARAMS, None
+    if figure_format == 'svg':
+        rc_params, metadata = {**CHART_RC_PARAMS, 'svg.hashsalt': job.filename}, {'Date': None}
+
+    start = time.perf_counter()
+    with matplotlib.rc_context(rc_params):
+        fig = Figure(figsize=job.spec['figsize'])
+        RENDERERS[job.kind](fig, job.data, job.spec)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=figure_format, dpi=job.spec.get('dpi', DEFAULT_DPI),
+                    bbox_inches='tight' if job.spec.get('tight', True) else None, metadata=metadata)
+
+    content = buffer.getvalue()
+    (Path(output_dir) / job.filename).write_bytes(content)
+    seconds = time.perf_counter() - start
+    return {
+        'filename': job.filename,
+        'kind': job.kind,
+        'title': job.spec['title'],
+        'sha256': hashlib.sha256(content).hexdigest(),
+        'bytes': len(content),
+        'seconds': round(seconds, 3),
+        'fingerprint': fingerprint if fingerprint is not None else job_fingerprint(job),
+        'cached': False,
+    }
+
+
+def _file_sha256(path: Path) -> str:
+    """ファイルの SHA-256（存在しない場合は None）"""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def load_manifest(output_dir) -> dict:
+    """前回のマニフェストをファイル名ごとの辞書で読み込む（存在しない・読めない場合は空）"""
+    path = Path(output_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            figures = json.load(f)['figures']
+        return {entry['filename']: entry for entry in figures}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠ 図のマニフェストを読み込めません（{e}）")
+        return {}
+
+
+def _init_worker():
+    """ワーカー初期化：画面を持たない Agg バックエンドを使う"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figures(jobs, output_dir, workers: int = 1, previous: dict = None) -> list:
+    """
+    ジョブをまとめて描画する
+
+    Parameters:
+    -----------
+    jobs : list of FigureJob
+        描画ジョブ（発行順）
+    output_dir : str or Path
+        出力ディレクトリ
+    workers : int
+        描画のワーカープロセス数（1の場合はこのプロセスで順に描画）
+    previous : dict, optional
+        前回のマニフェスト（load_manifest の戻り値）。フィンガープリントが一致し、
+        ファイルが記録した SHA-256 のまま残っているジョブは描画しません。省略時はすべて描画
+
+    Returns:
+    --------
+    list of dict
+        ジョブの発行順のマニフェスト（render_figure の戻り値。描画を省略したジョブは
+        前回の行に cached=True を付けたもの）
+    """
+    jobs = list(jobs)
+    output_dir = Path(output_dir)
+    fingerprints = [job_fingerprint(job) for job in jobs]
+    previous = previous or {}
+
+    manifest = [None] * len(jobs)
+    pending = []
+    for i, (job, fingerprint) in enumerate(zip(jobs, fingerprints)):
+        entry = previous.get(job.filename)
+        if (entry is not None and entry.get('fingerprint') == fingerprint
+                and _file_sha256(output_dir / job.filename) == entry.get('sha256')):
+            manifest[i] = dict(entry, cached=True)
+        else:
+            pending.append(i)
+
+    if workers <= 1 or len(pending) <= 1:
+        rendered = [render_figure(jobs[i], output_dir, fingerprints[i]) for i in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_worker) as executor:
+            # map は完了順ではなく投入順に結果を返す
+            rendered = list(executor.map(render_figure, [jobs[i] for i in pending],
+                                         [output_dir] * len(pending), [fingerprints[i] for i in pending]))
+    for i, entry in zip(pending, rendered):
+        manifest[i] = entry
+    return manifest
+
+
+def cache_stats(manifest: list) -> dict:
+    """マニフェストのキャッシュのヒット・ミスの件数"""
+    hits = sum(1 for entry in manifest if entry.get('cached'))
+    return {'hits': hits, 'misses': len(manifest) - hits}
+
+
+def write_manifest(manifest: list, output_dir) -> Path:
+    """マニフェスト（図の一覧とキャッシュのヒット・ミスの件数）を figure_manifest.json に保存する"""
+    path = Path(output_dir) / MANIFEST_NAME
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'cache': cache_stats(manifest), 'figures': manifest}, f, ensure_ascii=False, indent=2)
+    return path
+
@@ -0,0 +1,194 @@
+"""
+日次基準価額からの月次リターン計算
+
+daily_nav.csv（ファンド × 営業日の基準価額・分配金）をチャンク単位で読み込み、
+月末の基準価額と分配金調整から月次トータルリターンを計算して、
+monthly_returns.csv と同じ形式の DataFrame を返します。
+
+分配金を受け取った日に再投資したとみなすと、月次リターンは
+    (1 + r_m) = NAV_m / NAV_{m-1} × ∏_{t ∈ m} (1 + D_t / NAV_t)
+（NAV_m: 月 m の最終営業日の基準価額、D_t: 日 t の分配金、NAV_t: 分配落ち後の基準価額）
+となり、分配金の調整項は各日の行だけで決まります。そのため各チャンクを
+(ファンド, 月) ごとの「最終日・最終日の基準価額・log(1 + D_t / NAV_t) の合計」に
+縮約しておけば、ファイルの並び順によらずチャンク間で結合できます。
+縮約は groupby を使わず、(ファンド, 月, 日付) で並べ替えた配列の境界位置から
+np.add.reduceat で行います。
+
+同じファンド・日付の重複は、チャンクをまたぐ場合も含めてエラーとします。縮約した行ごとに
+その月に現れた日のビットマスク（日 d → 1 << (d - 1)）を持ち、結合する行のマスクが重ならない
+（マスクの和と論理和が一致する）ことを確かめます（並び順によらず、チャンク内の重複も同じ判定です）。
+
+- 各ファンドの最初の月は前月末の基準価額がないため出力しません
+- 基準価額のない月を挟んだ月も、前月末の基準価額がないため出力しません
+- 最終月の最終日が月末でない場合、その月のリターンは月初来リターンになります
+"""
+
+import numpy as np
+import pandas as pd
+
+from .loader import iter_daily_nav, month_ordinal
+from .streaming import DEFAULT_CHUNKSIZE
+
+# 縮約済みの行がこの行数を超えたら結合し直す（メモリ使用量の上限の目安）
+COMPACT_ROWS = 5_000_000
+
+
+def _reduce_month_ends(codes: np.ndarray, months: np.ndarray, dates: np.ndarray, nav: np.ndarray,
+                       aum: np.ndarray, distribution_log: np.ndarray, day_mask: np.ndarray) -> tuple:
+    """
+    (ファンド, 月) ごとに最終日の値・分配金調整項の合計・日のビットマスクへ縮約する
+
+    入力と同じ並びのタプル（各要素は (ファンド, 月) の昇順に並んだ配列）を返します。
+    縮約済みの行を再度入力すると、同じ (ファンド, 月) の行をさらに結合します。
+    同じ日が2回以上現れる（結合する行のマスクが重なる）場合は ValueError とします。
+    """
+    if len(codes) == 0:
+        return codes, months, dates, nav, aum, distribution_log, day_mask
+
+    order = np.lexsort((dates, months, codes))
+    codes, months, dates, day_mask = codes[order], months[order], dates[order], day_mask[order]
+
+    new_key = (codes[1:] != codes[:-1]) | (months[1:] != months[:-1])
+    starts = np.flatnonzero(np.concatenate([[True], new_key]))
+    merged_mask = np.bitwise_or.reduceat(day_mask, starts)
+    if (np.add.reduceat(day_mask, starts) != merged_mask).any():
+        raise ValueError("同一ファンド・同一日付の重複レコードが存在します")
+
+    ends = np.concatenate([starts[1:], [len(codes)]]) - 1
+    last = order[ends]
+    return (codes[starts], months[starts], dates[ends], nav[last], aum[last],
+            np.add.reduceat(distribution_log[order], starts), merged_mask)
+
+
+class DailyNavAggregator:
+    """日次基準価額をチャンク単位で月末値に縮約する"""
+
+    def __init__(self):
+        """初期化"""
+        self.fund_ids = pd.Index([], dtype=object, name='fund_id')
+        self.partials = []
+        self.rows_read = 0
+        self.invalid_rows = 0
+
+    def _fund_codes(self, fund_ids: pd.Series) -> np.ndarray:
+        """fund_id を番号に変換する（初出のファンドは番号を追加）"""
+        codes = self.fund_ids.get_indexer(fund_ids)
+        if (codes < 0).any():
+            new_ids = pd.Index(pd.unique(fund_ids[codes < 0]))
+            self.fund_ids = self.fund_ids.append(new_ids).rename('fund_id')
+            codes = self.fund_ids.get_indexer(fund_ids)
+        return codes.astype(np.int64)
+
+    def add(self, chunk: pd.DataFrame):
+        """
+        チャンクを縮約する（基準価額が欠損・0以下の行は除外）
+
+        Parameters:
+        -----------
+        chunk : pd.DataFrame
+            fund_id, nav_date, nav を含む日次基準価額（distribution, aum は任意）
+        """
+        self.rows_read += len(chunk)
+        nav = chunk['nav'].to_numpy(dtype=np.float64)
+        valid = nav > 0
+        self.invalid_rows += int((~valid).sum())
+        chunk, nav = chunk[valid], nav[valid]
+        if len(chunk) == 0:
+            return self
+
+        dates = chunk['nav_date'].to_numpy(dtype='datetime64[ns]')
+        if 'distribution' in chunk.columns:
+            distribution = np.nan_to_num(chunk['distribution'].to_numpy(dtype=np.float64))
+        else:
+            distribution = np.zeros(len(chunk))
+        if 'aum' in chunk.columns:
+            aum = chunk['aum'].to_numpy(dtype=np.float32)
+        else:
+            aum = np.full(len(chunk), np.nan, dtype=np.float32)
+
+        months = dates.astype('datetime64[M]')
+        days = (dates.astype('datetime64[D]') - months).astype(np.int64)
+        self.partials.append(_reduce_month_ends(
+            self._fund_codes(chunk['fund_id']),
+            months.view(np.int64),
+            dates.view(np.int64),
+            nav,
+            aum,
+            np.log1p(distribution / nav),
+            np.left_shift(1, days),
+        ))
+        if sum(len(partial[0]) for partial in self.partials) > COMPACT_ROWS:
+            self.partials = [self._merged()]
+        return self
+
+    def _merged(self) -> tuple:
+        """縮約済みの行をすべて結合する"""
+        if not self.partials:
+            empty = np.zeros(0, dtype=np.int64)
+            return (empty, empty, empty, np.zeros(0), np.zeros(0, dtype=np.float32), np.zeros(0), empty)
+        columns = [np.concatenate(column) for column in zip(*self.partials)]
+        return _reduce_month_ends(*columns)
+
+    def to_monthly_returns(self) -> pd.DataFrame:
+        """
+        月次リターンを計算する
+
+        Returns:
+        --------
+        pd.DataFrame
+            load_monthly_returns と同じ形式（fund_id, month_end_date, monthly_return, nav, aum,
+            month_index）の月次リターン。行は fund_id・月の昇順、month_end_date は暦月末日
+        """
+        merged = self._merged()
+        self.partials = [merged]
+        codes, months, _, nav, aum, distribution_log, _ = merged
+
+        # 前月末の基準価額がある月のみ（同一ファンドで月が連続している行）
+        has_previous = np.zeros(len(codes), dtype=bool)
+        has_previous[1:] = (codes[1:] == codes[:-1]) & (months[1:] - months[:-1] == 1)
+        rows = np.flatnonzero(has_previous)
+        monthly_return = np.expm1(np.log(nav[rows] / nav[rows - 1]) + distribution_log[rows])
+
+        # fund_id の昇順に並べ直す（同一ファンド内は月の昇順のまま）
+        fund_rank = np.empty(len(self.fund_ids), dtype=np.int64)
+        fund_rank[np.argsort(self.fund_ids.to_numpy(dtype=str), kind='stable')] = np.arange(len(self.fund_ids))
+        order = np.argsort(fund_rank[codes[rows]], kind='stable')
+        rows, monthly_return = rows[order], monthly_return[order]
+
+        month_end_date = pd.to_datetime(
+            ((months[rows] + 1).astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D'))
+            .astype('datetime64[ns]')
+        )
+        monthly_returns = pd.DataFrame({
+            'fund_id': pd.Categorical(self.fund_ids[codes[rows]]),
+            'month_end_date': month_end_date,
+            'monthly_return': monthly_return,
+            'nav': nav[rows].astype(np.float32),
+            'aum': aum[rows].astype(np.float32),
+        })
+        monthly_returns['month_index'] = month_ordinal(monthly_returns['month_end_date'])
+        return monthly_returns
+
+
+def load_daily_nav_returns(data_dir, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """
+    daily_nav.csv をチャンク単位で読み込み、月次リターンを計算する
+
+    Parameters:
+    -----------
+    data_dir : str or Path
+        データディレクトリパス
+    chunksize : int
+        1チャンクの行数
+
+    Returns:
+    --------
+    pd.DataFrame
+        load_monthly_returns と同じ形式の月次リターン
+    """
+    aggregate = DailyNavAggregator()
+    for chunk in iter_daily_nav(data_dir, chunksize):
+        aggregate.add(chunk)
+    if aggregate.invalid_rows > 0:
+        print(f"⚠ 基準価額が欠損・0以下のレコードを除外: {aggregate.invalid_rows} レコード")
+    return aggregate.to_monthly_returns()
@@ -0,0 +1,215 @@
+"""
+ローリング分析の差分更新
+
+前回実行時のリターンパネルの累積和（ファンドごとの累積対数リターン・観測月数）を
+保存しておき、次回はその後に追加された月を終点とするウィンドウだけを計算します。
+
+前回の状態と比べて次のいずれかに該当する場合は差分更新できないと判定し、
+呼び出し側で全期間を再計算します。
+- ウィンドウ長・状態ファイルの形式が異なる
+- ファンド属性のうち aum_latest 以外の列（ファンド一覧・区分・設定日など、セグメントと
+  ファンドの存続区間を決める列）が変わった
+- aum_latest が変わり、前回までのウィンドウの集計にその値を使っていた（AUM加重が 'latest' の場合、
+  または月末AUMのないファンド・ウィンドウの補完に使っていた場合）
+- セグメントのキー列・パッシブの対応付けキーが変わった
+- 途中設定・償還ファンドの扱い（最低データ月数を含む）が変わった
+- AUM加重の方法が変わった、またはウィンドウ時点のAUMで加重する場合に前回までの月の月末AUMが変わった
+- 前回までの月の並び、またはその月の累積和（＝過去のリターン）が変わった
+- 前回の結果CSVの行数が状態と一致しない（別の実行で上書きされた）
+"""
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import WEIGHT_COLUMN
+from .panel import ReturnPanel
+from .segmentation import DEFAULT_SEGMENT_KEYS
+from .universe import DEFAULT_PARTIAL_HISTORY, MIN_PARTIAL_MONTHS
+from .weighting import window_aum_weights
+
+# 状態ファイルの形式（変更時に増やす）
+STATE_VERSION = 5
+
+
+def state_path(output_dir, window_months: int) -> Path:
+    """差分更新の状態ファイルのパス（結果CSVと同じディレクトリ）"""
+    return Path(output_dir) / f"rolling_{window_months}month_state.npz"
+
+
+def attributes_digest(fund_attributes: pd.DataFrame) -> str:
+    """
+    ファンド属性の内容のハッシュ（列名・並び順を含む）
+
+    毎月更新される aum_latest は含めません（panel_aum_latest で別に比較します）。
+    """
+    attributes = fund_attributes.drop(columns=WEIGHT_COLUMN, errors='ignore')
+    digest = hashlib.sha256()
+    digest.update('\0'.join(map(str, attributes.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(attributes, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def panel_aum_latest(panel: ReturnPanel, fund_attributes: pd.DataFrame) -> np.ndarray:
+    """リターンパネルのファンド順の aum_latest（属性のないファンドはNaN）"""
+    latest = fund_attributes.set_index('fund_id')[WEIGHT_COLUMN].astype(np.float64)
+    return latest.reindex(panel.fund_ids).to_numpy()
+
+
+def segment_spec(segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None) -> str:
+    """セグメントのキー列・パッシブの対応付けキーを1つの文字列で表す"""
+    passive = ','.join(passive_keys) if passive_keys is not None else '*'
+    return f"{','.join(segment_keys)};{passive}"
+
+
+def universe_spec(partial_history: str = DEFAULT_PARTIAL_HISTORY, min_months: int = MIN_PARTIAL_MONTHS) -> str:
+    """途中設定・償還ファンドの扱いを1つの文字列で表す（'exclude' では最低データ月数を使わない）"""
+    return partial_history if partial_history == 'exclude' else f"{partial_history};{min_months}"
+
+
+def save_rolling_state(path, panel: ReturnPanel, fund_attributes: pd.DataFrame,
+                       window_months: int, result_rows: int, aum_weighting: str = 'latest', aum: np.ndarray = None,
+                       segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None,
+                       partial_history: str = DEFAULT_PARTIAL_HISTORY, min_months: int = MIN_PARTIAL_MONTHS):
+    """
+    差分更新の状態を保存する
+
+    Parameters:
+    -----------
+    path : str or Path
+        状態ファイルのパス
+    panel : ReturnPanel
+        今回のリターンパネル
+    fund_attributes : pd.DataFrame
+        今回の分析に用いたファンド属性
+    window_months : int
+        ウィンドウ長（月数）
+    result_rows : int
+        保存したローリング分析結果CSVの行数
+    aum_weighting : str
+        AUM加重の方法（weighting.AUM_WEIGHTINGS）
+    aum : np.ndarray, optional
+        月末AUM（panel と同じ ファンド × 月）。'latest' 以外の場合に保存し、過去のAUMの変更検出に使用
+    segment_keys, passive_keys : sequence of str
+        セグメントのキー列・パッシブの対応付けキー（passive_keys=None は segment_keys と同じ）
+    partial_history, min_months : str, int
+        途中設定・償還ファンドの扱い・最低データ月数（universe.PARTIAL_HISTORY_TREATMENTS）
+    """
+    log_prefix, count_prefix = panel.prefix_sums()
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp.npz')
+    np.savez(
+        tmp_path,
+        version=STATE_VERSION,
+        window_months=window_months,
+        result_rows=result_rows,
+        attributes_digest=attributes_digest(fund_attributes),
+        aum_latest=panel_aum_latest(panel, fund_attributes),
+        fund_ids=np.asarray(panel.fund_ids).astype(str),
+        months=np.asarray(panel.months, dtype='datetime64[ns]'),
+        log_prefix=log_prefix,
+        count_prefix=count_prefix,
+        aum_weighting=aum_weighting,
+        aum=aum if aum_weighting != 'latest' else np.zeros((0, 0)),
+        segment_spec=segment_spec(segment_keys, passive_keys),
+        universe_spec=universe_spec(partial_history, min_months),
+    )
+    tmp_path.replace(path)
+
+
+def load_rolling_state(path):
+    """差分更新の状態を読み込む（存在しない・読めない場合は None）"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as state:
+            return {key: state[key] for key in state.files}
+    except (OSError, ValueError) as e:
+        print(f"⚠ 差分更新の状態を読み込めません（{e}）")
+        return None
+
+
+def new_window_starts(state, panel: ReturnPanel, fund_attributes: pd.DataFrame,
+                      window_months: int, previous_rows: int, aum_weighting: str = 'latest',
+                      aum: np.ndarray = None, segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None,
+                      partial_history: str = DEFAULT_PARTIAL_HISTORY, min_months: int = MIN_PARTIAL_MONTHS) -> tuple:
+    """
+    前回の状態から、新たに計算すべきウィンドウの起点を求める
+
+    Parameters:
+    -----------
+    state : dict or None
+        load_rolling_state の戻り値
+    panel : ReturnPanel
+        今回のリターンパネル
+    fund_attributes : pd.DataFrame
+        今回の分析に用いるファンド属性
+    window_months : int
+        ウィンドウ長（月数）
+    previous_rows : int
+        前回のローリング分析結果CSVの行数
+    aum_weighting : str
+        今回のAUM加重の方法
+    aum : np.ndarray, optional
+        今回の月末AUM（'latest' 以外の場合に必要）
+    segment_keys, passive_keys : sequence of str
+        今回のセグメントのキー列・パッシブの対応付けキー
+    partial_history, min_months : str, int
+        今回の途中設定・償還ファンドの扱い・最低データ月数
+
+    Returns:
+    --------
+    tuple
+        (新しいウィンドウ起点の配列, 理由)。差分更新できない場合は (None, 理由)
+    """
+    if state is None:
+        return None, "前回の状態がありません"
+    if int(state['version']) != STATE_VERSION or int(state['window_months']) != window_months:
+        return None, "状態ファイルの形式またはウィンドウ長が異なります"
+    if int(state['result_rows']) != previous_rows:
+        return None, "前回の結果CSVが状態と一致しません"
+    if str(state['aum_weighting']) != aum_weighting:
+        return None, "AUM加重の方法が異なります"
+    if str(state['segment_spec']) != segment_spec(segment_keys, passive_keys):
+        return None, "セグメントのキー列が異なります"
+    if str(state['universe_spec']) != universe_spec(partial_history, min_months):
+        return None, "途中設定・償還ファンドの扱いが異なります"
+    if str(state['attributes_digest']) != attributes_digest(fund_attributes):
+        return None, "ファンド属性が変更されています"
+    if not np.array_equal(state['fund_ids'], np.asarray(panel.fund_ids).astype(str)):
+        return None, "ファンド一覧が変更されています"
+
+    previous_months = state['months']
+    n_previous = len(previous_months)
+    months = np.asarray(panel.months, dtype='datetime64[ns]')
+    if n_previous > len(months) or not np.array_equal(months[:n_previous], previous_months):
+        return None, "過去の月の並びが変更されています"
+
+    # 前回までの各月の累積和が一致すれば、過去のリターン・欠損は変わっていない
+    log_prefix, count_prefix = panel.prefix_sums()
+    if not (np.array_equal(log_prefix[:, :n_previous + 1], state['log_prefix'])
+            and np.array_equal(count_prefix[:, :n_previous + 1], state['count_prefix'])):
+        return None, "過去の月次リターンが変更されています"
+    if aum_weighting != 'latest' and not np.array_equal(aum[:, :n_previous], state['aum'], equal_nan=True):
+        return None, "過去の月末AUMが変更されています"
+
+    # aum_latest の変更は、前回までのウィンドウの集計に使っていたファンドがある場合のみ再計算
+    latest, previous_latest = panel_aum_latest(panel, fund_attributes), state['aum_latest']
+    changed = ~((latest == previous_latest) | (np.isnan(latest) & np.isnan(previous_latest)))
+    if changed.any():
+        if aum_weighting == 'latest':
+            return None, "aum_latest が変更されています（AUM加重 'latest' の過去のウィンドウに影響）"
+        # リターンがあり、月末AUMがなく aum_latest で補ったファンド・ウィンドウ
+        previous_starts = np.arange(max(n_previous - window_months + 1, 0))
+        filled = np.isnan(window_aum_weights(aum[:, :n_previous], np.full(len(changed), np.nan),
+                                             previous_starts, window_months, aum_weighting))
+        observed = count_prefix[:, previous_starts + window_months] > count_prefix[:, previous_starts]
+        if (filled & observed)[changed].any():
+            return None, "過去のウィンドウで月末AUMの補完に使った aum_latest が変更されています"
+
+    # 終点が新しい月にあるウィンドウのみ
+    first_start = max(n_previous - window_months + 1, 0)
+    return np.arange(first_start, panel.n_months - window_months + 1), f"追加 {panel.n_months - n_previous} か月"
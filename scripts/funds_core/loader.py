@@ -0,0 +1,397 @@
+"""
+入力データ読み込み層
+
+CSVを初回読み込み時に型付きの列指向キャッシュ（Feather / Arrow IPC形式）へ変換し、
+2回目以降はCSVの解析・型変換を省いてキャッシュから読み込みます。キャッシュは DataFrame へ
+コピーして返すため、読み込み後のメモリ使用量はCSVから読み込む場合と同程度です
+（キャッシュの目的は読み込み時間の短縮で、メモリ使用量の削減ではありません）。
+元CSVのサイズ・更新時刻・内容ハッシュが変わった場合はキャッシュを自動で作り直します。
+
+キャッシュには pyarrow が必要です。未インストールの場合は従来どおりCSVを直接読み込みます。
+
+月次リターンデータは明示的な型定義（MONTHLY_RETURNS_DTYPES）で読み込み、
+結合用の月インデックス（int32）を付加します。
+FundDataset は読み込んだデータとリターンパネルを1プロセス内で各分析に共有するための入れ物です。
+"""
+
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .panel import ReturnPanel
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    # pyarrow はオプション依存（未インストール時はキャッシュを使わない）
+    feather = None
+
+
+# キャッシュ形式を変更した場合はバージョンを上げて既存キャッシュを無効化する
+CACHE_VERSION = 2
+CACHE_DIR_NAME = ".cache"
+HASH_CHUNK_SIZE = 1 << 20
+
+# 月次リターンデータの型定義
+# - fund_id: カテゴリ型（文字列をファンドごとに1つだけ保持）
+# - nav, aum: 参考値のため float32
+# - monthly_return: 既定は float64（float32_returns=True で float32 に縮小可能）
+MONTHLY_RETURNS_DTYPES = {
+    'fund_id': 'category',
+    'monthly_return': 'float64',
+    'nav': 'float32',
+    'aum': 'float32',
+}
+
+# 日次基準価額データの型定義
+# - nav, distribution: 月次リターンの計算に用いるため float64
+# - distribution（分配金）・aum は任意カラム
+DAILY_NAV_DTYPES = {
+    'fund_id': str,
+    'nav': 'float64',
+    'distribution': 'float64',
+    'aum': 'float32',
+}
+
+
+def file_stamp(path: Path) -> dict:
+    """ファイルのサイズと更新時刻（ナノ秒）"""
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_content_hash(path: Path) -> str:
+    """ファイル内容のSHA-256ハッシュ"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_csv(csv_path: Path, parse_dates, dtype=None) -> pd.DataFrame:
+    """CSVを読み込み、日付カラムをdatetime型に変換する"""
+    df = pd.read_csv(csv_path, encoding='utf-8-sig', dtype=dtype)
+    for column in parse_dates:
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def read_csv_cached(csv_path, parse_dates=(), dtype=None, cache_dir=None, verify_hash: bool = False,
+                    use_cache: bool = True) -> pd.DataFrame:
+    """
+    列指向キャッシュを経由してCSVを読み込む
+
+    キャッシュの有効性は以下の順で判定します。
+    1. サイズ・更新時刻が記録と一致 → キャッシュを利用（verify_hash=True の場合は内容ハッシュも照合）
+    2. サイズ・更新時刻が異なる → 内容ハッシュを照合し、一致すれば記録を更新してキャッシュを利用
+    3. それ以外 → CSVを読み直してキャッシュを再作成
+
+    Parameters:
+    -----------
+    csv_path : str or Path
+        CSVファイルパス
+    parse_dates : iterable of str
+        datetime型に変換するカラム名
+    dtype : dict, optional
+        カラムごとの型指定（pd.read_csv の dtype）。キャッシュにも型ごと保存されます
+    cache_dir : str or Path, optional
+        キャッシュディレクトリ（デフォルト: CSVと同じディレクトリの .cache/）
+    verify_hash : bool
+        サイズ・更新時刻が一致する場合も内容ハッシュを照合するか
+    use_cache : bool
+        キャッシュを利用するか（False の場合はCSVを直接読み込む）
+
+    Returns:
+    --------
+    pd.DataFrame
+        読み込んだデータ
+    """
+    csv_path = Path(csv_path)
+    read_options = {'parse_dates': list(parse_dates), 'dtype': dtype}
+
+    if not use_cache or feather is None:
+        return _read_csv(csv_path, **read_options)
+
+    cache_dir = Path(cache_dir) if cache_dir is not None else csv_path.parent / CACHE_DIR_NAME
+    cache_path = cache_dir / f"{csv_path.name}.feather"
+    meta_path = cache_dir / f"{csv_path.name}.meta.json"
+
+    stamp = file_stamp(csv_path)
+    meta = _load_meta(meta_path)
+    if meta is not None and cache_path.exists() and meta.get('read_options') == read_options:
+        content_hash = None
+        if meta['stamp'] != stamp or verify_hash:
+            content_hash = file_content_hash(csv_path)
+        if content_hash is None or content_hash == meta['content_hash']:
+            if meta['stamp'] != stamp:
+                # 内容は同一（touch・コピー等）なので記録のみ更新
+                meta['stamp'] = stamp
+                _write_meta(meta_path, meta)
+            # メモリマップはファイルの読み込み用の中間バッファを省くだけで、to_pandas でデータはコピーされる
+            return feather.read_table(cache_path, memory_map=True).to_pandas()
+
+    df = _read_csv(csv_path, **read_options)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.feather.tmp')
+        feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, cache_path)
+        _write_meta(meta_path, {
+            'cache_version': CACHE_VERSION,
+            'source': csv_path.name,
+            'read_options': read_options,
+            'stamp': stamp,
+            'content_hash': file_content_hash(csv_path),
+        })
+    except OSError as e:
+        print(f"⚠ キャッシュを作成できませんでした（CSVを直接使用します）: {e}")
+
+    return df
+
+
+def _load_meta(meta_path: Path):
+    """キャッシュのメタデータを読み込む（存在しない・形式が古い場合はNone）"""
+    if not meta_path.exists():
+        return None
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('cache_version') != CACHE_VERSION:
+        return None
+    return meta
+
+
+def _write_meta(meta_path: Path, meta: dict):
+    """キャッシュのメタデータを書き込む"""
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def load_fund_attributes(data_dir, **cache_options) -> pd.DataFrame:
+    """
+    ファンド属性データ（fund_attributes.csv）の読み込み
+
+    Parameters:
+    -----------
+    data_dir : str or Path
+        データディレクトリパス
+    **cache_options
+        read_csv_cached に渡すオプション
+    """
+    attr_path = Path(data_dir) / "fund_attributes.csv"
+    if not attr_path.exists():
+        raise FileNotFoundError(f"ファンド属性データが見つかりません: {attr_path}")
+    return read_csv_cached(attr_path, **cache_options)
+
+
+def load_monthly_returns(data_dir, float32_returns: bool = False, **cache_options) -> pd.DataFrame:
+    """
+    月次リターンデータ（monthly_returns.csv）の読み込み
+
+    MONTHLY_RETURNS_DTYPES の型で読み込み、結合用の月インデックス
+    （month_index: 西暦年 × 12 + 月 - 1、int32）を付加します。
+
+    Parameters:
+    -----------
+    data_dir : str or Path
+        データディレクトリパス
+    float32_returns : bool
+        monthly_return を float32 で保持するか。
+        float32 の相対精度は約6e-8のため、月次リターン1件あたりの誤差は
+        最大でも約3e-8（CSVの小数6桁表記より小さい）、36か月の年率リターンへの
+        影響は概ね1e-7未満です。パネル計算は常に float64 で行います
+    **cache_options
+        read_csv_cached に渡すオプション
+    """
+    returns_path = Path(data_dir) / "monthly_returns.csv"
+    if not returns_path.exists():
+        raise FileNotFoundError(f"月次リターンデータが見つかりません: {returns_path}")
+    df = read_csv_cached(returns_path, parse_dates=['month_end_date'], dtype=MONTHLY_RETURNS_DTYPES,
+                         **cache_options)
+    df['month_index'] = month_ordinal(df['month_end_date'])
+    if float32_returns:
+        df['monthly_return'] = df['monthly_return'].astype(np.float32)
+    return df
+
+
+def iter_monthly_returns(data_dir, chunksize: int):
+    """
+    月次リターンデータ（monthly_returns.csv）をチャンク単位で読み込む
+
+    列指向キャッシュは使用せず、CSVを先頭から順に読みます。
+    fund_id はチャンク間でカテゴリが揃わないため文字列として読み込みます。
+
+    Parameters:
+    -----------
+    data_dir : str or Path
+        データディレクトリパス
+    chunksize : int
+        1チャンクの行数
+
+    Yields:
+    -------
+    pd.DataFrame
+        month_end_date を datetime 型に変換したチャンク
+    """
+    returns_path = Path(data_dir) / "monthly_returns.csv"
+    if not returns_path.exists():
+        raise FileNotFoundError(f"月次リターンデータが見つかりません: {returns_path}")
+    dtype = {**MONTHLY_RETURNS_DTYPES, 'fund_id': str}
+    with pd.read_csv(returns_path, encoding='utf-8-sig', dtype=dtype, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk['month_end_date'] = pd.to_datetime(chunk['month_end_date'])
+            yield chunk
+
+
+def iter_daily_nav(data_dir, chunksize: int):
+    """
+    日次基準価額データ（daily_nav.csv）をチャンク単位で読み込む
+
+    Parameters:
+    -----------
+    data_dir : str or Path
+        データディレクトリパス
+    chunksize : int
+        1チャンクの行数
+
+    Yields:
+    -------
+    pd.DataFrame
+        nav_date を datetime 型に変換したチャンク
+    """
+    nav_path = Path(data_dir) / "daily_nav.csv"
+    if not nav_path.exists():
+        raise FileNotFoundError(f"日次基準価額データが見つかりません: {nav_path}")
+    with pd.read_csv(nav_path, encoding='utf-8-sig', dtype=DAILY_NAV_DTYPES, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk['nav_date'] = pd.to_datetime(chunk['nav_date'])
+            yield chunk
+
+
+def month_ordinal(dates: pd.Series) -> np.ndarray:
+    """日付を月インデックス（西暦年 × 12 + 月 - 1、int32）に変換する"""
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int32)
+
+
+def peak_memory_mb():
+    """プロセスの最大常駐メモリ（MB）。取得できない環境ではNone"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss の単位は Linux: KB、macOS: バイト
+    return peak / (1024 ** 2) if sys.platform == 'darwin' else peak / 1024
+
+
+def report_memory(df: pd.DataFrame, peak_before):
+    """
+    読み込んだデータのメモリ使用量と、読み込み前後のプロセス最大メモリを表示する
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        読み込んだデータ
+    peak_before : float or None
+        読み込み前に peak_memory_mb() で取得した値
+    """
+    print(f"  - データサイズ: {df.memory_usage(deep=True).sum() / (1024 ** 2):.2f} MB")
+    report_peak_memory(peak_before)
+
+
+def report_peak_memory(peak_before):
+    """
+    読み込み前後のプロセス最大メモリを表示する（取得できない環境では何も表示しない）
+
+    Parameters:
+    -----------
+    peak_before : float or None
+        読み込み前に peak_memory_mb() で取得した値
+    """
+    peak_after = peak_memory_mb()
+    if peak_before is not None and peak_after is not None:
+        print(f"  - 最大メモリ（読み込み前 → 後）: {peak_before:.1f} MB → {peak_after:.1f} MB")
+
+
+class FundDataset:
+    """ファンド属性・月次リターンとリターンパネルをまとめて保持するデータセット"""
+
+    def __init__(self, fund_attributes: pd.DataFrame, monthly_returns: pd.DataFrame):
+        """
+        初期化
+
+        Parameters:
+        -----------
+        fund_attributes : pd.DataFrame
+            ファンド属性データ
+        monthly_returns : pd.DataFrame
+            月次リターンデータ
+        """
+        self.fund_attributes = fund_attributes
+        self.monthly_returns = monthly_returns
+        self._panel = None
+        self._aum = None
+
+    @classmethod
+    def load(cls, data_dir, float32_returns: bool = False, **cache_options) -> 'FundDataset':
+        """
+        データディレクトリから読み込む
+
+        Parameters:
+        -----------
+        data_dir : str or Path
+            データディレクトリパス
+        float32_returns : bool
+            monthly_return を float32 で保持するか
+        **cache_options
+            read_csv_cached に渡すオプション
+        """
+        fund_attributes = load_fund_attributes(data_dir, **cache_options)
+        monthly_returns = load_monthly_returns(data_dir, float32_returns=float32_returns, **cache_options)
+        return cls(fund_attributes, monthly_returns)
+
+    @classmethod
+    def load_daily_nav(cls, data_dir, chunksize: int = None, **cache_options) -> 'FundDataset':
+        """
+        ファンド属性と日次基準価額（daily_nav.csv）から読み込む
+
+        月次リターンは funds_core.daily.load_daily_nav_returns で月末の基準価額と
+        分配金から計算します。
+
+        Parameters:
+        -----------
+        data_dir : str or Path
+            データディレクトリパス
+        chunksize : int, optional
+            日次データの1チャンクの行数（省略時は DEFAULT_CHUNKSIZE）
+        **cache_options
+            ファンド属性の read_csv_cached に渡すオプション
+        """
+        # daily は loader に依存するため、ここで読み込む
+        from .daily import DEFAULT_CHUNKSIZE, load_daily_nav_returns
+
+        fund_attributes = load_fund_attributes(data_dir, **cache_options)
+        monthly_returns = load_daily_nav_returns(data_dir, chunksize or DEFAULT_CHUNKSIZE)
+        return cls(fund_attributes, monthly_returns)
+
+    @property
+    def panel(self) -> ReturnPanel:
+        """全期間のリターンパネル（初回参照時に構築）"""
+        if self._panel is None:
+            self._panel = ReturnPanel.from_long(self.monthly_returns)
+        return self._panel
+
+    @property
+    def aum(self) -> np.ndarray:
+        """月末AUM（panel と同じ ファンド × 月の行列、初回参照時に構築）"""
+        if self._aum is None:
+            self._aum = self.panel.expand_column(self.monthly_returns, 'aum')
+        return self._aum
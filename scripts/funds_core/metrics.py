@@ -0,0 +1,194 @@
+"""
+リスク調整後指標
+
+ファンド × 月のリターンパネルから、全ファンド・全ウィンドウの次の指標を一括で計算します。
+
+- volatility: 年率ボラティリティ（月次リターンの標本標準偏差 × √12）
+- sharpe_ratio: シャープレシオ（月次超過リターン r − rf の平均 × 12 ÷ 年率ボラティリティ）
+- sortino_ratio: ソルティノレシオ（月次超過リターンの平均 × 12 ÷ 年率下方偏差）
+- max_drawdown: 最大ドローダウン（ウィンドウ初めを起点とした累積リターンの高値からの最大下落率）
+- tracking_error: トラッキングエラー（ベンチマークとの月次リターン差の標本標準偏差 × √12）
+- information_ratio: インフォメーションレシオ（月次リターン差の平均 × 12 ÷ トラッキングエラー）
+- beta, alpha: ベンチマークに対するベータ・年率アルファ（超過リターンの回帰、alpha は月次切片 × 12）
+
+ベンチマークは同じセグメント（パッシブの対応付けキー）のパッシブファンドの月次リターンの
+等金額平均です（aggregation.segment_groups と同じ対応付け）。
+
+ウィンドウ内のモーメント（Σx, Σx², Σxy など）は月方向の累積和の差分で求め、
+ウィンドウごとの再計算は行いません。累積和の桁落ちを抑えるため、各系列は
+ファンドごとの全期間平均を引いてから累積します（分散・共分散は平行移動で不変）。
+最大ドローダウンは累積和では表せないため、ウィンドウ内の月オフセット（ウィンドウ長）だけ
+ループし、全ファンド・全ウィンドウの高値と下落率を同時に更新します。
+
+ウィンドウ内に欠損月がある（またはベンチマークがない）ファンド・ウィンドウはNaNとします。
+"""
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import segment_groups
+from .cagr import MONTHS_PER_YEAR
+from .segmentation import DEFAULT_SEGMENT_KEYS, grouped_sums
+
+RISK_METRICS = ('volatility', 'sharpe_ratio', 'sortino_ratio', 'max_drawdown',
+                'tracking_error', 'information_ratio', 'beta', 'alpha')
+
+
+def passive_benchmark(values: np.ndarray, fund_attributes: pd.DataFrame,
+                      segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None) -> np.ndarray:
+    """
+    各ファンドのベンチマーク（対応するパッシブファンドの月次リターンの等金額平均）
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        月次リターン（shape: ファンド数 × 月数、行は fund_attributes の並び順、欠損はNaN）
+    fund_attributes : pd.DataFrame
+        ファンド属性（fund_type とセグメントのキー列を含む）
+    segment_keys : sequence of str
+        セグメントのキー列
+    passive_keys : sequence of str, optional
+        パッシブファンドを対応付けるキー列（省略時は segment_keys）
+
+    Returns:
+    --------
+    np.ndarray
+        ベンチマークの月次リターン（shape: ファンド数 × 月数）。
+        対応するパッシブがない・その月にパッシブの観測がないセルはNaN
+    """
+    active, passive, passive_of = segment_groups(fund_attributes, segment_keys, passive_keys)
+    n_passive = len(passive.labels)
+    monthly = np.asarray(values, dtype=np.float64).T
+    observed = ~np.isnan(monthly)
+
+    # 月 × パッシブのグループの平均
+    with np.errstate(invalid='ignore', divide='ignore'):
+        group_means = (grouped_sums(monthly, observed, passive.codes, n_passive)
+                       / grouped_sums(np.ones(monthly.shape), observed, passive.codes, n_passive))
+
+    # アクティブは対応するパッシブのグループ、パッシブは自身のグループ
+    fund_group = np.where(passive.codes >= 0, passive.codes, -1)
+    has_active = active.codes >= 0
+    fund_group[has_active] = passive_of[active.codes[has_active]]
+
+    benchmark = np.full(monthly.T.shape, np.nan)
+    matched = fund_group >= 0
+    benchmark[matched] = group_means[:, fund_group[matched]].T
+    return benchmark
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    """月方向の累積和（先頭に0列を付加、欠損は0として加算）"""
+    prefix = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(np.nan_to_num(values), axis=1, out=prefix[:, 1:])
+    return prefix
+
+
+def _centered(values: np.ndarray) -> np.ndarray:
+    """ファンドごとの全期間平均（観測月のみ）を引いた系列"""
+    observed = ~np.isnan(values)
+    counts = observed.sum(axis=1, keepdims=True)
+    shift = np.where(observed, values, 0.0).sum(axis=1, keepdims=True) / np.maximum(counts, 1)
+    return values - shift
+
+
+def window_risk_metrics(values: np.ndarray, benchmark: np.ndarray, window_starts: np.ndarray,
+                        window_months: int, risk_free_rate: float = 0.0) -> dict:
+    """
+    全ファンド・全ウィンドウのリスク調整後指標
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        月次リターン（shape: ファンド数 × 月数、欠損はNaN）
+    benchmark : np.ndarray
+        各ファンドのベンチマークの月次リターン（values と同じ shape、passive_benchmark の出力）
+    window_starts : np.ndarray
+        ウィンドウ起点の月インデックス
+    window_months : int
+        ウィンドウ長（月数、2以上）
+    risk_free_rate : float
+        無リスク金利（年率、月次は 1/12）
+
+    Returns:
+    --------
+    dict
+        RISK_METRICS の各指標（shape: ファンド数 × ウィンドウ数）
+    """
+    if window_months < 2:
+        raise ValueError("リスク指標のウィンドウ長は2か月以上である必要があります")
+    values = np.asarray(values, dtype=np.float64)
+    benchmark = np.asarray(benchmark, dtype=np.float64)
+    window_starts = np.asarray(window_starts)
+    window_ends = window_starts + window_months
+    n = window_months
+    rf = risk_free_rate / MONTHS_PER_YEAR
+
+    def window_sums(series):
+        prefix = _prefix(series)
+        return prefix[:, window_ends] - prefix[:, window_starts]
+
+    # ウィンドウ全期間の観測がある（ベンチマークも含む）ファンド・ウィンドウのみ
+    complete = window_sums((~np.isnan(values)).astype(np.float64)) == n
+    benchmarked = complete & (window_sums((~np.isnan(benchmark)).astype(np.float64)) == n)
+
+    excess = values - rf
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 分散・共分散は平均を引いた系列の Σx, Σx², Σxy から（平行移動で不変）
+        x, y = _centered(values), _centered(benchmark)
+        active = x - y
+        sum_x, sum_y, sum_a = window_sums(x), window_sums(y), window_sums(active)
+        var_x = (window_sums(x * x) - sum_x ** 2 / n) / (n - 1)
+        var_y = (window_sums(y * y) - sum_y ** 2 / n) / (n - 1)
+        var_a = (window_sums(active * active) - sum_a ** 2 / n) / (n - 1)
+        cov_xy = (window_sums(x * y) - sum_x * sum_y / n) / (n - 1)
+
+        mean_excess = window_sums(excess) / n
+        mean_benchmark_excess = window_sums(benchmark - rf) / n
+        mean_active = window_sums(values - benchmark) / n
+        downside = np.sqrt(window_sums(np.minimum(excess, 0.0) ** 2) / n)
+
+        volatility = np.sqrt(np.maximum(var_x, 0.0) * MONTHS_PER_YEAR)
+        tracking_error = np.sqrt(np.maximum(var_a, 0.0) * MONTHS_PER_YEAR)
+        beta = cov_xy / var_y
+        metrics = {
+            'volatility': volatility,
+            'sharpe_ratio': mean_excess * MONTHS_PER_YEAR / volatility,
+            'sortino_ratio': mean_excess * np.sqrt(MONTHS_PER_YEAR) / downside,
+            'max_drawdown': window_max_drawdowns(values, window_starts, window_months),
+            'tracking_error': tracking_error,
+            'information_ratio': mean_active * MONTHS_PER_YEAR / tracking_error,
+            'beta': beta,
+            'alpha': (mean_excess - beta * mean_benchmark_excess) * MONTHS_PER_YEAR,
+        }
+
+    for name, metric in metrics.items():
+        mask = benchmarked if name in ('tracking_error', 'information_ratio', 'beta', 'alpha') else complete
+        metric[~mask | ~np.isfinite(metric)] = np.nan
+    return metrics
+
+
+def window_max_drawdowns(values: np.ndarray, window_starts: np.ndarray, window_months: int) -> np.ndarray:
+    """
+    全ファンド・全ウィンドウの最大ドローダウン（正の値、下落がなければ0）
+
+    ウィンドウ初めの資産を1とし、対数リターン累積和の差分で各月末の資産を求めて、
+    それまでの高値からの下落率の最大値をとります。
+
+    Returns:
+    --------
+    np.ndarray
+        最大ドローダウン（shape: ファンド数 × ウィンドウ数）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    window_starts = np.asarray(window_starts)
+    log_prefix = _prefix(np.log1p(values))
+
+    base = log_prefix[:, window_starts]
+    peak = np.zeros((values.shape[0], len(window_starts)))
+    worst = np.zeros_like(peak)
+    for offset in range(1, window_months + 1):
+        level = log_prefix[:, window_starts + offset] - base
+        peak = np.maximum(peak, level)
+        worst = np.maximum(worst, peak - level)
+    return -np.expm1(-worst)
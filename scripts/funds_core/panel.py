@@ -0,0 +1,207 @@
+"""
+ファンド × 月のリターンパネル
+
+縦持ち（fund_id, month_end_date, monthly_return）の月次リターンを
+ファンド × 月の2次元NumPy配列に一度だけ変換し、
+全ファンド・全ウィンドウの計算をベクトル演算でまとめて行うための基礎構造です。
+"""
+
+import pandas as pd
+import numpy as np
+
+# 年率リターンの結果表に付加するファンド属性
+FUND_ATTRIBUTE_COLUMNS = ['fund_id', 'fund_name', 'fund_type', 'currency_hedge', 'expense_ratio', 'aum_latest']
+
+
+class ReturnPanel:
+    """ファンド × 月の月次リターンパネル"""
+
+    def __init__(self, fund_ids: pd.Index, months: pd.Index, values: np.ndarray, observed: np.ndarray):
+        """
+        初期化
+
+        Parameters:
+        -----------
+        fund_ids : pd.Index
+            行（ファンド）のfund_id
+        months : pd.Index
+            列（月末日付）。昇順
+        values : np.ndarray
+            月次リターン（shape: ファンド数 × 月数、欠損はNaN）
+        observed : np.ndarray
+            観測済みセルのブールマスク（values と同じshape）
+        """
+        self.fund_ids = fund_ids
+        self.months = months
+        self.values = values
+        self.observed = observed
+        self._prefix_sums = None
+
+    @classmethod
+    def from_long(cls, monthly_returns: pd.DataFrame, value_col: str = 'monthly_return') -> 'ReturnPanel':
+        """
+        縦持ちの月次リターンからパネルを構築する
+
+        月次リターンがNaNのレコードは欠損月として扱います。
+
+        Parameters:
+        -----------
+        monthly_returns : pd.DataFrame
+            fund_id, month_end_date, value_col を含む月次リターン
+            （month_index があれば月の結合キーとして使用）
+        value_col : str
+            パネルに展開するカラム名
+
+        Returns:
+        --------
+        ReturnPanel
+            構築したパネル
+        """
+        fund_codes, fund_ids = pd.factorize(monthly_returns['fund_id'], sort=True)
+        if isinstance(fund_ids, pd.CategoricalIndex):
+            fund_ids = fund_ids.astype(fund_ids.categories.dtype)
+
+        if 'month_index' in monthly_returns.columns:
+            # 月インデックス（int32）で結合し、各月の表示日付はその月の最終月末日付とする
+            month_codes, _ = pd.factorize(monthly_returns['month_index'], sort=True)
+            months = pd.Series(monthly_returns['month_end_date'].to_numpy()).groupby(month_codes).max().to_numpy()
+        else:
+            month_codes, months = pd.factorize(monthly_returns['month_end_date'], sort=True)
+        n_funds, n_months = len(fund_ids), len(months)
+
+        # 同一ファンド・同一月の重複レコードはパネル化できない
+        flat_index = fund_codes.astype(np.int64) * n_months + month_codes
+        if len(np.unique(flat_index)) != len(flat_index):
+            raise ValueError("同一ファンド・同一月末日付の重複レコードが存在します")
+
+        values = np.full((n_funds, n_months), np.nan)
+        values[fund_codes, month_codes] = monthly_returns[value_col].to_numpy(dtype=np.float64)
+        observed = ~np.isnan(values)
+
+        return cls(pd.Index(fund_ids, name='fund_id'), pd.Index(months, name='month_end_date'), values, observed)
+
+    @property
+    def n_funds(self) -> int:
+        """ファンド数"""
+        return self.values.shape[0]
+
+    @property
+    def n_months(self) -> int:
+        """月数"""
+        return self.values.shape[1]
+
+    def observation_counts(self) -> np.ndarray:
+        """ファンドごとの観測月数"""
+        return self.observed.sum(axis=1)
+
+    def log_returns(self) -> np.ndarray:
+        """対数リターン log(1 + r_t)（欠損月は0）"""
+        return np.where(self.observed, np.log1p(self.values), 0.0)
+
+    def log_return_sums(self) -> np.ndarray:
+        """ファンドごとの対数リターン合計 Σlog(1 + r_t)（欠損月は0として加算）"""
+        return self.log_returns().sum(axis=1)
+
+    def prefix_sums(self) -> tuple:
+        """
+        対数リターンと観測月数の累積和（先頭に0列を付加）
+
+        任意の区間 [s, e) の合計は prefix[:, e] - prefix[:, s] で求まります。
+        一度計算した累積和は保持し、複数のウィンドウ長で共有します。
+
+        Returns:
+        --------
+        tuple
+            (対数リターン累積和, 観測月数累積和)。shape: ファンド数 × (月数 + 1)
+        """
+        if self._prefix_sums is None:
+            log_prefix = np.zeros((self.n_funds, self.n_months + 1))
+            np.cumsum(self.log_returns(), axis=1, out=log_prefix[:, 1:])
+            count_prefix = np.zeros((self.n_funds, self.n_months + 1), dtype=np.int64)
+            np.cumsum(self.observed, axis=1, out=count_prefix[:, 1:])
+            self._prefix_sums = (log_prefix, count_prefix)
+        return self._prefix_sums
+
+    def window_log_sums(self, window_starts: np.ndarray, window_months: int) -> tuple:
+        """
+        全ウィンドウ・全ファンドの対数リターン合計と観測月数を一括計算する
+
+        Parameters:
+        -----------
+        window_starts : np.ndarray
+            ウィンドウ起点の月インデックス
+        window_months : int
+            ウィンドウ長（月数）
+
+        Returns:
+        --------
+        tuple
+            (対数リターン合計, 観測月数)。shape: ファンド数 × ウィンドウ数
+        """
+        window_starts = np.asarray(window_starts)
+        window_ends = window_starts + window_months
+        log_prefix, count_prefix = self.prefix_sums()
+        log_sums = log_prefix[:, window_ends] - log_prefix[:, window_starts]
+        counts = count_prefix[:, window_ends] - count_prefix[:, window_starts]
+        return log_sums, counts
+
+    def expand_column(self, monthly_returns: pd.DataFrame, value_col: str) -> np.ndarray:
+        """
+        縦持ちデータの列をパネルと同じ ファンド × 月 の行列に展開する
+
+        パネルにないファンド・月のレコードは無視し、レコードのないセルはNaNとします。
+
+        Parameters:
+        -----------
+        monthly_returns : pd.DataFrame
+            fund_id, month_end_date, value_col を含む月次データ
+            （month_index があれば月の結合キーとして使用）
+        value_col : str
+            展開するカラム名（例: aum）
+
+        Returns:
+        --------
+        np.ndarray
+            shape: ファンド数 × 月数
+        """
+        if 'month_index' in monthly_returns.columns:
+            record_months = monthly_returns['month_index'].to_numpy()
+        else:
+            dates = monthly_returns['month_end_date'].dt
+            record_months = (dates.year * 12 + dates.month - 1).to_numpy()
+        panel_months = pd.Index(self.months.year * 12 + self.months.month - 1)
+
+        rows = self.fund_ids.get_indexer(monthly_returns['fund_id'])
+        columns = panel_months.get_indexer(record_months)
+        in_panel = (rows >= 0) & (columns >= 0)
+
+        matrix = np.full((self.n_funds, self.n_months), np.nan)
+        matrix[rows[in_panel], columns[in_panel]] = monthly_returns[value_col].to_numpy(dtype=np.float64)[in_panel]
+        return matrix
+
+    def align_attributes(self, fund_attributes: pd.DataFrame, extra_columns=()) -> tuple:
+        """
+        ファンド属性とパネル行の対応付け
+
+        属性データの並び順を維持し、パネルに存在するファンドのみを残します。
+        fund_id が重複する場合は先頭の行を採用します。
+
+        Parameters:
+        -----------
+        fund_attributes : pd.DataFrame
+            ファンド属性データ
+        extra_columns : sequence of str
+            FUND_ATTRIBUTE_COLUMNS に加えて残す列（セグメントのキーなど。属性データにない列は無視）
+
+        Returns:
+        --------
+        tuple
+            (FUND_ATTRIBUTE_COLUMNS（と extra_columns）の属性表, 各行に対応するパネル行インデックス)
+        """
+        columns = FUND_ATTRIBUTE_COLUMNS + [column for column in extra_columns
+                                            if column in fund_attributes.columns
+                                            and column not in FUND_ATTRIBUTE_COLUMNS]
+        attributes = fund_attributes.drop_duplicates('fund_id')[columns]
+        panel_rows = self.fund_ids.get_indexer(attributes['fund_id'])
+        in_panel = panel_rows >= 0
+        return attributes[in_panel].reset_index(drop=True), panel_rows[in_panel]
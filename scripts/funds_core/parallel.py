@@ -0,0 +1,171 @@
+"""
+ローリングウィンドウの並列計算
+
+リターンパネルの累積和（ReturnPanel.prefix_sums の形式）を
+multiprocessing.shared_memory に一度だけ配置し、プロセスプールの各ワーカーは
+共有メモリを参照してウィンドウの塊を分析します。タスクとして送るのは
+ウィンドウ起点のインデックスだけで、DataFrame をタスクごとに pickle しません。
+ウィンドウごとのAUM加重のウェイト（ファンド × ウィンドウ）を使う場合は、それも共有メモリに置きます。
+途中設定・償還ファンドを含める場合は、存続区間（universe.UniverseIndex）を初期化時に渡し、
+ワーカーがウィンドウの塊ごとに存続判定を計算します。
+結果はウィンドウ順に並べ直して返すため、ワーカー数によらず同じ順序になります。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .aggregation import aggregate_windows
+from .cagr import prefix_annualized_returns
+from .segmentation import DEFAULT_SEGMENT_KEYS
+from .universe import DEFAULT_PARTIAL_HISTORY, MIN_PARTIAL_MONTHS, partial_history_returns
+
+# 1ワーカーあたりのタスク（ウィンドウの塊）数の目安
+CHUNKS_PER_WORKER = 4
+
+# ワーカープロセス内の状態（_init_worker で設定）
+_worker_state = {}
+
+
+class SharedArray:
+    """共有メモリ上に配置したNumPy配列"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: tuple, dtype):
+        self.shm = shm
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, source: np.ndarray) -> 'SharedArray':
+        """配列を新しい共有メモリブロックにコピーする"""
+        source = np.ascontiguousarray(source)
+        shm = shared_memory.SharedMemory(create=True, size=max(source.nbytes, 1))
+        shared = cls(shm, source.shape, source.dtype)
+        shared.array[...] = source
+        return shared
+
+    @classmethod
+    def attach(cls, spec: tuple) -> 'SharedArray':
+        """spec（名前, shape, dtype）で既存の共有メモリブロックに接続する"""
+        name, shape, dtype = spec
+        return cls(shared_memory.SharedMemory(name=name), shape, np.dtype(dtype))
+
+    @property
+    def spec(self) -> tuple:
+        """ワーカーに渡す接続情報"""
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def release(self, unlink: bool = False):
+        """配列の参照を外して共有メモリを閉じる（作成側は unlink=True で解放）"""
+        self.array = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _init_worker(prefix_specs, weights_spec, attributes, months, window_months, segment_options,
+                 universe_options):
+    """ワーカー初期化：共有メモリに接続し、属性データを保持する"""
+    _worker_state['shared'] = [SharedArray.attach(spec) for spec in prefix_specs]
+    _worker_state['weights'] = SharedArray.attach(weights_spec) if weights_spec is not None else None
+    _worker_state['attributes'] = attributes
+    _worker_state['months'] = months
+    _worker_state['window_months'] = window_months
+    _worker_state['segment_options'] = segment_options
+    _worker_state['universe_options'] = universe_options
+
+
+def _analyze_chunk(window_indices: np.ndarray, window_starts: np.ndarray) -> tuple:
+    """
+    ウィンドウの塊を分析する（ワーカープロセスで実行）
+
+    Returns:
+    --------
+    tuple
+        (塊の先頭ウィンドウ番号, ウィンドウ × セグメントごとの集計結果)
+    """
+    log_prefix, count_prefix = (shared.array for shared in _worker_state['shared'])
+    months = _worker_state['months']
+    window_months = _worker_state['window_months']
+
+    weights = _worker_state['weights']
+    window_weights = weights.array[:, window_indices] if weights is not None else None
+
+    universe_options = _worker_state['universe_options']
+    if universe_options is None:
+        rolling_returns = prefix_annualized_returns(log_prefix, count_prefix, window_starts, window_months)
+    else:
+        alive = universe_options['universe'].window_alive(months, window_starts, window_months)
+        rolling_returns = partial_history_returns(log_prefix, count_prefix, window_starts, window_months, alive,
+                                                  universe_options['partial_history'], universe_options['min_months'])
+    results = aggregate_windows(rolling_returns, _worker_state['attributes'],
+                                months[window_starts], months[window_starts + window_months - 1],
+                                window_weights=window_weights, **_worker_state['segment_options'])
+    return int(window_indices[0]), results
+
+
+def analyze_windows_parallel(log_prefix: np.ndarray, count_prefix: np.ndarray, attributes,
+                             months, window_starts: np.ndarray, window_months: int, workers: int,
+                             window_weights: np.ndarray = None, segment_keys=DEFAULT_SEGMENT_KEYS,
+                             passive_keys=None, universe=None, partial_history: str = DEFAULT_PARTIAL_HISTORY,
+                             min_months: int = MIN_PARTIAL_MONTHS) -> list:
+    """
+    全ウィンドウをプロセスプールで分析する
+
+    Parameters:
+    -----------
+    log_prefix, count_prefix : np.ndarray
+        対数リターン・観測月数の累積和（行は attributes の並び順に揃えたもの）
+    attributes : pd.DataFrame
+        ファンド属性（ワーカー初期化時に1回だけ各ワーカーへ渡す）
+    months : pd.DatetimeIndex
+        パネルの月末日付
+    window_starts : np.ndarray
+        ウィンドウ起点の月インデックス
+    window_months : int
+        ウィンドウ長（月数）
+    workers : int
+        ワーカープロセス数
+    window_weights : np.ndarray, optional
+        ウィンドウごとのAUM加重のウェイト（shape: ファンド数 × ウィンドウ数、行は attributes の並び順）。
+        省略時は attributes の aum_latest
+    segment_keys, passive_keys : sequence of str
+        セグメントのキー列・パッシブを対応付けるキー列（aggregation.aggregate_windows と同じ）
+    universe : UniverseIndex, optional
+        ファンドの存続区間（行は attributes の並び順）。partial_history が 'exclude' 以外の場合に必要
+    partial_history : str
+        途中設定・償還ファンドの扱い（universe.PARTIAL_HISTORY_TREATMENTS）
+    min_months : int
+        途中設定・償還ファンドを含めるウィンドウ内の最低データ月数
+
+    Returns:
+    --------
+    list
+        ウィンドウ × セグメントごとの集計結果（ウィンドウ順）
+    """
+    window_starts = np.asarray(window_starts)
+    n_chunks = min(len(window_starts), workers * CHUNKS_PER_WORKER)
+    chunks = np.array_split(np.arange(len(window_starts)), n_chunks) if n_chunks else []
+
+    universe_options = None
+    if partial_history != 'exclude':
+        universe_options = {'universe': universe, 'partial_history': partial_history, 'min_months': min_months}
+
+    shared = [SharedArray.create(log_prefix), SharedArray.create(count_prefix)]
+    weights = SharedArray.create(window_weights) if window_weights is not None else None
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=([s.spec for s in shared], weights.spec if weights is not None else None,
+                      attributes, months, window_months,
+                      {'segment_keys': segment_keys, 'passive_keys': passive_keys}, universe_options)
+        ) as executor:
+            futures = [executor.submit(_analyze_chunk, chunk, window_starts[chunk]) for chunk in chunks]
+            chunk_results = [future.result() for future in futures]
+    finally:
+        for s in shared + ([weights] if weights is not None else []):
+            s.release(unlink=True)
+
+    chunk_results.sort(key=lambda item: item[0])
+    return [result for _, results in chunk_results for result in results]
@@ -0,0 +1,170 @@
+"""
+並べ替え（permutation）検定エンジン
+
+比較グループ（ウィンドウ × ヘッジ区分 × セグメントなど）ごとに、アクティブ・パッシブの
+ラベルを並べ替えて平均差の両側 p値を求めます。入力は significance.two_sample_tests と
+同じ NaN 埋めの行列（グループ数 × 標本数）です。
+
+- 正確検定：組合せ数 C(n1 + n2, n1) が exact_limit 以下のグループは全組合せを列挙
+- モンテカルロ：それ以外は並べ替えの添字配列をバッチ単位で生成し、
+  p値の Clopper-Pearson 区間が有意水準 alpha を明確に上回る／下回った時点で打ち切り
+  （max_permutations に達した場合も終了）
+
+両側 p値は並べ替え後の |平均差| が観測値の |平均差| 以上となる割合です
+（scipy.stats.permutation_test で統計量を |平均差|、alternative='greater' とした場合と同じ）。
+モンテカルロの p値は (超過回数 + 1) / (並べ替え回数 + 1) とします。
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+from scipy import special, stats
+
+# 正確検定で列挙する組合せ数の上限
+EXACT_LIMIT = 50000
+# モンテカルロの1バッチあたりの並べ替え回数・上限回数
+BATCH_SIZE = 500
+MAX_PERMUTATIONS = 100000
+# 早期打ち切りの判定に用いる Clopper-Pearson 区間の信頼水準
+STOP_CONFIDENCE = 0.999
+# 1回の処理で展開する要素数の目安（グループ × バッチ × 標本数）
+MAX_BATCH_ELEMENTS = 4_000_000
+# 並べ替え統計量と観測値の同値判定の許容誤差
+TOLERANCE = 1e-12
+
+# 各フィールドは shape: グループ数 の配列
+PermutationTests = namedtuple('PermutationTests', ['statistic', 'p_value', 'n_permutations', 'exact'])
+
+
+@lru_cache(maxsize=None)
+def _combinations(n: int, k: int) -> np.ndarray:
+    """n 個から k 個を選ぶ全組合せの添字（shape: 組合せ数 × k）"""
+    return np.array(list(combinations(range(n), k)), dtype=np.intp).reshape(-1, k)
+
+
+def clopper_pearson(successes: np.ndarray, trials: np.ndarray, confidence: float) -> tuple:
+    """二項比率の Clopper-Pearson 区間（下限, 上限）"""
+    alpha = 1 - confidence
+    with np.errstate(invalid='ignore'):
+        lower = np.where(successes > 0, stats.beta.ppf(alpha / 2, successes, trials - successes + 1), 0.0)
+        upper = np.where(successes < trials, stats.beta.ppf(1 - alpha / 2, successes + 1, trials - successes), 1.0)
+    return lower, upper
+
+
+def _exact_counts(combined: np.ndarray, n1: int, n2: int, observed: np.ndarray) -> tuple:
+    """同じ標本サイズのグループについて全組合せを列挙し、|平均差| が観測値以上の回数を数える"""
+    combos = _combinations(n1 + n2, n1)
+    totals = combined.sum(axis=1)
+    chunk = max(1, MAX_BATCH_ELEMENTS // combos.size)
+    counts = np.empty(len(combined), dtype=np.int64)
+    for start in range(0, len(combined), chunk):
+        rows = slice(start, start + chunk)
+        x_sums = combined[rows][:, combos].sum(axis=2)
+        diffs = x_sums / n1 - (totals[rows, None] - x_sums) / n2
+        counts[rows] = (np.abs(diffs) >= np.abs(observed[rows, None]) - TOLERANCE).sum(axis=1)
+    return counts, len(combos)
+
+
+def _monte_carlo_counts(combined: np.ndarray, valid: np.ndarray, n1: np.ndarray, n2: np.ndarray,
+                        observed: np.ndarray, rng: np.random.Generator, alpha: float,
+                        batch_size: int, max_permutations: int) -> tuple:
+    """並べ替えをバッチ単位で生成し、早期打ち切り付きで超過回数を数える"""
+    n_groups, width = combined.shape
+    counts = np.zeros(n_groups, dtype=np.int64)
+    trials = np.zeros(n_groups, dtype=np.int64)
+    filled = np.where(valid, combined, 0.0)
+    totals = filled.sum(axis=1)
+    positions = np.arange(width)
+
+    running = np.ones(n_groups, dtype=bool)
+    rows_per_step = max(1, MAX_BATCH_ELEMENTS // (batch_size * max(width, 1)))
+    while running.any():
+        rows = np.flatnonzero(running)[:rows_per_step]
+
+        # 欠損位置は +inf のキーで末尾に回し、有効な値だけを並べ替える
+        keys = rng.random((len(rows), batch_size, width))
+        keys[~np.broadcast_to(valid[rows][:, None, :], keys.shape)] = np.inf
+        order = np.argsort(keys, axis=2)
+        permuted = np.take_along_axis(np.broadcast_to(filled[rows][:, None, :], keys.shape), order, axis=2)
+
+        in_x = positions < n1[rows][:, None, None]
+        x_sums = np.where(in_x, permuted, 0.0).sum(axis=2)
+        diffs = x_sums / n1[rows][:, None] - (totals[rows][:, None] - x_sums) / n2[rows][:, None]
+        counts[rows] += (np.abs(diffs) >= np.abs(observed[rows])[:, None] - TOLERANCE).sum(axis=1)
+        trials[rows] += batch_size
+
+        # p値の区間が alpha を明確に上回る／下回ったグループは打ち切る
+        lower, upper = clopper_pearson(counts[rows] + 1, trials[rows] + 1, STOP_CONFIDENCE)
+        done = (upper < alpha) | (lower > alpha) | (trials[rows] >= max_permutations)
+        running[rows[done]] = False
+
+    return counts, trials
+
+
+def permutation_tests(x: np.ndarray, y: np.ndarray, rng: np.random.Generator = None,
+                      alpha: float = 0.05, exact_limit: int = EXACT_LIMIT,
+                      batch_size: int = BATCH_SIZE, max_permutations: int = MAX_PERMUTATIONS) -> PermutationTests:
+    """
+    全グループの平均差の並べ替え検定（両側）を一括で行う
+
+    Parameters:
+    -----------
+    x : np.ndarray
+        比較対象（例: アクティブ）のリターン（shape: グループ数 × 標本数、NaN は欠損）
+    y : np.ndarray
+        基準（例: パッシブ）のリターン（shape: グループ数 × 標本数、NaN は欠損）
+    rng : np.random.Generator, optional
+        モンテカルロに用いる乱数生成器（省略時はシード0）
+    alpha : float
+        早期打ち切りの判定に用いる有意水準
+    exact_limit : int
+        全組合せを列挙する組合せ数の上限
+    batch_size : int
+        モンテカルロの1バッチあたりの並べ替え回数
+    max_permutations : int
+        モンテカルロの並べ替え回数の上限
+
+    Returns:
+    --------
+    PermutationTests
+        平均差（x − y）、p値、並べ替え回数、正確検定か。計算できないグループはNaN
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.ndim != 2 or y.ndim != 2 or len(x) != len(y):
+        raise ValueError("x と y はグループ数が等しい2次元配列である必要があります")
+    rng = np.random.default_rng(0) if rng is None else rng
+
+    combined = np.concatenate([x, y], axis=1)
+    valid = ~np.isnan(combined)
+    n1 = (~np.isnan(x)).sum(axis=1)
+    n2 = (~np.isnan(y)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistic = np.nansum(x, axis=1) / n1 - np.nansum(y, axis=1) / n2
+
+    p_value = np.full(len(x), np.nan)
+    n_permutations = np.zeros(len(x), dtype=np.int64)
+    testable = (n1 > 0) & (n2 > 0)
+    exact = testable & (special.comb(n1 + n2, n1) <= exact_limit)
+
+    # 正確検定：有効な値を先頭に詰め、標本サイズが同じグループをまとめて列挙
+    for size1, size2 in set(zip(n1[exact].tolist(), n2[exact].tolist())):
+        rows = np.flatnonzero(exact & (n1 == size1) & (n2 == size2))
+        packed = np.stack([combined[row][valid[row]] for row in rows])
+        counts, total = _exact_counts(packed, size1, size2, statistic[rows])
+        p_value[rows] = counts / total
+        n_permutations[rows] = total
+
+    monte_carlo = testable & ~exact
+    if monte_carlo.any():
+        rows = np.flatnonzero(monte_carlo)
+        counts, trials = _monte_carlo_counts(
+            combined[rows], valid[rows], n1[rows], n2[rows], statistic[rows],
+            rng, alpha, batch_size, max_permutations
+        )
+        p_value[rows] = (counts + 1) / (trials + 1)
+        n_permutations[rows] = trials
+
+    return PermutationTests(statistic, p_value, n_permutations, exact)
@@ -0,0 +1,219 @@
+"""
+上位抽出・順位付けカーネル
+
+ウィンドウ × ファンドのリターン行列（NaN は対象外のファンド）について、
+全ウィンドウの上位 ⌈top_fraction × N⌉ 本の抽出を一括で行います。
+ウィンドウごとに DataFrame を並べ替える代わりに、np.partition で
+閾値（上位 k 番目のリターン）だけを求めます。
+
+同順位の扱い（全関数共通）：
+    リターンの降順に並べ、同じリターンの場合は列番号（元の並び順）の
+    小さいファンドを上位とします。これは rank_active_funds の安定ソートと同じ規則で、
+    閾値と同じリターンのファンドが上位枠をまたぐ場合は、列番号の小さい順に
+    枠が埋まるまで上位に含めます。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# member: 上位に含まれるか（shape: ウィンドウ数 × ファンド数）
+# threshold: 上位 k 番目のリターン（対象ファンドがないウィンドウはNaN）
+# top_count: 上位本数 k、valid_count: 対象ファンド数 N
+TopSelection = namedtuple('TopSelection', ['member', 'threshold', 'top_count', 'valid_count'])
+
+
+def top_counts(valid_count: np.ndarray, top_fraction: float) -> np.ndarray:
+    """上位本数 ⌈top_fraction × N⌉"""
+    return np.ceil(top_fraction * np.asarray(valid_count)).astype(np.int64)
+
+
+def select_top_fraction(values: np.ndarray, top_fraction: float = 0.5) -> TopSelection:
+    """
+    各行（ウィンドウ）の上位 ⌈top_fraction × N⌉ 本を抽出する
+
+    NaN は -inf に置き換えて np.partition で上位 k 番目の値を閾値として求め、
+    閾値を上回るファンドと、閾値に等しいファンドのうち列番号の小さいものを
+    上位とします。k は行ごとに異なるため、行に現れる k の種類だけ
+    partition の位置を指定します（並べ替え全体は行いません）。
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        リターン行列（shape: ウィンドウ数 × ファンド数）
+    top_fraction : float
+        上位として抽出する割合
+
+    Returns:
+    --------
+    TopSelection
+        上位フラグ・閾値・上位本数・対象ファンド数
+    """
+    return select_top_fractions(values, (top_fraction,))[0]
+
+
+def select_top_fractions(values: np.ndarray, top_fractions) -> list:
+    """
+    複数の割合（上位10％・25％・50％など）の上位抽出を1回の np.partition から求める
+
+    全割合・全行の k をまとめて partition の位置に指定するため、割合の数によらず
+    部分並べ替えは1回です。各割合の上位フラグ・閾値は select_top_fraction と同じです。
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        リターン行列（shape: ウィンドウ数 × ファンド数）
+    top_fractions : sequence of float
+        上位として抽出する割合
+
+    Returns:
+    --------
+    list of TopSelection
+        top_fractions と同じ順の抽出結果
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2:
+        raise ValueError("values はウィンドウ × ファンドの2次元配列である必要があります")
+    n_rows, n_cols = values.shape
+
+    valid = ~np.isnan(values)
+    valid_count = valid.sum(axis=1)
+    counts = [top_counts(valid_count, top_fraction) for top_fraction in top_fractions]
+
+    # 昇順で n_cols - k 番目が上位 k 番目の値（NaN は -inf として末尾側から除外）
+    kths = [n_cols - top_count[top_count > 0] for top_count in counts]
+    partitioned = None
+    if n_cols > 0 and any(len(kth) for kth in kths):
+        filled = np.where(valid, values, -np.inf)
+        partitioned = np.partition(filled, np.unique(np.concatenate(kths)), axis=1)
+
+    selections = []
+    for top_count, kth in zip(counts, kths):
+        threshold = np.full(n_rows, np.nan)
+        has_top = top_count > 0
+        if not len(kth):
+            selections.append(TopSelection(np.zeros(values.shape, dtype=bool), threshold,
+                                           top_count, valid_count))
+            continue
+        threshold[has_top] = partitioned[has_top, kth]
+
+        above = valid & (values > threshold[:, None])
+        tied = valid & (values == threshold[:, None])
+        # 閾値と同値のファンドは列番号の小さい順に残り枠まで上位に含める
+        remaining = top_count - above.sum(axis=1)
+        member = above | (tied & (np.cumsum(tied, axis=1) <= remaining[:, None]))
+        selections.append(TopSelection(member, threshold, top_count, valid_count))
+    return selections
+
+
+def select_top_fraction_grouped(values: np.ndarray, group_codes: np.ndarray, n_groups: int,
+                                top_fraction: float = 0.5) -> TopSelection:
+    """
+    各行（ウィンドウ）・各グループの上位 ⌈top_fraction × N⌉ 本を一括で抽出する
+
+    グループごとにそのグループの列だけを取り出して select_top_fractions を適用します
+    （グループ内の列は元の並び順のまま取り出すため、同順位の規則も変わりません）。
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        リターン行列（shape: ウィンドウ数 × ファンド数）
+    group_codes : np.ndarray
+        各ファンドのグループ番号（ファンド数、-1 は対象外）
+    n_groups : int
+        グループ数
+    top_fraction : float
+        上位として抽出する割合
+
+    Returns:
+    --------
+    TopSelection
+        上位フラグ（ウィンドウ数 × ファンド数）。閾値・上位本数・対象ファンド数は
+        shape: ウィンドウ数 × グループ数
+    """
+    return select_top_fractions_grouped(values, group_codes, n_groups, (top_fraction,))[0]
+
+
+def select_top_fractions_grouped(values: np.ndarray, group_codes: np.ndarray, n_groups: int,
+                                 top_fractions) -> list:
+    """
+    複数の割合（上位10％・25％・50％など）の上位抽出をグループごとに1回の np.partition から求める
+
+    グループごとの計算量はそのグループのファンド数に比例し（全体の並べ替えは行いません）、
+    割合の数が増えても partition はグループごとに1回です。順位そのものが必要な場合は
+    grouped_descending_ranks を用います。
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        リターン行列（shape: ウィンドウ数 × ファンド数）
+    group_codes : np.ndarray
+        各ファンドのグループ番号（ファンド数、-1 は対象外）
+    n_groups : int
+        グループ数
+    top_fractions : sequence of float
+        上位として抽出する割合
+
+    Returns:
+    --------
+    list of TopSelection
+        top_fractions と同じ順の抽出結果（select_top_fraction_grouped と同じ形式）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2:
+        raise ValueError("values はウィンドウ × ファンドの2次元配列である必要があります")
+    group_codes = np.asarray(group_codes)
+    n_rows = values.shape[0]
+    shape = (n_rows, n_groups)
+
+    members = [np.zeros(values.shape, dtype=bool) for _ in top_fractions]
+    thresholds = [np.full(shape, np.nan) for _ in top_fractions]
+    top_count = [np.zeros(shape, dtype=np.int64) for _ in top_fractions]
+    valid_count = np.zeros(shape, dtype=np.int64)
+    for group in range(n_groups):
+        cols = np.flatnonzero(group_codes == group)
+        for i, selection in enumerate(select_top_fractions(values[:, cols], top_fractions)):
+            members[i][:, cols] = selection.member
+            thresholds[i][:, group] = selection.threshold
+            top_count[i][:, group] = selection.top_count
+            valid_count[:, group] = selection.valid_count
+
+    return [TopSelection(member, threshold, count, valid_count)
+            for member, threshold, count in zip(members, thresholds, top_count)]
+
+
+def grouped_descending_ranks(values: np.ndarray, group_codes: np.ndarray) -> np.ndarray:
+    """
+    各行（ウィンドウ）・各グループ内のリターン降順の順位（1始まり）
+
+    全グループを (行, グループ) → リターン降順 → 列番号 の1回の lexsort で順位付けします。
+    同順位は列番号の小さいファンドを上位とします（モジュール冒頭の同順位の規則）。
+    NaN のファンド・グループ番号が負のファンドは順位 0 とします。
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        リターン行列（shape: ウィンドウ数 × ファンド数、1次元の場合は1ウィンドウ）
+    group_codes : np.ndarray
+        各ファンドのグループ番号（ファンド数、-1 は対象外）
+
+    Returns:
+    --------
+    np.ndarray
+        順位（values と同じ shape）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    matrix = np.atleast_2d(values)
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    n_groups = int(group_codes.max(initial=-1)) + 1
+
+    rows, cols = np.nonzero(~np.isnan(matrix) & (group_codes >= 0))
+    cells = rows * n_groups + group_codes[cols]
+    order = np.lexsort((cols, -matrix[rows, cols], cells))
+    sorted_cells = cells[order]
+    counts = np.bincount(cells, minlength=matrix.shape[0] * n_groups)
+    offsets = np.cumsum(counts) - counts
+
+    ranks = np.zeros(matrix.shape, dtype=np.int64)
+    ranks[rows[order], cols[order]] = np.arange(1, len(order) + 1) - offsets[sorted_cells]
+    return ranks.reshape(values.shape)
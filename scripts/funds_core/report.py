@@ -0,0 +1,194 @@
+"""
+HTMLレポート
+
+ローリング分析の結果を、サーバーなしでブラウザで開ける1つのHTMLファイルにまとめます。
+
+- セグメントの超過リターン推移・ファンドの超過リターンの分位帯は、ズームの粗さに応じた
+  LTTB（Largest-Triangle-Three-Buckets）の間引き段階を持たせ、表示範囲の点数に合わせて切り替えます
+- ファンド × ウィンドウの超過リターンは float32 のバイナリを CHUNK_FUNDS 本ずつ base64 で埋め込み、
+  個別ファンドを表示するときに該当するチャンクだけを復号します（ページ読み込み時は復号しない）
+- ファンド一覧は表示範囲の行だけを描画する（仮想スクロール）ため、1万本でも操作が重くなりません
+- 図（PNG）も同様に埋め込み、開いたときに初めて読み込みます
+"""
+
+import base64
+import html
+import json
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+# レポートのファイル名
+REPORT_NAME = "rolling_report.html"
+# 1チャンクあたりのファンド数
+CHUNK_FUNDS = 256
+# 全体表示用の LTTB の間引き後の点数（ウィンドウ数がこれ以下の段階は作らない）。
+# 表示側は表示範囲に描画幅 2px あたり1点以上が入る最も粗い段階を選び、なければ間引かずに描画する
+OVERVIEW_POINTS = (100, 200, 400, 800)
+# ファンドの超過リターンの分位帯（パーセンタイル）
+BAND_PERCENTILES = (10, 25, 50, 75, 90)
+
+_TEMPLATE_PATH = Path(__file__).with_name('report_template.html')
+
+
+def lttb_indices(y: np.ndarray, threshold: int, x: np.ndarray = None) -> np.ndarray:
+    """
+    LTTB による間引きで残す点のインデックス
+
+    点列を threshold − 2 個のバケットに分け、各バケットから直前に選んだ点・次のバケットの平均点と
+    作る三角形の面積が最大の点を選びます（両端の点は必ず残す）。
+
+    Parameters:
+    -----------
+    y : np.ndarray
+        値（欠損なし）
+    threshold : int
+        間引き後の点数（3未満、または点数以上の場合は間引かない）
+    x : np.ndarray, optional
+        x座標（昇順、省略時は 0, 1, 2, ...）
+
+    Returns:
+    --------
+    np.ndarray
+        残す点のインデックス（昇順、長さ threshold）
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # 両端を除く n − 2 点をバケットに分ける境界（最後の境界は n − 1）
+    bounds = np.arange(threshold - 1) * (n - 2) // (threshold - 2) + 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        next_hi = bounds[i + 2] if i + 2 < len(bounds) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def overview_levels(values: np.ndarray, thresholds=OVERVIEW_POINTS) -> list:
+    """
+    系列の間引き段階（欠損を除いた点に LTTB を適用）
+
+    Returns:
+    --------
+    list of dict
+        点数の昇順の段階（points: 点数、index: 残すウィンドウのインデックス）。
+        欠損を除いた点数が threshold 以下の段階は含めない
+    """
+    values = np.asarray(values, dtype=np.float64)
+    observed = np.flatnonzero(~np.isnan(values))
+    return [{'points': int(threshold), 'index': observed[lttb_indices(values[observed], threshold, observed)].tolist()}
+            for threshold in sorted(thresholds) if threshold < len(observed)]
+
+
+def json_values(values, decimals: int = 4) -> list:
+    """数値配列を JSON 用のリストに変換する（欠損は null）"""
+    values = np.round(np.asarray(values, dtype=np.float64), decimals)
+    return [None if np.isnan(value) else float(value) for value in values]
+
+
+def segment_bands(values: np.ndarray, segment_codes: np.ndarray, n_segments: int,
+                  percentiles=BAND_PERCENTILES) -> np.ndarray:
+    """
+    セグメントごと・ウィンドウごとのファンドの超過リターンの分位点
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        超過リターン（shape: ファンド数 × ウィンドウ数、欠損はNaN）
+    segment_codes : np.ndarray
+        各ファンドのセグメント番号（-1 は対象外）
+    n_segments : int
+        セグメント数
+    percentiles : sequence of float
+        分位点（パーセンタイル）
+
+    Returns:
+    --------
+    np.ndarray
+        shape: セグメント数 × 分位点数 × ウィンドウ数（対象がないウィンドウはNaN）
+    """
+    bands = np.full((n_segments, len(percentiles), values.shape[1]), np.nan)
+    with warnings.catch_warnings():
+        # 観測のないウィンドウ（All-NaN slice）はNaNのまま
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for segment in range(n_segments):
+            members = values[segment_codes == segment]
+            if len(members) > 0:
+                bands[segment] = np.nanpercentile(members, percentiles, axis=0)
+    return bands
+
+
+def encode_chunks(values: np.ndarray, chunk_funds: int = CHUNK_FUNDS) -> list:
+    """
+    ファンド × ウィンドウの行列を float32（リトルエンディアン）のチャンクに分けて base64 で符号化する
+
+    Returns:
+    --------
+    list of str
+        チャンク（i 番目は i × chunk_funds 行目からの chunk_funds 行、行優先）
+    """
+    values = np.ascontiguousarray(values, dtype='<f4')
+    return [base64.b64encode(values[start:start + chunk_funds].tobytes()).decode('ascii')
+            for start in range(0, len(values), chunk_funds)]
+
+
+def encode_figure(path) -> str:
+    """図のファイルを base64 で符号化する"""
+    return base64.b64encode(Path(path).read_bytes()).decode('ascii')
+
+
+def _inline_json(payload) -> str:
+    """<script> 内に埋め込む JSON（</script> で途切れないようにする）"""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+def build_html_report(payload: dict, chunks: list, figures: list = ()) -> str:
+    """
+    HTMLレポートを作成する
+
+    Parameters:
+    -----------
+    payload : dict
+        レポートのデータ
+        - title, subtitle: 見出し
+        - windows: ウィンドウの開始月・終了月（start, end: 'YYYY-MM' のリスト）
+        - series: セグメントの推移の列（key, label, default: 初期表示）
+        - segments: セグメントごとの title、series（列ごとの values, levels）、band（percentiles, values, levels）
+        - funds: ファンドごとの id, name, type, segment（segments の番号、-1 は対象外）, mean, latest, windows
+        - chunk_funds: 1チャンクあたりのファンド数
+    chunks : list of str
+        encode_chunks の戻り値（payload['funds'] の並び順）
+    figures : list of dict
+        埋め込む図（title, mime, data: base64）
+
+    Returns:
+    --------
+    str
+        HTML
+    """
+    payload = dict(payload, figures=[{'title': figure['title'], 'mime': figure['mime']} for figure in figures])
+    blobs = [f'<script type="application/octet-stream" id="chunk-{i}">{chunk}</script>'
+             for i, chunk in enumerate(chunks)]
+    blobs += [f'<script type="application/octet-stream" id="figure-{i}">{figure["data"]}</script>'
+              for i, figure in enumerate(figures)]
+    template = _TEMPLATE_PATH.read_text(encoding='utf-8')
+    return (template.replace('@@TITLE@@', html.escape(payload['title']))
+                    .replace('@@DATA@@', _inline_json(payload))
+                    .replace('@@BLOBS@@', '\n'.join(blobs)))
+
+
+def write_html_report(path, payload: dict, chunks: list, figures: list = ()) -> Path:
+    """HTMLレポートを保存する"""
+    path = Path(path)
+    path.write_text(build_html_report(payload, chunks, figures), encoding='utf-8')
+    return path
@@ -0,0 +1,193 @@
+"""
+セグメント分割エンジン
+
+ファンド属性の任意の列の組合せ（ヘッジ区分・投資スタイル・運用会社・信託報酬の区分など）を
+セグメントのキーとして、各ファンドに整数のセグメント番号を割り当てます。
+集計・上位抽出・検定はセグメントごとのループではなく、
+(ウィンドウ, セグメント) の通し番号に対する np.bincount 等で全セグメントを一括で計算します。
+
+パッシブファンドはキーの一部（passive_keys）だけで対応付けることもできます
+（例: 投資スタイル別のアクティブを、同じヘッジ区分のパッシブ全体と比較）。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+HEDGE_STATUSES = ['なし', 'あり']
+DEFAULT_SEGMENT_KEYS = ('currency_hedge',)
+
+# 信託報酬の区分（expense_ratio、年率％の境界）
+EXPENSE_BUCKET = 'expense_bucket'
+EXPENSE_BUCKET_EDGES = (0.5, 1.0, 1.5)
+
+# 値の並び順を固定するキー（ここにない値は対象外）。それ以外のキーは値の昇順
+KEY_ORDERS = {'currency_hedge': HEDGE_STATUSES}
+
+# 表示名
+KEY_NAMES = {
+    'currency_hedge': '為替ヘッジ',
+    'investment_style': '投資スタイル',
+    'management_company': '運用会社',
+    EXPENSE_BUCKET: '信託報酬',
+}
+
+# keys: キー列名のタプル
+# codes: 各ファンドのセグメント番号（ファンド数、-1 は対象外）
+# labels: 各セグメントのキーの値（セグメント数 × キー数の DataFrame）
+Segmentation = namedtuple('Segmentation', ['keys', 'codes', 'labels'])
+
+
+def expense_ratio_buckets(expense_ratio, edges=EXPENSE_BUCKET_EDGES) -> pd.Categorical:
+    """信託報酬率（年率％）を区分に分ける（例: 0.5%未満, 0.5%以上1.0%未満, ..., 1.5%以上）"""
+    labels = ([f"{edges[0]}%未満"]
+              + [f"{lower}%以上{upper}%未満" for lower, upper in zip(edges[:-1], edges[1:])]
+              + [f"{edges[-1]}%以上"])
+    codes = np.searchsorted(np.asarray(edges), np.asarray(expense_ratio, dtype=np.float64), side='right')
+    codes = np.where(np.isnan(np.asarray(expense_ratio, dtype=np.float64)), -1, codes)
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def key_values(fund_attributes: pd.DataFrame, key: str):
+    """キー列の値（信託報酬の区分は expense_ratio から作成）"""
+    if key == EXPENSE_BUCKET and key not in fund_attributes.columns:
+        return expense_ratio_buckets(fund_attributes['expense_ratio'])
+    return fund_attributes[key]
+
+
+def _key_codes(values) -> tuple:
+    """キー列の値を番号（-1 は欠損・対象外）と値の一覧に変換する"""
+    if isinstance(values, pd.Series):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        return np.asarray(values.codes, dtype=np.int64), np.asarray(values.categories, dtype=object)
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), np.asarray(uniques, dtype=object)
+
+
+def segment_codes(fund_attributes: pd.DataFrame, keys, include: np.ndarray = None) -> Segmentation:
+    """
+    ファンドにセグメント番号を割り当てる
+
+    セグメントは include のファンドに現れるキーの値の組合せで、番号はキーの順に
+    値の並び順（KEY_ORDERS、カテゴリ型はカテゴリ順、それ以外は昇順）で付けます。
+
+    Parameters:
+    -----------
+    fund_attributes : pd.DataFrame
+        ファンド属性
+    keys : sequence of str
+        セグメントのキー列
+    include : np.ndarray, optional
+        番号を割り当てるファンドのブールマスク（省略時は全ファンド）
+
+    Returns:
+    --------
+    Segmentation
+        キー・各ファンドのセグメント番号・セグメントのキーの値
+    """
+    keys = tuple(keys)
+    n_funds = len(fund_attributes)
+    combined = np.zeros(n_funds, dtype=np.int64)
+    valid = np.ones(n_funds, dtype=bool) if include is None else np.asarray(include, dtype=bool).copy()
+    value_lists = []
+    for key in keys:
+        values = key_values(fund_attributes, key)
+        if key in KEY_ORDERS:
+            values = pd.Categorical(values, categories=KEY_ORDERS[key])
+        codes, uniques = _key_codes(values)
+        valid &= codes >= 0
+        # キーごとの番号を混合基数で1つの整数にまとめる（辞書順を保つ）
+        combined = combined * max(len(uniques), 1) + np.maximum(codes, 0)
+        value_lists.append(uniques)
+
+    present, inverse = np.unique(combined[valid], return_inverse=True)
+    codes = np.full(n_funds, -1, dtype=np.int64)
+    codes[valid] = inverse
+
+    labels = {}
+    remainder = present
+    for key, uniques in reversed(list(zip(keys, value_lists))):
+        size = max(len(uniques), 1)
+        labels[key] = uniques[remainder % size] if len(uniques) else np.array([], dtype=object)
+        remainder = remainder // size
+    labels = pd.DataFrame({key: labels[key] for key in keys}, index=pd.RangeIndex(len(present)))
+    return Segmentation(keys, codes, labels)
+
+
+def match_segments(segmentation: Segmentation, reference: Segmentation) -> np.ndarray:
+    """
+    各セグメントに対応する reference のセグメント番号（reference のキーで一致、なければ -1）
+
+    reference のキーは segmentation のキーの一部である必要があります。
+    """
+    if not set(reference.keys) <= set(segmentation.keys):
+        raise ValueError(f"パッシブの対応付けキー {list(reference.keys)} はセグメントキー "
+                         f"{list(segmentation.keys)} の一部である必要があります")
+    if len(reference.keys) == 0:
+        return np.zeros(len(segmentation.labels), dtype=np.int64)
+    lookup = pd.MultiIndex.from_frame(reference.labels[list(reference.keys)])
+    return lookup.get_indexer(pd.MultiIndex.from_frame(segmentation.labels[list(reference.keys)])).astype(np.int64)
+
+
+def grouped_sums(values: np.ndarray, mask: np.ndarray, group_codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    行ごと・グループごとのマスク付き合計
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        shape: 行数 × ファンド数
+    mask : np.ndarray
+        集計対象のブールマスク（values と同じ shape）
+    group_codes : np.ndarray
+        各ファンドのグループ番号（ファンド数、-1 は対象外）
+    n_groups : int
+        グループ数
+
+    Returns:
+    --------
+    np.ndarray
+        shape: 行数 × グループ数
+    """
+    rows, cols = np.nonzero(mask & (group_codes >= 0))
+    cells = rows * n_groups + group_codes[cols]
+    sums = np.bincount(cells, weights=values[rows, cols], minlength=values.shape[0] * n_groups)
+    return sums.reshape(values.shape[0], n_groups)
+
+
+def pad_grouped(values: np.ndarray, mask: np.ndarray, group_codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    行ごと・グループごとの対象ファンドの値を NaN 埋めの行列に並べる
+
+    significance.two_sample_tests などの入力（グループ数 × 標本数）を作ります。
+    各グループ内の並びはファンドの列順です。
+
+    Returns:
+    --------
+    np.ndarray
+        shape: (行数 × グループ数) × 最大標本数。行番号は 行 × n_groups + グループ
+    """
+    rows, cols = np.nonzero(mask & (group_codes >= 0))
+    cells = rows * n_groups + group_codes[cols]
+    n_cells = values.shape[0] * n_groups
+    counts = np.bincount(cells, minlength=n_cells)
+
+    order = np.argsort(cells, kind='stable')
+    sorted_cells = cells[order]
+    position = np.arange(len(order)) - (np.cumsum(counts) - counts)[sorted_cells]
+
+    padded = np.full((n_cells, counts.max(initial=0)), np.nan)
+    padded[sorted_cells, position] = values[rows, cols][order]
+    return padded
+
+
+def segment_name(segment: dict) -> str:
+    """セグメントのファイル名用の名前（例: hedge_なし、hedge_なし_成長）"""
+    return '_'.join(f"hedge_{value}" if key == 'currency_hedge' else str(value) for key, value in segment.items())
+
+
+def segment_title(segment: dict) -> str:
+    """セグメントの表示名（例: 為替ヘッジ: なし / 投資スタイル: 成長）"""
+    return ' / '.join(f"{KEY_NAMES.get(key, key)}: {value}" for key, value in segment.items())
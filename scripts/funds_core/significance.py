@@ -0,0 +1,149 @@
+"""
+2標本検定カーネル
+
+比較グループ（ウィンドウ × ヘッジ区分 × セグメントなど）を行、ファンドを列とする
+NaN 埋めの行列を入力として、Student / Welch の t検定、Cohen's d、
+Mann-Whitney U検定（両側）を全グループ一括で計算します。
+
+Mann-Whitney の p値は scipy.stats.mannwhitneyu（method='auto'）と同じ規則で、
+どちらかの標本が8本以下かつ同順位がない場合は U の正確な帰無分布、
+それ以外は同順位補正・連続性補正付きの正規近似を用います。
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from scipy import special, stats
+
+# 正確な帰無分布を用いる標本サイズの上限（scipy の method='auto' と同じ）
+EXACT_MAX_SAMPLE_SIZE = 8
+
+# 各フィールドは shape: グループ数 の配列
+TwoSampleTests = namedtuple('TwoSampleTests', [
+    'n1', 'n2',
+    't_student', 'p_student',
+    't_welch', 'p_welch',
+    'cohens_d',
+    'u_statistic', 'p_mannwhitney',
+])
+
+
+def _moments(values: np.ndarray) -> tuple:
+    """行ごとの標本数・平均・偏差平方和・不偏分散（NaN は除外、標本数1の不偏分散はNaN）"""
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=1)
+    filled = np.where(valid, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=1) / n
+        deviations = np.where(valid, values - mean[:, None], 0.0)
+        sum_squares = (deviations ** 2).sum(axis=1)
+        var = sum_squares / (n - 1)
+    return n, mean, sum_squares, var
+
+
+@lru_cache(maxsize=None)
+def _mwu_null_sf(n1: int, n2: int) -> np.ndarray:
+    """
+    同順位がない場合の U の帰無分布の上側確率 P(U >= u)（u = 0, ..., n1 × n2）
+
+    U の度数は q-二項係数 ∏_{i=1}^{n1} (1 - q^{n2+i}) / (1 - q^i) の係数です。
+    """
+    n1, n2 = min(n1, n2), max(n1, n2)
+    counts = np.zeros(n1 * n2 + 1)
+    counts[0] = 1.0
+    for i in range(1, n1 + 1):
+        # (1 - q^{n2+i}) を掛ける
+        shift = n2 + i
+        if shift < len(counts):
+            counts[shift:] = counts[shift:] - counts[:-shift]
+        # (1 - q^i) で割る：b[k] = a[k] + b[k - i]
+        for residue in range(i):
+            counts[residue::i] = np.cumsum(counts[residue::i])
+    pmf = counts / special.comb(n1 + n2, n1)
+    return np.cumsum(pmf[::-1])[::-1]
+
+
+def _mann_whitney(x: np.ndarray, y: np.ndarray, n1: np.ndarray, n2: np.ndarray) -> tuple:
+    """行ごとの Mann-Whitney U（x 側）と両側 p値"""
+    combined = np.concatenate([x, y], axis=1)
+    valid = ~np.isnan(combined)
+    # NaN は +inf として最上位に回すため、有効な値の順位（平均順位）には影響しない
+    filled = np.where(valid, combined, np.inf)
+    ranks = stats.rankdata(filled, method='average', axis=1)
+    tie_sizes = stats.rankdata(filled, method='max', axis=1) - stats.rankdata(filled, method='min', axis=1) + 1
+
+    x_width = x.shape[1]
+    rank_sum = np.where(valid[:, :x_width], ranks[:, :x_width], 0.0).sum(axis=1)
+    u1 = rank_sum - n1 * (n1 + 1) / 2
+    u = np.maximum(u1, n1 * n2 - u1)
+
+    # 同順位補正項 Σ(t³ - t) は各要素の (t² - 1) の和に等しい
+    tie_sizes = np.where(valid, tie_sizes, 1.0)
+    tie_term = (tie_sizes ** 2 - 1).sum(axis=1)
+    has_ties = (tie_sizes > 1).any(axis=1)
+
+    n = n1 + n2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        z = (u - n1 * n2 / 2 - 0.5) / sigma
+    p = 2 * special.ndtr(-z)
+
+    exact = ((n1 <= EXACT_MAX_SAMPLE_SIZE) | (n2 <= EXACT_MAX_SAMPLE_SIZE)) & ~has_ties & (n1 > 0) & (n2 > 0)
+    for size1, size2 in set(zip(n1[exact].tolist(), n2[exact].tolist())):
+        rows = exact & (n1 == size1) & (n2 == size2)
+        p[rows] = 2 * _mwu_null_sf(size1, size2)[u[rows].astype(np.int64)]
+
+    empty = (n1 == 0) | (n2 == 0)
+    u1[empty] = np.nan
+    p[empty] = np.nan
+    return u1, np.clip(p, 0.0, 1.0)
+
+
+def two_sample_tests(x: np.ndarray, y: np.ndarray) -> TwoSampleTests:
+    """
+    全グループの2標本検定を一括で計算する
+
+    Parameters:
+    -----------
+    x : np.ndarray
+        比較対象（例: アクティブ）のリターン（shape: グループ数 × 標本数、NaN は欠損）
+    y : np.ndarray
+        基準（例: パッシブ）のリターン（shape: グループ数 × 標本数、NaN は欠損）
+
+    Returns:
+    --------
+    TwoSampleTests
+        標本数、t値・p値（Student / Welch）、Cohen's d（プールした標準偏差）、
+        Mann-Whitney U（x 側）・p値。計算できないグループはNaN
+        （Student・Cohen's d は合計3本以上、Welch は両方の標本が2本以上で計算）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.ndim != 2 or y.ndim != 2 or len(x) != len(y):
+        raise ValueError("x と y はグループ数が等しい2次元配列である必要があります")
+
+    n1, mean1, ss1, var1 = _moments(x)
+    n2, mean2, ss2, var2 = _moments(y)
+    diff = mean1 - mean2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Student（等分散）。プールした分散は偏差平方和から求め、標本数1の側は0を寄与する
+        # （scipy.stats.ttest_ind と同じく、n1 + n2 >= 3 なら一方が1本でも計算できる）
+        df_student = n1 + n2 - 2
+        pooled_var = (ss1 + ss2) / df_student
+        t_student = diff / np.sqrt(pooled_var * (1 / n1 + 1 / n2))
+        p_student = 2 * stats.t.sf(np.abs(t_student), df_student)
+
+        # Welch（不等分散）。どちらかの標本数が2未満の場合はNaN
+        se1, se2 = var1 / n1, var2 / n2
+        t_welch = diff / np.sqrt(se1 + se2)
+        df_welch = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+        p_welch = 2 * stats.t.sf(np.abs(t_welch), df_welch)
+
+        cohens_d = diff / np.sqrt(pooled_var)
+
+    u_statistic, p_mannwhitney = _mann_whitney(x, y, n1, n2)
+
+    return TwoSampleTests(n1, n2, t_student, p_student, t_welch, p_welch,
+                          cohens_d, u_statistic, p_mannwhitney)
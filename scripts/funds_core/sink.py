@@ -0,0 +1,74 @@
+"""
+結果CSVの書き出し
+
+各分析クラスは保存対象を ResultTable のリストとして返し、
+書き出しは最後にまとめて（必要に応じてバックグラウンドスレッドで）行います。
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# filename: 出力ファイル名、frame: 保存するDataFrame、label: ログ表示名、index: 行インデックスを出力するか
+ResultTable = namedtuple('ResultTable', ['filename', 'frame', 'label', 'index'], defaults=[False])
+
+
+def write_table(output_path: Path, table: ResultTable) -> Path:
+    """結果表をUTF-8 with BOMのCSVとして保存する"""
+    path = Path(output_path) / table.filename
+    table.frame.to_csv(path, index=table.index, encoding='utf-8-sig')
+    return path
+
+
+class CsvSink:
+    """結果CSVの書き出し先（同期・非同期）"""
+
+    def __init__(self, output_dir, async_write: bool = False, max_workers: int = 2):
+        """
+        初期化
+
+        Parameters:
+        -----------
+        output_dir : str or Path
+            出力ディレクトリ
+        async_write : bool
+            バックグラウンドスレッドで書き出すか。True の場合、書き出し中も
+            後続の処理（可視化など）を続行でき、close() で完了を待ちます
+        max_workers : int
+            非同期書き出しのスレッド数
+        """
+        self.output_path = Path(output_dir)
+        self.output_path.mkdir(exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers) if async_write else None
+        self.pending = []
+
+    def submit(self, tables):
+        """
+        結果表を書き出す（非同期の場合は書き出しを予約する）
+
+        Parameters:
+        -----------
+        tables : iterable of ResultTable
+            保存する結果表
+        """
+        for table in tables:
+            if self.executor is None:
+                write_table(self.output_path, table)
+                print(f"✓ {table.label}保存: {table.filename}")
+            else:
+                self.pending.append((table, self.executor.submit(write_table, self.output_path, table)))
+        return self
+
+    def close(self):
+        """予約済みの書き出しの完了を待つ（書き出し時の例外はここで送出）"""
+        if self.executor is None:
+            return self
+        try:
+            for table, future in self.pending:
+                future.result()
+                print(f"✓ {table.label}保存: {table.filename}")
+        finally:
+            self.pending = []
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        return self
@@ -0,0 +1,190 @@
+"""
+月次リターンのチャンク読み込み
+
+monthly_returns.csv をチャンク単位で読み込み、分析期間の日付フィルタと
+異常値チェックをチャンクごとに行いながら、ファンドごとの集計
+（期間内の各月のリターン・レコード数・異常値レコード）だけを保持します。
+保持するのはファンド数 × 分析期間の月数の配列のため、メモリ使用量は
+ファイルの行数ではなくファンド数で決まります。
+
+月末AUM（aum 列）も同じ形で保持し、時点AUMによる加重に用います。
+
+集約結果から作る ReturnPanel・レコード数は、全件を読み込んで期間で絞り込んだ
+DataFrame に ReturnPanel.from_long・groupby(...).size() を適用した場合と同じです。
+"""
+
+import numpy as np
+import pandas as pd
+
+from .loader import iter_monthly_returns, month_ordinal
+from .panel import ReturnPanel
+
+# 既定のチャンク行数
+DEFAULT_CHUNKSIZE = 1_000_000
+# 異常値とみなす月次リターンの絶対値
+OUTLIER_THRESHOLD = 0.5
+
+# 月末日付が未観測のセル（int64 表現の NaT）
+_NAT = np.iinfo(np.int64).min
+
+
+class StreamingPeriodPanel:
+    """分析期間内の月次リターンをチャンク単位で集約する"""
+
+    def __init__(self, start_date, end_date, outlier_threshold: float = OUTLIER_THRESHOLD):
+        """
+        初期化
+
+        Parameters:
+        -----------
+        start_date, end_date : str or pd.Timestamp
+            分析期間（両端を含む）
+        outlier_threshold : float
+            異常値とみなす月次リターンの絶対値
+        """
+        self.start_date = pd.Timestamp(start_date)
+        self.end_date = pd.Timestamp(end_date)
+        self.outlier_threshold = outlier_threshold
+        self.first_month = int(month_ordinal(pd.Series([self.start_date]))[0])
+        self.n_months = int(month_ordinal(pd.Series([self.end_date]))[0]) - self.first_month + 1
+
+        self.fund_ids = pd.Index([], dtype=object, name='fund_id')
+        self.values = np.full((0, self.n_months), np.nan)
+        self.aum = np.full((0, self.n_months), np.nan)
+        self.seen = np.zeros((0, self.n_months), dtype=bool)
+        self.dates = np.full((0, self.n_months), _NAT, dtype=np.int64)
+        self.row_counts = np.zeros(0, dtype=np.int64)
+        self.outlier_chunks = []
+        self.rows_read = 0
+
+    def _fund_codes(self, fund_ids: pd.Series) -> np.ndarray:
+        """fund_id を行番号に変換する（初出のファンドは行を追加）"""
+        codes = self.fund_ids.get_indexer(fund_ids)
+        if (codes < 0).any():
+            new_ids = pd.Index(pd.unique(fund_ids[codes < 0]))
+            self.fund_ids = self.fund_ids.append(new_ids).rename('fund_id')
+            n_new = len(new_ids)
+            self.values = np.vstack([self.values, np.full((n_new, self.n_months), np.nan)])
+            self.aum = np.vstack([self.aum, np.full((n_new, self.n_months), np.nan)])
+            self.seen = np.vstack([self.seen, np.zeros((n_new, self.n_months), dtype=bool)])
+            self.dates = np.vstack([self.dates, np.full((n_new, self.n_months), _NAT, dtype=np.int64)])
+            self.row_counts = np.concatenate([self.row_counts, np.zeros(n_new, dtype=np.int64)])
+            codes = self.fund_ids.get_indexer(fund_ids)
+        return codes
+
+    def add(self, chunk: pd.DataFrame):
+        """
+        チャンクを集約する（分析期間外のレコードは破棄）
+
+        Parameters:
+        -----------
+        chunk : pd.DataFrame
+            fund_id, month_end_date, monthly_return を含む月次リターン
+        """
+        self.rows_read += len(chunk)
+        dates = chunk['month_end_date']
+        chunk = chunk[(dates >= self.start_date) & (dates <= self.end_date)]
+        if len(chunk) == 0:
+            return self
+
+        rows = self._fund_codes(chunk['fund_id'])
+        columns = month_ordinal(chunk['month_end_date']) - self.first_month
+
+        # 同一ファンド・同一月の重複レコードはパネル化できない（ReturnPanel.from_long と同じ）
+        flat_index = rows.astype(np.int64) * self.n_months + columns
+        if self.seen[rows, columns].any() or len(np.unique(flat_index)) != len(flat_index):
+            raise ValueError("同一ファンド・同一月末日付の重複レコードが存在します")
+
+        self.seen[rows, columns] = True
+        self.values[rows, columns] = chunk['monthly_return'].to_numpy(dtype=np.float64)
+        if 'aum' in chunk.columns:
+            self.aum[rows, columns] = chunk['aum'].to_numpy(dtype=np.float64)
+        self.dates[rows, columns] = chunk['month_end_date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.row_counts += np.bincount(rows, minlength=len(self.row_counts))
+
+        returns = chunk['monthly_return']
+        outliers = chunk[(returns > self.outlier_threshold) | (returns < -self.outlier_threshold)]
+        if len(outliers) > 0:
+            self.outlier_chunks.append(outliers)
+        return self
+
+    @property
+    def n_records(self) -> int:
+        """分析期間内のレコード数"""
+        return int(self.row_counts.sum())
+
+    def month_counts(self) -> pd.Series:
+        """ファンドごとの期間内レコード数（groupby('fund_id').size() に相当）"""
+        return pd.Series(self.row_counts, index=self.fund_ids).sort_index()
+
+    def _selection(self, fund_ids) -> tuple:
+        """パネルに含めるファンド（昇順）・その行番号・レコードのある月のマスク"""
+        selected = self.fund_ids if fund_ids is None else self.fund_ids.intersection(pd.Index(fund_ids))
+        selected = selected.sort_values()
+        rows = self.fund_ids.get_indexer(selected)
+        return selected, rows, self.seen[rows].any(axis=0)
+
+    def to_panel(self, fund_ids=None) -> ReturnPanel:
+        """
+        集約結果から ReturnPanel を構築する
+
+        Parameters:
+        -----------
+        fund_ids : iterable, optional
+            パネルに含めるファンド（省略時は全ファンド）。行は fund_id の昇順
+
+        Returns:
+        --------
+        ReturnPanel
+            期間内にレコードのある月のみを列とするパネル
+        """
+        selected, rows, present = self._selection(fund_ids)
+        seen = self.seen[rows]
+        # 各月の表示日付はその月の最終月末日付
+        month_dates = np.where(seen, self.dates[rows], _NAT).max(axis=0, initial=_NAT)[present].view('datetime64[ns]')
+
+        # from_long と同じ C 順序で保持する（行方向の合計の加算順序を揃える）
+        values = np.ascontiguousarray(self.values[rows][:, present])
+        return ReturnPanel(pd.Index(selected, name='fund_id'), pd.Index(month_dates, name='month_end_date'),
+                           values, ~np.isnan(values))
+
+    def aum_matrix(self, fund_ids=None) -> np.ndarray:
+        """月末AUM（to_panel と同じ ファンド × 月の行列）"""
+        _, rows, present = self._selection(fund_ids)
+        return self.aum[rows][:, present]
+
+    def outliers(self, fund_ids=None) -> pd.DataFrame:
+        """期間内の異常値レコード（fund_ids 指定時はそのファンドのみ）"""
+        if not self.outlier_chunks:
+            return pd.DataFrame()
+        outliers = pd.concat(self.outlier_chunks, ignore_index=True)
+        if fund_ids is not None:
+            outliers = outliers[outliers['fund_id'].isin(fund_ids)]
+        return outliers
+
+
+def stream_period_panel(data_dir, start_date, end_date, chunksize: int = DEFAULT_CHUNKSIZE,
+                        outlier_threshold: float = OUTLIER_THRESHOLD) -> StreamingPeriodPanel:
+    """
+    monthly_returns.csv をチャンク単位で読み込み、分析期間内の集約結果を返す
+
+    Parameters:
+    -----------
+    data_dir : str or Path
+        データディレクトリパス
+    start_date, end_date : str or pd.Timestamp
+        分析期間（両端を含む）
+    chunksize : int
+        1チャンクの行数
+    outlier_threshold : float
+        異常値とみなす月次リターンの絶対値
+
+    Returns:
+    --------
+    StreamingPeriodPanel
+        集約結果
+    """
+    aggregate = StreamingPeriodPanel(start_date, end_date, outlier_threshold)
+    for chunk in iter_monthly_returns(data_dir, chunksize):
+        aggregate.add(chunk)
+    return aggregate
@@ -0,0 +1,286 @@
+"""
+時点ユニバース（生存バイアスを考慮したファンドの存続区間）
+
+ファンド属性の設定日（inception_date）・償還日（redemption_date）・状態（status）から
+各ファンドの存続区間を月インデックス（西暦年 × 12 + 月 - 1）の閉区間で保持し、
+「ウィンドウ w の期間中に存続していたファンド」を全ウィンドウについて一括で求めます。
+
+- 存続判定: 区間 [設定月, 償還月] とウィンドウ [初月, 最終月] の重なりを
+  ファンド × ウィンドウのブロードキャストで判定
+- 存続本数: 設定月・償還月をそれぞれ昇順に並べ、ウィンドウの両端の searchsorted の差で計算
+  （ファンド数 × ウィンドウ数の行列を作らない）
+
+設定日がないファンドは分析期間の前から存続、償還日がないファンドは現在も存続とみなします。
+状態が償還済み（REDEEMED_STATUSES）で償還日がないファンドは、月次データの最終月を償還月とします
+（データもない場合はどのウィンドウにも存続しないものとします）。
+
+分析期間（ウィンドウ）の途中で設定・償還されたファンドの扱い（partial_history）:
+- 'exclude': ウィンドウ全期間のデータがあるファンドのみ（従来どおり）
+- 'available': 存続しており min_months か月以上のデータがあるファンドを含め、
+  データのある月数で年率換算
+- 'cash': 同じファンドを含め、データのない月（設定前・償還後）は現金（リターン0）として
+  ウィンドウ全体の月数で年率換算
+"""
+
+import numpy as np
+import pandas as pd
+
+from .cagr import annualize_log_returns
+from .panel import ReturnPanel
+
+PARTIAL_HISTORY_TREATMENTS = ('exclude', 'available', 'cash')
+DEFAULT_PARTIAL_HISTORY = 'exclude'
+# 'available' / 'cash' で含めるファンドのウィンドウ内の最低データ月数
+MIN_PARTIAL_MONTHS = 12
+
+# 償還済みとみなす状態
+REDEEMED_STATUSES = ('償還', '償還済み', '繰上償還')
+
+# 設定日・償還日がない場合の区間の端（月インデックス）
+_OPEN_START = np.iinfo(np.int64).min
+_OPEN_END = np.iinfo(np.int64).max
+
+
+def month_ordinals(dates) -> np.ndarray:
+    """日付を月インデックス（西暦年 × 12 + 月 - 1、int64）に変換する（欠損は不可）"""
+    dates = pd.DatetimeIndex(dates)
+    return (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+
+
+def last_observed_dates(panel: ReturnPanel) -> pd.Series:
+    """ファンドごとのデータのある最終月の月末日付（データがないファンドは NaT）"""
+    observed = panel.observed
+    last = panel.n_months - 1 - np.argmax(observed[:, ::-1], axis=1)
+    dates = np.asarray(panel.months, dtype='datetime64[ns]')[last]
+    dates[~observed.any(axis=1)] = np.datetime64('NaT')
+    return pd.Series(dates, index=pd.Index(panel.fund_ids, name='fund_id'))
+
+
+class UniverseIndex:
+    """ファンドの存続区間（月インデックスの閉区間）"""
+
+    def __init__(self, fund_ids: pd.Index, first_months: np.ndarray, last_months: np.ndarray):
+        """
+        初期化
+
+        Parameters:
+        -----------
+        fund_ids : pd.Index
+            ファンドのfund_id
+        first_months, last_months : np.ndarray
+            存続区間の初月・最終月の月インデックス（int64、両端を含む）
+        """
+        self.fund_ids = fund_ids
+        self.first_months = first_months
+        self.last_months = last_months
+        # 存続本数の計算用に両端を昇順に並べておく
+        self._sorted_first = np.sort(first_months)
+        self._sorted_last = np.sort(last_months)
+
+    @classmethod
+    def from_attributes(cls, fund_attributes: pd.DataFrame, last_observed: pd.Series = None) -> 'UniverseIndex':
+        """
+        ファンド属性から存続区間を構築する
+
+        Parameters:
+        -----------
+        fund_attributes : pd.DataFrame
+            fund_id を含むファンド属性（inception_date, redemption_date, status は任意）。
+            行の並び順を維持し、fund_id が重複する場合は先頭の行を採用します
+        last_observed : pd.Series, optional
+            ファンドごとのデータの最終月末日付（fund_id をインデックスとする、last_observed_dates の出力）。
+            償還済みで償還日がないファンドの償還月に使用
+
+        Returns:
+        --------
+        UniverseIndex
+            構築した存続区間
+        """
+        fund_attributes = fund_attributes.drop_duplicates('fund_id')
+        n_funds = len(fund_attributes)
+        fund_ids = pd.Index(fund_attributes['fund_id'], name='fund_id')
+
+        def column_dates(column):
+            if column not in fund_attributes.columns:
+                return pd.Series(pd.NaT, index=range(n_funds), dtype='datetime64[ns]')
+            return pd.to_datetime(fund_attributes[column], errors='coerce').reset_index(drop=True)
+
+        inception = column_dates('inception_date')
+        redemption = column_dates('redemption_date')
+        # 償還日もデータもない償還済みファンドは存続しない
+        never_alive = np.zeros(n_funds, dtype=bool)
+        if 'status' in fund_attributes.columns and last_observed is not None:
+            redeemed = fund_attributes['status'].isin(REDEEMED_STATUSES).to_numpy()
+            undated = redeemed & redemption.isna().to_numpy()
+            redemption[undated] = last_observed.reindex(fund_ids[undated]).to_numpy()
+            never_alive = undated & redemption.isna().to_numpy()
+
+        first_months = np.full(n_funds, _OPEN_START, dtype=np.int64)
+        last_months = np.full(n_funds, _OPEN_END, dtype=np.int64)
+        has_first, has_last = inception.notna().to_numpy(), redemption.notna().to_numpy()
+        first_months[has_first] = month_ordinals(inception[has_first])
+        last_months[has_last] = month_ordinals(redemption[has_last])
+
+        # 償還日が設定日より前のファンドもどのウィンドウにも存続しない（両端を上限にして数えない）
+        empty = never_alive | (first_months > last_months)
+        first_months[empty] = _OPEN_END
+        last_months[empty] = _OPEN_END
+        return cls(fund_ids, first_months, last_months)
+
+    @property
+    def n_funds(self) -> int:
+        """ファンド数"""
+        return len(self.fund_ids)
+
+    def take(self, fund_ids) -> 'UniverseIndex':
+        """指定した fund_id の並び順の存続区間（属性にないファンドは常に存続とみなす）"""
+        fund_ids = pd.Index(fund_ids, name='fund_id')
+        rows = self.fund_ids.get_indexer(fund_ids)
+        found = rows >= 0
+        first_months = np.where(found, self.first_months[rows], _OPEN_START)
+        last_months = np.where(found, self.last_months[rows], _OPEN_END)
+        return UniverseIndex(fund_ids, first_months, last_months)
+
+    def alive(self, window_first: np.ndarray, window_last: np.ndarray, throughout: bool = False) -> np.ndarray:
+        """
+        全ファンド・全ウィンドウの存続判定
+
+        Parameters:
+        -----------
+        window_first, window_last : np.ndarray
+            ウィンドウの初月・最終月の月インデックス
+        throughout : bool
+            True の場合はウィンドウ全期間に存続していたファンドのみ、
+            False の場合はウィンドウ中に1か月でも存続していたファンド
+
+        Returns:
+        --------
+        np.ndarray
+            ブールマスク（shape: ファンド数 × ウィンドウ数）
+        """
+        first = self.first_months[:, None]
+        last = self.last_months[:, None]
+        window_first = np.asarray(window_first, dtype=np.int64)[None, :]
+        window_last = np.asarray(window_last, dtype=np.int64)[None, :]
+        if throughout:
+            return (first <= window_first) & (last >= window_last)
+        return (first <= window_last) & (last >= window_first)
+
+    def alive_counts(self, window_first: np.ndarray, window_last: np.ndarray) -> np.ndarray:
+        """
+        ウィンドウごとの存続ファンド数（ウィンドウ中に1か月でも存続していた本数）
+
+        設定月がウィンドウ最終月以前のファンド数から、償還月がウィンドウ初月より前の
+        ファンド数を引いて求めます（後者は前者に含まれる）。
+        """
+        started = np.searchsorted(self._sorted_first, np.asarray(window_last, dtype=np.int64), side='right')
+        ended = np.searchsorted(self._sorted_last, np.asarray(window_first, dtype=np.int64), side='left')
+        return started - ended
+
+    def period_alive(self, start_date, end_date, throughout: bool = False) -> np.ndarray:
+        """期間 [start_date, end_date] のファンドごとの存続判定（shape: ファンド数）"""
+        return self.alive(month_ordinals([start_date]), month_ordinals([end_date]), throughout)[:, 0]
+
+    def period_alive_count(self, start_date, end_date) -> int:
+        """期間 [start_date, end_date] 中に存続していたファンド数"""
+        return int(self.alive_counts(month_ordinals([start_date]), month_ordinals([end_date]))[0])
+
+    def window_alive(self, months, window_starts: np.ndarray, window_months: int, throughout: bool = False) -> np.ndarray:
+        """
+        パネルの月インデックスで指定したウィンドウの存続判定（alive を参照）
+
+        Parameters:
+        -----------
+        months : pd.DatetimeIndex
+            パネルの月末日付
+        window_starts : np.ndarray
+            ウィンドウ起点（パネルの月インデックス）
+        window_months : int
+            ウィンドウ長（月数）
+        """
+        return self.alive(*_window_ordinals(months, window_starts, window_months), throughout)
+
+    def window_alive_counts(self, months, window_starts: np.ndarray, window_months: int) -> np.ndarray:
+        """パネルの月インデックスで指定したウィンドウごとの存続ファンド数（alive_counts を参照）"""
+        return self.alive_counts(*_window_ordinals(months, window_starts, window_months))
+
+
+def _window_ordinals(months, window_starts: np.ndarray, window_months: int) -> tuple:
+    """ウィンドウの初月・最終月の月インデックス"""
+    ordinals = month_ordinals(months)
+    window_starts = np.asarray(window_starts)
+    return ordinals[window_starts], ordinals[window_starts + window_months - 1]
+
+
+def partial_history_periods(counts: np.ndarray, window_months: int, alive: np.ndarray = None,
+                            partial_history: str = DEFAULT_PARTIAL_HISTORY,
+                            min_months: int = MIN_PARTIAL_MONTHS) -> tuple:
+    """
+    途中設定・償還ファンドの扱いに応じた集計対象と年率換算の月数
+
+    Parameters:
+    -----------
+    counts : np.ndarray
+        ウィンドウ内の観測月数（shape: ファンド数 × ウィンドウ数、または ファンド数）
+    window_months : int
+        ウィンドウ長（月数）
+    alive : np.ndarray, optional
+        存続判定（counts と同じ shape、UniverseIndex.window_alive 等の出力）。'exclude' 以外で必要
+    partial_history : str
+        PARTIAL_HISTORY_TREATMENTS のいずれか
+    min_months : int
+        'available' / 'cash' で含めるファンドのウィンドウ内の最低データ月数
+
+    Returns:
+    --------
+    tuple
+        (集計対象のブールマスク, 年率換算の月数)。'available' はデータのある月数、
+        それ以外はウィンドウ長（対象外のセルもウィンドウ長）
+    """
+    if partial_history not in PARTIAL_HISTORY_TREATMENTS:
+        raise ValueError(f"途中設定・償還ファンドの扱いは {PARTIAL_HISTORY_TREATMENTS} のいずれかです: {partial_history}")
+    if partial_history == 'exclude':
+        return counts == window_months, np.full(np.shape(counts), window_months)
+    if alive is None:
+        raise ValueError(f"partial_history='{partial_history}' には存続判定（alive）が必要です")
+
+    # ウィンドウ全期間のデータがあるファンドは存続判定によらず含める（'exclude' の対象を包含）
+    included = (counts == window_months) | (alive & (counts >= min(min_months, window_months)))
+    if partial_history == 'available':
+        return included, np.where(included, counts, window_months)
+    return included, np.full(np.shape(counts), window_months)
+
+
+def partial_history_returns(log_prefix: np.ndarray, count_prefix: np.ndarray, window_starts: np.ndarray,
+                            window_months: int, alive: np.ndarray = None,
+                            partial_history: str = DEFAULT_PARTIAL_HISTORY,
+                            min_months: int = MIN_PARTIAL_MONTHS) -> np.ndarray:
+    """
+    途中設定・償還ファンドの扱いに応じた全ウィンドウの年率リターン行列
+
+    'exclude' の場合は cagr.prefix_annualized_returns と同じ結果になります。
+
+    Parameters:
+    -----------
+    log_prefix, count_prefix : np.ndarray
+        対数リターン・観測月数の累積和（ReturnPanel.prefix_sums の形式）
+    window_starts : np.ndarray
+        ウィンドウ起点の月インデックス
+    window_months : int
+        ウィンドウ長（月数）
+    alive, partial_history, min_months
+        partial_history_periods を参照（alive の shape: ファンド数 × ウィンドウ数）
+
+    Returns:
+    --------
+    np.ndarray
+        年率リターン（shape: ファンド数 × ウィンドウ数、対象外はNaN）
+    """
+    window_starts = np.asarray(window_starts)
+    window_ends = window_starts + window_months
+    log_sums = log_prefix[:, window_ends] - log_prefix[:, window_starts]
+    counts = count_prefix[:, window_ends] - count_prefix[:, window_starts]
+    included, period_months = partial_history_periods(counts, window_months, alive, partial_history, min_months)
+    annualized, _ = annualize_log_returns(log_sums, period_months)
+    annualized[~included] = np.nan
+    return annualized
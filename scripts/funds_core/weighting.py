@@ -0,0 +1,70 @@
+"""
+AUM加重のウェイト
+
+ファンド属性の aum_latest（最新の純資産総額）は過去のウィンドウから見ると
+将来の情報を含むため、月次データの aum 列から各ウィンドウ時点のAUMを
+ウェイトとして用いる方法を選べるようにします。
+
+- latest: ファンド属性の aum_latest（従来どおり、全ウィンドウ共通）
+- start: ウィンドウ初月の月末AUM
+- end: ウィンドウ最終月の月末AUM
+- average: ウィンドウ内の月末AUMの平均（AUMのない月は除外）
+
+AUM行列（ファンド × 月、ReturnPanel.expand_column で展開）から
+ファンド × ウィンドウのウェイト行列を一括で計算します（average は累積和の差分）。
+該当するAUMがないファンド・ウィンドウは aum_latest で補います。
+"""
+
+import numpy as np
+
+AUM_WEIGHTINGS = ('latest', 'start', 'end', 'average')
+DEFAULT_AUM_WEIGHTING = 'latest'
+
+
+def window_aum_weights(aum: np.ndarray, latest: np.ndarray, window_starts: np.ndarray,
+                       window_months: int, method: str = DEFAULT_AUM_WEIGHTING) -> np.ndarray:
+    """
+    全ウィンドウ・全ファンドのAUM加重のウェイトを計算する
+
+    Parameters:
+    -----------
+    aum : np.ndarray or None
+        月末AUM（shape: ファンド数 × 月数、欠損はNaN）。method='latest' の場合は不要
+    latest : np.ndarray
+        ファンド属性の aum_latest（ファンド数）。AUMがないセルの補完に使用
+    window_starts : np.ndarray
+        ウィンドウ起点の月インデックス
+    window_months : int
+        ウィンドウ長（月数）
+    method : str
+        AUM_WEIGHTINGS のいずれか
+
+    Returns:
+    --------
+    np.ndarray
+        ウェイト（shape: ファンド数 × ウィンドウ数）
+    """
+    if method not in AUM_WEIGHTINGS:
+        raise ValueError(f"AUM加重の方法が不正です: {method}（{', '.join(AUM_WEIGHTINGS)} のいずれか）")
+
+    window_starts = np.asarray(window_starts)
+    latest = np.asarray(latest, dtype=np.float64)
+    if method == 'latest':
+        return np.repeat(latest[:, None], len(window_starts), axis=1)
+
+    window_ends = window_starts + window_months
+    if method == 'start':
+        weights = aum[:, window_starts]
+    elif method == 'end':
+        weights = aum[:, window_ends - 1]
+    else:
+        observed = ~np.isnan(aum)
+        sum_prefix = np.zeros((aum.shape[0], aum.shape[1] + 1))
+        np.cumsum(np.where(observed, aum, 0.0), axis=1, out=sum_prefix[:, 1:])
+        count_prefix = np.zeros((aum.shape[0], aum.shape[1] + 1), dtype=np.int64)
+        np.cumsum(observed, axis=1, out=count_prefix[:, 1:])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = ((sum_prefix[:, window_ends] - sum_prefix[:, window_starts])
+                       / (count_prefix[:, window_ends] - count_prefix[:, window_starts]))
+
+    return np.where(np.isnan(weights), latest[:, None], weights)
@@ -6,262 +6,399 @@
 サンプルデータを生成します。
 
 実際のファンドパフォーマンスに基づいたリアリスティックなデータを生成します。
+
+- ファンド数・月数・アクティブ／パッシブ・ヘッジ有無の構成比を指定でき、
+  負荷試験用の1万本 × 30年（360か月）のデータも数秒で生成できます
+- リターンは共通ファクターモデルで全ファンド × 全月を1つの行列として生成します
+  （月ごとに全ファンド共通の市場ファクター・為替ファクター（ヘッジなしのみ）・
+  運用スタイルのファクター（アクティブのみ）と、ファンド固有の変動）
+- 月次リターンは列指向（Arrow）のCSVライター（pyarrow）で書き出します。
+  pyarrow が未インストールの場合は pandas で書き出します（大規模データでは低速）
 """
 
+import argparse
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from collections import namedtuple
+from datetime import datetime
 import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    # pyarrow はオプション依存（未インストール時は pandas で書き出す）
+    pa = None
+
+# 乱数シード（再現性のため）
+DEFAULT_SEED = 42
+
+# 既定のファンド構成（26本: アクティブ ヘッジなし10本・ヘッジあり10本、パッシブ 各3本）
+DEFAULT_N_FUNDS = 26
+DEFAULT_N_MONTHS = 48  # 48か月分（36か月 + 余裕）
+ACTIVE_SHARE = 0.77    # アクティブファンドの割合
+HEDGE_SHARE = 0.5      # 為替ヘッジありの割合（アクティブ・パッシブそれぞれ）
+
+INVESTMENT_STYLES = ('成長', 'バリュー', 'ブレンド')
+
+# リターンの共通ファクターモデル（すべて年率）
+# - market_return, market_vol: 市場ファクター（S&P500を想定、全ファンド共通）
+# - fx_vol: 為替ファクター（USD/JPY、ヘッジなしのファンドのみ）
+# - style_vol: 運用スタイルごとのファクター（アクティブのみ、同じスタイルのファンド間の相関）
+# - beta_std: アクティブファンドの市場ベータのばらつき（平均1、パッシブは1）
+# - active_risk: アクティブファンド固有の変動
+# - tracking_error: パッシブファンドのトラッキングエラー
+# - alpha_range: アクティブファンドのアルファの範囲（一様分布）
+FactorModel = namedtuple(
+    'FactorModel',
+    ['market_return', 'market_vol', 'fx_vol', 'style_vol', 'beta_std', 'active_risk', 'tracking_error',
+     'alpha_range'],
+    defaults=[0.10, 0.15, 0.10, 0.03, 0.10, 0.02, 0.001, (-0.02, 0.03)],
+)
+
+# ファンドの区分（fund_id の接頭辞, 種類, ヘッジ, 信託報酬の範囲（％）, 純資産の範囲（百万円））
+_FUND_GROUPS = (
+    ('ACT_NH', 'アクティブ', 'なし', (0.5, 1.8), (1000, 50000)),
+    ('ACT_H', 'アクティブ', 'あり', (0.7, 2.0), (1000, 50000)),
+    ('PAS_NH', 'パッシブ', 'なし', (0.05, 0.3), (10000, 100000)),
+    ('PAS_H', 'パッシブ', 'あり', (0.1, 0.4), (10000, 100000)),
+)
+
+# 基準価額の初期値（設定時）
+NAV_BASE = 10000.0
+
+_BENCHMARKS = {'なし': 'S&P500指数（円換算ベース）', 'あり': 'S&P500指数（円ヘッジベース）'}
+
+
+def month_end_dates(base_date: str = '2024-10-31', n_months: int = DEFAULT_N_MONTHS) -> pd.DatetimeIndex:
+    """
+    基準日の前月までの n_months か月の月末日付（昇順）
+
+    Parameters:
+        base_date (str): 基準日（YYYY-MM-DD形式）
+        n_months (int): 月数
+
+    Returns:
+        pd.DatetimeIndex: 月末日付
+    """
+    last = pd.Period(base_date, freq='M') - 1
+    months = pd.period_range(end=last, periods=n_months, freq='M')
+    return months.to_timestamp(how='end').normalize()
 
-# 乱数シードの設定（再現性のため）
-np.random.seed(42)
 
-def generate_fund_attributes():
+def fund_group_sizes(n_funds: int, active_share: float = ACTIVE_SHARE, hedge_share: float = HEDGE_SHARE) -> list:
+    """
+    区分（_FUND_GROUPS の順）ごとのファンド数
+
+    Parameters:
+        n_funds (int): ファンド数
+        active_share (float): アクティブファンドの割合
+        hedge_share (float): 為替ヘッジありの割合
+
+    Returns:
+        list: [アクティブ ヘッジなし, アクティブ ヘッジあり, パッシブ ヘッジなし, パッシブ ヘッジあり]
+    """
+    if not 0 <= active_share <= 1 or not 0 <= hedge_share <= 1:
+        raise ValueError("active_share, hedge_share は 0 以上 1 以下で指定してください")
+    n_active = int(round(n_funds * active_share))
+    n_passive = n_funds - n_active
+    active_hedge = int(round(n_active * hedge_share))
+    passive_hedge = int(round(n_passive * hedge_share))
+    return [n_active - active_hedge, active_hedge, n_passive - passive_hedge, passive_hedge]
+
+
+def generate_fund_attributes(n_funds: int = DEFAULT_N_FUNDS, active_share: float = ACTIVE_SHARE,
+                             hedge_share: float = HEDGE_SHARE, base_date: str = '2024-10-31',
+                             n_months: int = DEFAULT_N_MONTHS, late_share: float = 0.0,
+                             redeemed_share: float = 0.0, rng: np.random.Generator = None):
     """
     ファンド属性データを生成する
-    
+
+    区分ごとの列を配列でまとめて生成します（1本ずつ行を作らない）。
+
+    Parameters:
+        n_funds (int): ファンド数
+        active_share (float): アクティブファンドの割合
+        hedge_share (float): 為替ヘッジありの割合（アクティブ・パッシブそれぞれ）
+        base_date (str): 基準日（YYYY-MM-DD形式）
+        n_months (int): 月次リターンの月数（設定日・償還日をこの期間に合わせる）
+        late_share (float): 期間の途中で設定されたファンドの割合（残りは期間開始前に設定）
+        redeemed_share (float): 期間の途中で償還されたファンドの割合
+        rng (np.random.Generator): 乱数生成器（省略時は DEFAULT_SEED）
+
     Returns:
         pd.DataFrame: ファンド属性データ
     """
-    # アクティブファンド（ヘッジなし）
-    active_no_hedge = []
-    for i in range(10):
-        active_no_hedge.append({
-            'fund_id': f'ACT_NH_{i+1:03d}',
-            'fund_name': f'米国株式アクティブファンド{i+1}（為替ヘッジなし）',
-            'management_company': f'運用会社{(i % 5) + 1}',
-            'inception_date': (datetime(2020, 1, 1) - timedelta(days=np.random.randint(365, 3650))).strftime('%Y-%m-%d'),
-            'share_class': 'A',
-            'currency_hedge': 'なし',
-            'benchmark': 'S&P500指数（円換算ベース）',
-            'expense_ratio': round(np.random.uniform(0.5, 1.8), 2),
-            'aum_latest': round(np.random.uniform(1000, 50000), 2),
-            'fund_type': 'アクティブ',
-            'is_index_fund': False,
-            'investment_style': np.random.choice(['成長', 'バリュー', 'ブレンド']),
-            'is_theme_fund': False,
-            'is_leveraged': False,
-            'is_fund_of_funds': False,
-            'status': '運用中',
-            'redemption_date': '',
-            'inclusion_reason': '米国株式アクティブファンド、36か月以上のトラックレコードあり'
-        })
-    
-    # アクティブファンド（ヘッジあり）
-    active_hedge = []
-    for i in range(10):
-        active_hedge.append({
-            'fund_id': f'ACT_H_{i+1:03d}',
-            'fund_name': f'米国株式アクティブファンド{i+1}（為替ヘッジあり）',
-            'management_company': f'運用会社{(i % 5) + 1}',
-            'inception_date': (datetime(2020, 1, 1) - timedelta(days=np.random.randint(365, 3650))).strftime('%Y-%m-%d'),
-            'share_class': 'A',
-            'currency_hedge': 'あり',
-            'benchmark': 'S&P500指数（円ヘッジベース）',
-            'expense_ratio': round(np.random.uniform(0.7, 2.0), 2),
-            'aum_latest': round(np.random.uniform(1000, 50000), 2),
-            'fund_type': 'アクティブ',
-            'is_index_fund': False,
-            'investment_style': np.random.choice(['成長', 'バリュー', 'ブレンド']),
-            'is_theme_fund': False,
-            'is_leveraged': False,
-            'is_fund_of_funds': False,
-            'status': '運用中',
-            'redemption_date': '',
-            'inclusion_reason': '米国株式アクティブファンド、36か月以上のトラックレコードあり'
-        })
-    
-    # パッシブファンド（ヘッジなし）
-    passive_no_hedge = []
-    for i in range(3):
-        passive_no_hedge.append({
-            'fund_id': f'PAS_NH_{i+1:03d}',
-            'fund_name': f'米国株式インデックスファンド{i+1}（為替ヘッジなし）',
-            'management_company': f'運用会社{(i % 3) + 1}',
-            'inception_date': (datetime(2020, 1, 1) - timedelta(days=np.random.randint(365, 3650))).strftime('%Y-%m-%d'),
-            'share_class': 'A',
-            'currency_hedge': 'なし',
-            'benchmark': 'S&P500指数（円換算ベース）',
-            'expense_ratio': round(np.random.uniform(0.05, 0.3), 2),
-            'aum_latest': round(np.random.uniform(10000, 100000), 2),
-            'fund_type': 'パッシブ',
-            'is_index_fund': True,
-            'investment_style': 'ブレンド',
-            'is_theme_fund': False,
-            'is_leveraged': False,
-            'is_fund_of_funds': False,
-            'status': '運用中',
-            'redemption_date': '',
-            'inclusion_reason': 'S&P500連動パッシブファンド、36か月以上のトラックレコードあり'
-        })
-    
-    # パッシブファンド（ヘッジあり）
-    passive_hedge = []
-    for i in range(3):
-        passive_hedge.append({
-            'fund_id': f'PAS_H_{i+1:03d}',
-            'fund_name': f'米国株式インデックスファンド{i+1}（為替ヘッジあり）',
-            'management_company': f'運用会社{(i % 3) + 1}',
-            'inception_date': (datetime(2020, 1, 1) - timedelta(days=np.random.randint(365, 3650))).strftime('%Y-%m-%d'),
+    rng = np.random.default_rng(DEFAULT_SEED) if rng is None else rng
+    sizes = fund_group_sizes(n_funds, active_share, hedge_share)
+    width = max(3, len(str(max(sizes))))
+
+    groups = []
+    for (prefix, fund_type, hedge, expense_range, aum_range), size in zip(_FUND_GROUPS, sizes):
+        number = np.arange(1, size + 1)
+        is_active = fund_type == 'アクティブ'
+        kind = '米国株式アクティブファンド' if is_active else '米国株式インデックスファンド'
+        groups.append(pd.DataFrame({
+            'fund_id': [f'{prefix}_{i:0{width}d}' for i in number],
+            'fund_name': [f'{kind}{i}（為替ヘッジ{hedge}）' for i in number],
+            'management_company': [f'運用会社{c}' for c in (number - 1) % (5 if is_active else 3) + 1],
             'share_class': 'A',
-            'currency_hedge': 'あり',
-            'benchmark': 'S&P500指数（円ヘッジベース）',
-            'expense_ratio': round(np.random.uniform(0.1, 0.4), 2),
-            'aum_latest': round(np.random.uniform(10000, 100000), 2),
-            'fund_type': 'パッシブ',
-            'is_index_fund': True,
-            'investment_style': 'ブレンド',
+            'currency_hedge': hedge,
+            'benchmark': _BENCHMARKS[hedge],
+            'expense_ratio': np.round(rng.uniform(*expense_range, size), 2),
+            'aum_latest': np.round(rng.uniform(*aum_range, size), 2),
+            'fund_type': fund_type,
+            'is_index_fund': not is_active,
+            'investment_style': (rng.choice(INVESTMENT_STYLES, size) if is_active else 'ブレンド'),
             'is_theme_fund': False,
             'is_leveraged': False,
             'is_fund_of_funds': False,
-            'status': '運用中',
-            'redemption_date': '',
-            'inclusion_reason': 'S&P500連動パッシブファンド、36か月以上のトラックレコードあり'
-        })
-    
-    # すべてのファンドを結合
-    all_funds = active_no_hedge + active_hedge + passive_no_hedge + passive_hedge
-    
-    return pd.DataFrame(all_funds)
-
-
-def generate_monthly_returns(fund_attributes, base_date='2024-10-31', n_months=48):
+        }))
+    attributes = pd.concat(groups, ignore_index=True)
+
+    # 存続期間（月のインデックス、両端を含む）。途中で設定・償還されるファンドも12か月以上は存続させる
+    months = month_end_dates(base_date, n_months)
+    n_funds = len(attributes)
+    first = np.zeros(n_funds, dtype=np.int64)
+    last = np.full(n_funds, n_months - 1, dtype=np.int64)
+    late = rng.random(n_funds) < late_share
+    redeemed = rng.random(n_funds) < redeemed_share
+    span = max(n_months - 12, 1)
+    first[late] = rng.integers(0, span, late.sum())
+    last[redeemed] = np.minimum(first[redeemed] + 11 + rng.integers(0, span, redeemed.sum()), n_months - 1)
+
+    # 期間開始前に設定されたファンドは1～10年前の設定日
+    start = months[0].to_period('M').to_timestamp()
+    inception = months[first].to_period('M').to_timestamp()
+    before = pd.to_timedelta(rng.integers(365, 3650, n_funds), unit='D')
+    inception = inception.where(late, start - before)
+
+    attributes.insert(3, 'inception_date', inception.strftime('%Y-%m-%d'))
+    attributes['status'] = np.where(redeemed, '償還', '運用中')
+    attributes['redemption_date'] = np.where(redeemed, months[last].strftime('%Y-%m-%d'), '')
+    attributes['inclusion_reason'] = np.where(
+        attributes['fund_type'] == 'アクティブ',
+        '米国株式アクティブファンド、36か月以上のトラックレコードあり',
+        'S&P500連動パッシブファンド、36か月以上のトラックレコードあり',
+    )
+    return attributes
+
+
+def simulate_return_matrix(fund_attributes: pd.DataFrame, n_months: int, model: FactorModel = FactorModel(),
+                           rng: np.random.Generator = None) -> np.ndarray:
     """
-    月次リターンデータを生成する
-    
+    共通ファクターモデルで全ファンド × 全月の月次リターンを生成する
+
+    r[i, t] = β_i × 市場_t + 為替_t（ヘッジなし）+ スタイル_{s(i), t}（アクティブ）
+              + α_i − 信託報酬_i + ε[i, t]
+
+    市場・為替・スタイルのファクターは月ごとに1回だけ生成し、全ファンドで共有します。
+
     Parameters:
         fund_attributes (pd.DataFrame): ファンド属性データ
-        base_date (str): 基準日（YYYY-MM-DD形式）
-        n_months (int): 生成する月数
-        
+        n_months (int): 月数
+        model (FactorModel): ファクターモデルのパラメータ
+        rng (np.random.Generator): 乱数生成器（省略時は DEFAULT_SEED）
+
+    Returns:
+        np.ndarray: 月次リターン（shape: ファンド数 × 月数）
+    """
+    rng = np.random.default_rng(DEFAULT_SEED) if rng is None else rng
+    n_funds = len(fund_attributes)
+    monthly = np.sqrt(12)
+    is_active = (fund_attributes['fund_type'] == 'アクティブ').to_numpy()
+    unhedged = (fund_attributes['currency_hedge'] == 'なし').to_numpy()
+    styles = pd.Categorical(fund_attributes['investment_style'], categories=INVESTMENT_STYLES).codes
+
+    market = rng.normal(model.market_return / 12, model.market_vol / monthly, n_months)
+    fx = rng.normal(0, model.fx_vol / monthly, n_months)
+    style_factors = rng.normal(0, model.style_vol / monthly, (len(INVESTMENT_STYLES), n_months))
+
+    beta = np.where(is_active, rng.normal(1.0, model.beta_std, n_funds), 1.0)
+    alpha = np.where(is_active, rng.uniform(*model.alpha_range, n_funds), 0.0) / 12
+    expense = fund_attributes['expense_ratio'].to_numpy(dtype=np.float64) / 100 / 12
+    idiosyncratic = np.where(is_active, model.active_risk, model.tracking_error) / monthly
+
+    returns = rng.standard_normal((n_funds, n_months))
+    returns *= idiosyncratic[:, None]
+    returns += beta[:, None] * market
+    returns[unhedged] += fx
+    returns[is_active] += style_factors[styles[is_active]]
+    returns += (alpha - expense)[:, None]
+    return returns
+
+
+def observed_mask(fund_attributes: pd.DataFrame, months: pd.DatetimeIndex) -> np.ndarray:
+    """ファンドの存続期間（設定月～償還月）の月（shape: ファンド数 × 月数）"""
+    month_index = months.year * 12 + months.month - 1
+    inception = pd.to_datetime(fund_attributes['inception_date'])
+    redemption = pd.to_datetime(fund_attributes['redemption_date'], errors='coerce')
+    first = (inception.dt.year * 12 + inception.dt.month - 1).to_numpy()
+    last = (redemption.dt.year * 12 + redemption.dt.month - 1).fillna(month_index[-1]).to_numpy()
+    month_index = month_index.to_numpy()
+    return (month_index >= first[:, None]) & (month_index <= last[:, None])
+
+
+def simulate_nav_aum(returns: np.ndarray, mask: np.ndarray, aum_latest) -> tuple:
+    """
+    月次リターンの行列から基準価額・純資産総額の行列を作る
+
+    基準価額は存続期間の初月の前を10,000として書き出すリターン（小数6桁）で複利計算し、
+    純資産総額は資金流出入がないものとして最終月が aum_latest になるよう基準価額に比例させます。
+
+    Parameters:
+        returns (np.ndarray): 月次リターン（shape: ファンド数 × 月数）
+        mask (np.ndarray): 存続期間の月（observed_mask）
+        aum_latest (array-like): 各ファンドの最新の純資産総額
+
+    Returns:
+        tuple: (基準価額, 純資産総額)（shape: ファンド数 × 月数、存続期間外の値は不定）
+    """
+    growth = np.where(mask, 1.0 + np.round(returns, 6), 1.0)
+    nav = NAV_BASE * np.cumprod(growth, axis=1)
+    last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    latest_nav = nav[np.arange(len(nav)), last]
+    aum = np.asarray(aum_latest, dtype=np.float64)[:, None] * nav / latest_nav[:, None]
+    return nav, aum
+
+
+def write_monthly_returns(output_path, fund_ids, months: pd.DatetimeIndex, returns: np.ndarray,
+                          mask: np.ndarray = None, nav: np.ndarray = None, aum: np.ndarray = None) -> int:
+    """
+    月次リターンの行列を縦持ちのCSV（UTF-8 with BOM）として書き出す
+
+    pyarrow がある場合は列（fund_id は辞書型、month_end_date は日付型）から Arrow のCSVライターで
+    書き出し、ファンド × 月の行を Python で作りません。
+
+    Parameters:
+        output_path (str): 出力先
+        fund_ids (sequence): 行列の行の fund_id
+        months (pd.DatetimeIndex): 行列の列の月末日付
+        returns (np.ndarray): 月次リターン（shape: ファンド数 × 月数）
+        mask (np.ndarray): 書き出すセル（省略時はすべて）
+        nav, aum (np.ndarray): 基準価額・純資産総額（simulate_nav_aum、省略時は空欄）
+
     Returns:
-        pd.DataFrame: 月次リターンデータ
+        int: 書き出した行数
     """
-    base_dt = datetime.strptime(base_date, '%Y-%m-%d')
-    
-    # 月末日付のリストを生成
-    month_ends = []
-    for i in range(n_months, 0, -1):
-        # i か月前の月末を計算
-        year = base_dt.year
-        month = base_dt.month - i
-        
-        while month <= 0:
-            month += 12
-            year -= 1
-        
-        # その月の末日を取得
-        if month == 12:
-            next_month = datetime(year + 1, 1, 1)
-        else:
-            next_month = datetime(year, month + 1, 1)
-        
-        month_end = next_month - timedelta(days=1)
-        month_ends.append(month_end.strftime('%Y-%m-%d'))
-    
-    # 各ファンドの月次リターンを生成
-    all_returns = []
-    
-    for _, fund in fund_attributes.iterrows():
-        fund_id = fund['fund_id']
-        fund_type = fund['fund_type']
-        currency_hedge = fund['currency_hedge']
-        
-        # ベースとなる市場リターンを生成（S&P500を想定）
-        # 年率リターン: 約10%、ボラティリティ: 約15%
-        market_monthly_mean = 0.10 / 12  # 月次平均リターン
-        market_monthly_std = 0.15 / np.sqrt(12)  # 月次標準偏差
-        
-        market_returns = np.random.normal(market_monthly_mean, market_monthly_std, n_months)
-        
-        # 為替リターンを生成（ヘッジなしの場合のみ）
-        if currency_hedge == 'なし':
-            # USD/JPY の変動（年率ボラティリティ約10%）
-            fx_monthly_std = 0.10 / np.sqrt(12)
-            fx_returns = np.random.normal(0, fx_monthly_std, n_months)
-        else:
-            fx_returns = np.zeros(n_months)
-        
-        # ファンドタイプに応じてリターンを調整
-        if fund_type == 'パッシブ':
-            # パッシブ: 市場リターン - 信託報酬
-            expense_ratio = fund['expense_ratio'] / 100
-            monthly_expense = expense_ratio / 12
-            fund_returns = market_returns + fx_returns - monthly_expense
-            
-            # トラッキングエラーを追加（年率0.1%程度）
-            tracking_error = np.random.normal(0, 0.001 / np.sqrt(12), n_months)
-            fund_returns += tracking_error
-            
-        else:  # アクティブ
-            # アクティブ: 市場リターン + アルファ - 信託報酬
-            expense_ratio = fund['expense_ratio'] / 100
-            monthly_expense = expense_ratio / 12
-            
-            # アルファを生成（一部のファンドは正、一部は負）
-            # 年率アルファの範囲: -2% ～ +3%
-            annual_alpha = np.random.uniform(-0.02, 0.03)
-            monthly_alpha = annual_alpha / 12
-            
-            # アクティブリスク（年率2%程度）
-            active_risk = np.random.normal(0, 0.02 / np.sqrt(12), n_months)
-            
-            fund_returns = market_returns + fx_returns + monthly_alpha + active_risk - monthly_expense
-        
-        # 各月のデータを作成
-        for i, month_end in enumerate(month_ends):
-            all_returns.append({
-                'fund_id': fund_id,
-                'month_end_date': month_end,
-                'monthly_return': round(fund_returns[i], 6),
-                'nav': None,  # 基準価額は省略
-                'aum': None   # 純資産総額は省略
-            })
-    
-    return pd.DataFrame(all_returns)
-
-
-def main():
+    if mask is None:
+        mask = np.ones(returns.shape, dtype=bool)
+    funds, columns = np.nonzero(mask)
+    values = np.round(returns[funds, columns], 6)
+    nav_values = np.round(nav[funds, columns], 2) if nav is not None else np.full(len(values), np.nan)
+    aum_values = np.round(aum[funds, columns], 2) if aum is not None else np.full(len(values), np.nan)
+
+    if pa is None:
+        pd.DataFrame({
+            'fund_id': pd.Categorical.from_codes(funds, categories=pd.Index(fund_ids)),
+            'month_end_date': months[columns].strftime('%Y-%m-%d'),
+            'monthly_return': values,
+            'nav': nav_values,
+            'aum': aum_values,
+        }).to_csv(output_path, index=False, encoding='utf-8-sig')
+        return len(values)
+
+    table = pa.table({
+        'fund_id': pa.DictionaryArray.from_arrays(pa.array(funds.astype(np.int32)), pa.array(list(fund_ids))),
+        'month_end_date': pa.array(months.to_numpy(dtype='datetime64[D]')[columns]),
+        'monthly_return': pa.array(values),
+        'nav': pa.array(nav_values, from_pandas=True),
+        'aum': pa.array(aum_values, from_pandas=True),
+    })
+    with open(output_path, 'wb') as f:
+        f.write('\ufeff'.encode('utf-8'))
+        pa_csv.write_csv(table, f)
+    return len(values)
+
+
+def parse_args(argv=None):
+    """コマンドライン引数の解析"""
+    defaults = FactorModel()
+    parser = argparse.ArgumentParser(description="サンプルデータの生成")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(__file__), '..', 'data'),
+                        help="出力先のデータディレクトリ")
+    parser.add_argument('--n-funds', type=int, default=DEFAULT_N_FUNDS,
+                        help=f"ファンド数（デフォルト{DEFAULT_N_FUNDS}）")
+    parser.add_argument('--n-months', type=int, default=DEFAULT_N_MONTHS,
+                        help=f"月数（デフォルト{DEFAULT_N_MONTHS}、30年は360）")
+    parser.add_argument('--base-date', default='2024-10-31', help="基準日（この前月までのデータを生成）")
+    parser.add_argument('--active-share', type=float, default=ACTIVE_SHARE,
+                        help=f"アクティブファンドの割合（デフォルト{ACTIVE_SHARE}）")
+    parser.add_argument('--hedge-share', type=float, default=HEDGE_SHARE,
+                        help=f"為替ヘッジありの割合（デフォルト{HEDGE_SHARE}）")
+    parser.add_argument('--late-share', type=float, default=0.0,
+                        help="期間の途中で設定されたファンドの割合（デフォルト0）")
+    parser.add_argument('--redeemed-share', type=float, default=0.0,
+                        help="期間の途中で償還されたファンドの割合（デフォルト0）")
+    parser.add_argument('--market-vol', type=float, default=defaults.market_vol,
+                        help=f"市場ファクターの年率ボラティリティ（デフォルト{defaults.market_vol}）")
+    parser.add_argument('--fx-vol', type=float, default=defaults.fx_vol,
+                        help=f"為替ファクターの年率ボラティリティ（デフォルト{defaults.fx_vol}）")
+    parser.add_argument('--style-vol', type=float, default=defaults.style_vol,
+                        help=f"運用スタイルのファクターの年率ボラティリティ（デフォルト{defaults.style_vol}）")
+    parser.add_argument('--beta-std', type=float, default=defaults.beta_std,
+                        help=f"アクティブファンドの市場ベータの標準偏差（デフォルト{defaults.beta_std}）")
+    parser.add_argument('--active-risk', type=float, default=defaults.active_risk,
+                        help=f"アクティブファンド固有の年率ボラティリティ（デフォルト{defaults.active_risk}）")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f"乱数シード（デフォルト{DEFAULT_SEED}）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """
     メイン関数
     """
+    args = parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    model = FactorModel(market_vol=args.market_vol, fx_vol=args.fx_vol, style_vol=args.style_vol,
+                        beta_std=args.beta_std, active_risk=args.active_risk)
+
     print("=" * 60)
     print("サンプルデータ生成スクリプト")
     print("=" * 60)
-    
+
     # データディレクトリの作成
-    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+    data_dir = args.data_dir
     os.makedirs(data_dir, exist_ok=True)
-    
+    started = time.perf_counter()
+
     # ファンド属性データの生成
     print("\n1. ファンド属性データを生成中...")
-    fund_attributes = generate_fund_attributes()
-    
+    fund_attributes = generate_fund_attributes(args.n_funds, args.active_share, args.hedge_share,
+                                               args.base_date, args.n_months, args.late_share,
+                                               args.redeemed_share, rng)
+
     output_path = os.path.join(data_dir, 'fund_attributes.csv')
     fund_attributes.to_csv(output_path, index=False, encoding='utf-8-sig')
     print(f"   ✓ {len(fund_attributes)}本のファンドデータを生成")
     print(f"   ✓ 保存先: {output_path}")
-    
+
     # 統計情報の表示
     print("\n   [ファンド構成]")
-    print(f"   - アクティブ（ヘッジなし）: {len(fund_attributes[(fund_attributes['fund_type'] == 'アクティブ') & (fund_attributes['currency_hedge'] == 'なし')])}本")
-    print(f"   - アクティブ（ヘッジあり）: {len(fund_attributes[(fund_attributes['fund_type'] == 'アクティブ') & (fund_attributes['currency_hedge'] == 'あり')])}本")
-    print(f"   - パッシブ（ヘッジなし）: {len(fund_attributes[(fund_attributes['fund_type'] == 'パッシブ') & (fund_attributes['currency_hedge'] == 'なし')])}本")
-    print(f"   - パッシブ（ヘッジあり）: {len(fund_attributes[(fund_attributes['fund_type'] == 'パッシブ') & (fund_attributes['currency_hedge'] == 'あり')])}本")
-    
+    counts = fund_attributes.groupby(['fund_type', 'currency_hedge'], sort=False).size()
+    for (fund_type, hedge), count in counts.items():
+        print(f"   - {fund_type}（ヘッジ{hedge}）: {count}本")
+    redeemed = (fund_attributes['status'] == '償還').sum()
+    if args.late_share > 0 or redeemed > 0:
+        months = month_end_dates(args.base_date, args.n_months)
+        late = (pd.to_datetime(fund_attributes['inception_date']) >= months[0].to_period('M').to_timestamp()).sum()
+        print(f"   - 期間途中の設定: {late}本、償還: {redeemed}本")
+
     # 月次リターンデータの生成
     print("\n2. 月次リターンデータを生成中...")
-    base_date = '2024-10-31'
-    n_months = 48  # 48か月分（36か月 + 余裕）
-    
-    monthly_returns = generate_monthly_returns(fund_attributes, base_date, n_months)
-    
+    months = month_end_dates(args.base_date, args.n_months)
+    returns = simulate_return_matrix(fund_attributes, args.n_months, model, rng)
+    mask = observed_mask(fund_attributes, months)
+    nav, aum = simulate_nav_aum(returns, mask, fund_attributes['aum_latest'])
+
     output_path = os.path.join(data_dir, 'monthly_returns.csv')
-    monthly_returns.to_csv(output_path, index=False, encoding='utf-8-sig')
-    print(f"   ✓ {len(monthly_returns)}件の月次リターンデータを生成")
-    print(f"   ✓ 期間: {monthly_returns['month_end_date'].min()} ～ {monthly_returns['month_end_date'].max()}")
+    n_rows = write_monthly_returns(output_path, fund_attributes['fund_id'], months, returns, mask, nav, aum)
+    print(f"   ✓ {n_rows}件の月次リターンデータを生成")
+    print(f"   ✓ 期間: {months[0]:%Y-%m-%d} ～ {months[-1]:%Y-%m-%d}")
     print(f"   ✓ 保存先: {output_path}")
-    
+    print(f"   ✓ 生成時間: {time.perf_counter() - started:.1f}秒")
+
     # データソース情報の記録
     print("\n3. データソース情報を記録中...")
     data_sources_path = os.path.join(data_dir, 'data_sources.txt')
@@ -270,17 +407,19 @@ def main():
         f.write("=" * 60 + "\n\n")
         f.write("データタイプ: サンプルデータ（シミュレーション）\n")
         f.write(f"生成日: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"基準日: {base_date}\n")
+        f.write(f"基準日: {args.base_date}\n")
         f.write(f"ファンド数: {len(fund_attributes)}本\n")
-        f.write(f"データ期間: {n_months}か月\n\n")
+        f.write(f"データ期間: {args.n_months}か月\n")
+        f.write(f"乱数シード: {args.seed}\n")
+        f.write(f"ファクターモデル: {dict(model._asdict())}\n\n")
         f.write("注意事項:\n")
         f.write("- このデータは分析フレームワークの動作確認用のサンプルデータです\n")
         f.write("- 実際のファンドパフォーマンスに基づいたリアリスティックな値を生成していますが、\n")
         f.write("  実在するファンドのデータではありません\n")
         f.write("- 本番分析には、実際のファンドデータを使用してください\n")
-    
+
     print(f"   ✓ 保存先: {data_sources_path}")
-    
+
     # 完了メッセージ
     print("\n" + "=" * 60)
     print("サンプルデータの生成が完了しました！")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+HTMLレポート作成スクリプト
+- ローリング分析結果（セグメントの超過リターン推移）とファンド × ウィンドウの超過リターンを1つのHTMLにまとめる
+- サーバー不要（ファイルを直接ブラウザで開く）。1万本 × 240ウィンドウでも操作が重くならない
+  - セグメントの推移は LTTB で間引いた段階を持ち、拡大に応じて切り替え
+  - ファンドの系列は float32 のチャンクで埋め込み、選択したときに読み込む
+- 可視化の図（figure_manifest.json の PNG）も埋め込む
+"""
+
+import argparse
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import warnings
+warnings.filterwarnings('ignore')
+
+from funds_core import (
+    ACTIVE,
+    BAND_PERCENTILES,
+    CHUNK_FUNDS,
+    DEFAULT_PARTIAL_HISTORY,
+    DEFAULT_SEGMENT_KEYS,
+    MIN_PARTIAL_MONTHS,
+    PARTIAL_HISTORY_TREATMENTS,
+    REPORT_NAME,
+    encode_chunks,
+    encode_figure,
+    json_values,
+    key_values,
+    load_manifest,
+    overview_levels,
+    segment_bands,
+    segment_title,
+    write_html_report,
+)
+from robustness_analysis import RobustnessAnalyzer
+
+# セグメントの推移として表示する列（key, 表示名, 初期表示）
+REPORT_SERIES = [
+    ('excess_all_equal', 'アクティブ全体 vs パッシブ（等金額）', True),
+    ('excess_top50_equal', 'アクティブ上位50% vs パッシブ（等金額）', True),
+    ('excess_all_aum', 'アクティブ全体 vs パッシブ（AUM加重）', False),
+    ('excess_top50_aum', 'アクティブ上位50% vs パッシブ（AUM加重）', False),
+]
+
+# 埋め込む図の形式
+FIGURE_MIME_TYPES = {'.png': 'image/png', '.svg': 'image/svg+xml'}
+
+
+class HtmlReport:
+    """HTMLレポート作成クラス"""
+
+    def __init__(self, output_dir: str = "../output", chunk_funds: int = CHUNK_FUNDS):
+        """
+        初期化
+
+        Parameters:
+        -----------
+        output_dir : str
+            出力ディレクトリ（分析結果CSV・図の読み込み元、レポートの保存先）
+        chunk_funds : int
+            ファンドの系列を埋め込むチャンクのファンド数（表示時はチャンク単位で読み込む）
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True)
+        self.chunk_funds = chunk_funds
+
+        self.window_months = 36
+        self.segment_keys = DEFAULT_SEGMENT_KEYS
+        self.rolling_results = None
+        self.fund_excess_returns = None
+        self.fund_attributes = None
+        self.figures = []
+        # 図・マニフェストのディレクトリ（可視化の描画プロファイルの出力先）
+        self.figure_dir = self.output_dir
+
+    def set_results(self, robustness: RobustnessAnalyzer, visualization=None):
+        """
+        メモリ上の分析結果を設定
+
+        Parameters:
+        -----------
+        robustness : RobustnessAnalyzer
+            calculate_fund_excess_returns 実行済みの分析（ローリング分析結果があればそれも使う）
+        visualization : FundVisualization, optional
+            描画済みの可視化（マニフェストの図を埋め込む）
+        """
+        print("=" * 80)
+        print("HTMLレポート: 分析結果受け取り（メモリ上）")
+        print("=" * 80)
+
+        if robustness.fund_excess_returns is None:
+            raise ValueError("ファンド別超過リターンがありません（calculate_fund_excess_returns を先に実行してください）")
+        self.window_months = robustness.analysis_period_months
+        self.segment_keys = robustness.segment_keys
+        self.fund_excess_returns = robustness.fund_excess_returns
+        self.fund_attributes = robustness.fund_attributes
+        print("✓ ファンド別超過リターン受け取り完了")
+
+        if robustness.rolling_results_df is not None:
+            self.rolling_results = robustness.rolling_results_df
+        elif visualization is not None and visualization.rolling_results is not None:
+            self.rolling_results = visualization.rolling_results
+        if self.rolling_results is not None:
+            print("✓ ローリング分析結果受け取り完了")
+
+        if visualization is not None:
+            self.figure_dir = visualization.figure_dir
+            self.figures = visualization.manifest or list(load_manifest(self.figure_dir).values())
+            print(f"✓ 図 {len(self.figures)} 枚受け取り完了")
+
+        return self
+
+    def load_results(self):
+        """出力ディレクトリのローリング分析結果・図のマニフェストを読み込む（set_results で未設定の場合）"""
+        if self.rolling_results is None:
+            rolling_path = self.output_dir / f"rolling_{self.window_months}month_analysis.csv"
+            if rolling_path.exists():
+                self.rolling_results = pd.read_csv(rolling_path, encoding='utf-8-sig', parse_dates=['window_end'])
+                print("✓ ローリング分析結果読み込み完了")
+            else:
+                print(f"⚠ ローリング分析結果が見つかりません: {rolling_path}")
+
+        if not self.figures:
+            self.figures = list(load_manifest(self.figure_dir).values())
+            print(f"✓ 図のマニフェスト読み込み完了: {len(self.figures)} 枚")
+
+        return self
+
+    def _segments(self, window_end: pd.DatetimeIndex, attributes: pd.DataFrame, excess: np.ndarray) -> tuple:
+        """セグメントごとの推移・分位帯と、各ファンドのセグメント番号"""
+        keys = list(self.segment_keys)
+        if self.rolling_results is None:
+            return [], np.full(len(attributes), -1, dtype=np.int64)
+        missing = [key for key in keys if key not in self.rolling_results.columns]
+        if missing:
+            raise ValueError(f"ローリング分析結果にセグメントのキー列 {missing} がありません")
+
+        groups = list(self.rolling_results.groupby(keys, sort=False))
+        labels = pd.MultiIndex.from_tuples([tuple(map(str, np.atleast_1d(group))) for group, _ in groups])
+        fund_labels = pd.MultiIndex.from_arrays(
+            [np.asarray(key_values(attributes, key), dtype=object).astype(str) for key in keys]
+        )
+        fund_segments = labels.get_indexer(fund_labels).astype(np.int64)
+
+        # 分位帯はアクティブファンドのみ
+        is_active = (attributes['fund_type'] == ACTIVE).to_numpy()
+        bands = segment_bands(excess, np.where(is_active, fund_segments, -1), len(groups))
+        median = list(BAND_PERCENTILES).index(50)
+
+        segments = []
+        for (group, rows), band in zip(groups, bands):
+            rows = rows.set_index('window_end').reindex(window_end)
+            series = {}
+            for column, _, _ in REPORT_SERIES:
+                values = rows[column].to_numpy(dtype=np.float64) * 100
+                series[column] = {'values': json_values(values), 'levels': overview_levels(values)}
+            segments.append({
+                'title': segment_title(dict(zip(keys, np.atleast_1d(group)))),
+                'series': series,
+                'band': {
+                    'percentiles': list(BAND_PERCENTILES),
+                    'values': [json_values(values) for values in band],
+                    'levels': overview_levels(band[median]),
+                },
+            })
+        return segments, fund_segments
+
+    def _figures(self) -> list:
+        """埋め込む図（マニフェストの順、ファイルが存在する画像のみ）"""
+        figures = []
+        for entry in self.figures:
+            path = self.figure_dir / entry['filename']
+            mime = FIGURE_MIME_TYPES.get(path.suffix.lower())
+            if mime is not None and path.exists():
+                figures.append({'title': entry.get('title', entry['filename']), 'mime': mime,
+                                'data': encode_figure(path)})
+        return figures
+
+    def write_report(self, filename: str = REPORT_NAME):
+        """
+        HTMLレポートの作成・保存
+
+        Parameters:
+        -----------
+        filename : str
+            出力ファイル名
+        """
+        print("\n" + "=" * 80)
+        print("HTMLレポート作成")
+        print("=" * 80)
+
+        if self.fund_excess_returns is None:
+            print("⚠ ファンド別超過リターンがありません")
+            return self
+
+        excess_frame = self.fund_excess_returns
+        window_end = pd.DatetimeIndex(excess_frame.columns)
+        window_start = window_end.to_period('M') - (self.window_months - 1)
+        attributes = (self.fund_attributes.drop_duplicates('fund_id').set_index('fund_id')
+                      .reindex(excess_frame.index).reset_index())
+        excess = excess_frame.to_numpy(dtype=np.float64) * 100
+
+        segments, fund_segments = self._segments(window_end, attributes, excess)
+        observed = ~np.isnan(excess)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fund_mean = np.where(observed, excess, 0.0).sum(axis=1) / observed.sum(axis=1)
+
+        payload = {
+            'title': f"ローリング{self.window_months}か月 超過リターンレポート",
+            'subtitle': (f"ファンド {len(attributes):,} 本・ウィンドウ {len(window_end)} 本"
+                         f"（終了月 {window_end[0]:%Y-%m} ～ {window_end[-1]:%Y-%m}）" if len(window_end) > 0 else ""),
+            'windows': {'start': window_start.strftime('%Y-%m').tolist(),
+                        'end': window_end.strftime('%Y-%m').tolist()},
+            'series': [{'key': key, 'label': label, 'default': default} for key, label, default in REPORT_SERIES],
+            'segments': segments,
+            'funds': {
+                'id': attributes['fund_id'].astype(str).tolist(),
+                'name': attributes['fund_name'].fillna('').astype(str).tolist(),
+                'type': attributes['fund_type'].fillna('').astype(str).tolist(),
+                'segment': fund_segments.tolist(),
+                'mean': json_values(fund_mean),
+                'latest': json_values(excess[:, -1] if len(window_end) > 0 else np.full(len(attributes), np.nan)),
+                'windows': observed.sum(axis=1).tolist(),
+            },
+            'chunk_funds': self.chunk_funds,
+        }
+        chunks = encode_chunks(excess, self.chunk_funds)
+        path = write_html_report(self.output_dir / filename, payload, chunks, self._figures())
+
+        print(f"✓ HTMLレポート保存: {path.name}（{path.stat().st_size / 1024 / 1024:.1f} MB、"
+              f"セグメント {len(segments)}、チャンク {len(chunks)}）")
+
+        return self
+
+
+def parse_args(argv=None):
+    """コマンドライン引数の解析"""
+    parser = argparse.ArgumentParser(description="HTMLレポートの作成")
+    parser.add_argument('--output-dir', default="../output", help="分析結果・図の出力ディレクトリ（レポートの保存先）")
+    parser.add_argument('--window-months', type=int, default=36,
+                        help="ローリングウィンドウ長（月数、デフォルト36）")
+    parser.add_argument('--segment-keys', nargs='+', default=list(DEFAULT_SEGMENT_KEYS),
+                        help="セグメントのキー列（ローリング分析と同じキー）")
+    parser.add_argument('--passive-keys', nargs='*', default=None,
+                        help="パッシブファンドを対応付けるキー列（--segment-keys の一部。省略時は同じキー）")
+    parser.add_argument('--partial-history', choices=PARTIAL_HISTORY_TREATMENTS, default=DEFAULT_PARTIAL_HISTORY,
+                        help="ウィンドウ途中で設定・償還されたファンドの扱い（ローリング分析と同じ）")
+    parser.add_argument('--min-months', type=int, default=MIN_PARTIAL_MONTHS,
+                        help=f"available / cash で含めるファンドの最低データ月数（デフォルト{MIN_PARTIAL_MONTHS}）")
+    parser.add_argument('--chunk-funds', type=int, default=CHUNK_FUNDS,
+                        help=f"ファンドの系列を埋め込むチャンクのファンド数（デフォルト{CHUNK_FUNDS}）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """メイン実行関数"""
+    args = parse_args(argv)
+
+    print("\n")
+    print("=" * 80)
+    print("HTMLレポート作成")
+    print("=" * 80)
+
+    try:
+        robustness = RobustnessAnalyzer(analysis_period_months=args.window_months,
+                                        segment_keys=args.segment_keys,
+                                        passive_keys=args.passive_keys,
+                                        partial_history=args.partial_history,
+                                        min_months=args.min_months)
+        robustness.load_data() \
+                  .calculate_fund_excess_returns()
+
+        HtmlReport(output_dir=args.output_dir, chunk_funds=args.chunk_funds) \
+            .set_results(robustness) \
+            .load_results() \
+            .write_report()
+
+        print("\n" + "=" * 80)
+        print("HTMLレポート作成完了")
+        print("=" * 80)
+
+    except Exception as e:
+        print(f"\n❌ エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
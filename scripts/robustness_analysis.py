@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 """
 ロバストネス分析スクリプト
-- ローリング36か月分析
+- ローリング36か月分析（ウィンドウ長は変更可能）
 - 起点を1か月ずつずらして超過リターンの安定性を確認
+- 12/36/60/120か月などの複数ウィンドウ長を一括で分析（マルチホライズン）
+- ウィンドウごとのアクティブ vs パッシブの検定（ローリング有意性）
+- ファンド × ウィンドウのリスク調整後指標（シャープ・ソルティノ・最大DD・TE・IR・ベータ／アルファ）
+- 設定日・償還日による時点ユニバース（ウィンドウ途中で設定・償還されたファンドの扱いを選択可能）
+- ファンド × ウィンドウの超過リターン（HTMLレポートの個別ファンド表示用）
+- 月次データ追加時は新しい月を終点とするウィンドウのみを計算（差分更新）
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -13,42 +20,135 @@ from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+from funds_core import (
+    AUM_WEIGHTINGS,
+    DEFAULT_AUM_WEIGHTING,
+    DEFAULT_PARTIAL_HISTORY,
+    DEFAULT_SEGMENT_KEYS,
+    MIN_PARTIAL_MONTHS,
+    PARTIAL_HISTORY_TREATMENTS,
+    CsvSink,
+    FundDataset,
+    ResultTable,
+    UniverseIndex,
+    aggregate_windows,
+    analyze_windows_parallel,
+    key_values,
+    last_observed_dates,
+    partial_history_returns,
+    passive_benchmark,
+    peak_memory_mb,
+    report_memory,
+    rolling_annualized_returns,
+    load_rolling_state,
+    new_window_starts,
+    save_rolling_state,
+    segment_title,
+    state_path,
+    window_aum_weights,
+    window_risk_metrics,
+    window_significance,
+)
+
 
 class RobustnessAnalyzer:
     """ロバストネス分析クラス"""
     
-    def __init__(self, data_dir: str = "../data"):
-        """初期化"""
+    def __init__(self, data_dir: str = "../data", analysis_period_months: int = 36,
+                 float32_returns: bool = False, workers: int = 1,
+                 aum_weighting: str = DEFAULT_AUM_WEIGHTING, segment_keys=DEFAULT_SEGMENT_KEYS,
+                 passive_keys=None, partial_history: str = DEFAULT_PARTIAL_HISTORY,
+                 min_months: int = MIN_PARTIAL_MONTHS):
+        """
+        初期化
+        
+        Parameters:
+        -----------
+        data_dir : str
+            データディレクトリパス
+        analysis_period_months : int
+            ローリングウィンドウ長（月数）
+        float32_returns : bool
+            月次リターンを float32 で保持するか（精度への影響は funds_core.loader.load_monthly_returns を参照）
+        workers : int
+            ウィンドウ分析のワーカープロセス数。2以上の場合、リターンパネルの累積和を
+            共有メモリに置いてプロセスプールで並列に分析します（結果の順序は1の場合と同じ）
+        aum_weighting : str
+            AUM加重のウェイト（funds_core.weighting.AUM_WEIGHTINGS）。'latest' はファンド属性の aum_latest、
+            'start' / 'end' / 'average' は月次データの aum 列の各ウィンドウ初月・最終月・平均
+        segment_keys : sequence of str
+            セグメントのキー列（既定はヘッジ区分。investment_style, management_company,
+            expense_bucket（信託報酬の区分）などの組合せも可）
+        passive_keys : sequence of str, optional
+            パッシブファンドを対応付けるキー列（segment_keys の一部。省略時は segment_keys）
+        partial_history : str
+            ウィンドウ途中で設定・償還されたファンドの扱い（funds_core.universe.PARTIAL_HISTORY_TREATMENTS）。
+            'exclude' はウィンドウ全期間のデータがあるファンドのみ、'available' は存続しており
+            min_months か月以上のデータがあるファンドをデータのある月数で年率換算、'cash' は
+            データのない月をリターン0としてウィンドウ全体で年率換算（リスク指標は常に全期間のデータが必要）
+        min_months : int
+            'available' / 'cash' で含めるファンドのウィンドウ内の最低データ月数
+        """
+        if partial_history not in PARTIAL_HISTORY_TREATMENTS:
+            raise ValueError(f"途中設定・償還ファンドの扱いは {PARTIAL_HISTORY_TREATMENTS} のいずれかです: {partial_history}")
         self.data_dir = Path(data_dir)
-        self.analysis_period_months = 36
+        self.analysis_period_months = analysis_period_months
+        self.float32_returns = float32_returns
+        self.workers = workers
+        self.aum_weighting = aum_weighting
+        self.segment_keys = tuple(segment_keys)
+        self.passive_keys = tuple(passive_keys) if passive_keys is not None else None
+        self.partial_history = partial_history
+        self.min_months = min_months
         
         # データ格納用
+        self.dataset = None
+        self.universe = None
         self.fund_attributes = None
         self.monthly_returns = None
         self.rolling_results = []
+        self.rolling_results_df = None
+        self.multi_horizon_results = None
+        self.significance_results = None
+        self.risk_metrics_results = None
+        self.fund_excess_returns = None
         
-    def load_data(self):
-        """データファイルの読み込み"""
+    def load_data(self, dataset: FundDataset = None, daily_nav: bool = False):
+        """
+        データファイルの読み込み
+        
+        Parameters:
+        -----------
+        dataset : FundDataset, optional
+            読み込み済みのデータセット。指定した場合はファイルを読み込まず、
+            リターンパネルも含めて共有します
+        daily_nav : bool
+            monthly_returns.csv の代わりに daily_nav.csv（日次基準価額）から月次リターンを計算するか
+        """
         print("=" * 80)
         print("ロバストネス分析: データ読み込み")
         print("=" * 80)
         
-        # ファンド属性データ
-        attr_path = self.data_dir / "fund_attributes.csv"
-        self.fund_attributes = pd.read_csv(attr_path)
+        # 初回は列指向キャッシュを作成し、以降はキャッシュから読み込む
+        peak_before = peak_memory_mb()
+        if dataset is None and daily_nav:
+            dataset = FundDataset.load_daily_nav(self.data_dir)
+        elif dataset is None:
+            dataset = FundDataset.load(self.data_dir, float32_returns=self.float32_returns)
+        self.dataset = dataset
+        
+        self.fund_attributes = dataset.fund_attributes
         print(f"✓ ファンド属性データ読み込み完了: {len(self.fund_attributes)} ファンド")
         
-        # 月次リターンデータ
-        returns_path = self.data_dir / "monthly_returns.csv"
-        self.monthly_returns = pd.read_csv(returns_path)
-        self.monthly_returns['month_end_date'] = pd.to_datetime(self.monthly_returns['month_end_date'])
+        self.monthly_returns = dataset.monthly_returns
         print(f"✓ 月次リターンデータ読み込み完了: {len(self.monthly_returns)} レコード")
+        report_memory(self.monthly_returns, peak_before)
         
         return self
     
     def calculate_rolling_analysis(self, min_windows: int = 12):
         """
-        ローリング36か月分析
+        ローリング分析（ウィンドウ長: analysis_period_months）
         
         Parameters:
         -----------
@@ -56,160 +156,374 @@ class RobustnessAnalyzer:
             最低ウィンドウ数（デフォルト12）
         """
         print("\n" + "=" * 80)
-        print(f"ローリング36か月分析（最低{min_windows}起点）")
+        print(f"ローリング{self.analysis_period_months}か月分析（最低{min_windows}起点）")
         print("=" * 80)
         
+        panel = self.dataset.panel
+        
         # 利用可能な月末日付を取得
-        all_dates = sorted(self.monthly_returns['month_end_date'].unique())
+        all_dates = panel.months
         
-        # 36か月以上のデータがある期間を特定
+        # ウィンドウ長以上のデータがある期間を特定
         if len(all_dates) < self.analysis_period_months:
             raise ValueError(f"データ期間が不足しています（必要: {self.analysis_period_months}か月、実際: {len(all_dates)}か月）")
         
-        # ローリングウィンドウの起点を生成
-        max_start_idx = len(all_dates) - self.analysis_period_months
-        window_starts = list(range(0, max_start_idx + 1))
+        window_count = len(all_dates) - self.analysis_period_months + 1
+        if window_count < min_windows:
+            print(f"⚠ 警告: ウィンドウ数が最低要件を満たしません（実際: {window_count}、要件: {min_windows}）")
         
-        if len(window_starts) < min_windows:
-            print(f"⚠ 警告: ウィンドウ数が最低要件を満たしません（実際: {len(window_starts)}、要件: {min_windows}）")
-        
-        print(f"分析ウィンドウ数: {len(window_starts)}")
+        print(f"分析ウィンドウ数: {window_count}")
         print(f"データ期間: {all_dates[0].strftime('%Y-%m')} ～ {all_dates[-1].strftime('%Y-%m')}")
         
-        # 各ウィンドウで分析
-        for window_idx, start_idx in enumerate(window_starts, 1):
-            end_idx = start_idx + self.analysis_period_months - 1
-            window_start_date = all_dates[start_idx]
-            window_end_date = all_dates[end_idx]
-            
-            print(f"\nウィンドウ {window_idx}/{len(window_starts)}: "
-                  f"{window_start_date.strftime('%Y-%m')} ～ {window_end_date.strftime('%Y-%m')}")
-            
-            # 当該期間のリターンデータを抽出
-            window_returns = self.monthly_returns[
-                (self.monthly_returns['month_end_date'] >= window_start_date) &
-                (self.monthly_returns['month_end_date'] <= window_end_date)
-            ]
-            
-            # 36か月のデータがあるファンドのみ
-            month_counts = window_returns.groupby('fund_id').size()
-            valid_funds = month_counts[month_counts == self.analysis_period_months].index
-            window_returns = window_returns[window_returns['fund_id'].isin(valid_funds)]
-            
-            # 年率リターンを計算
-            annualized_returns = self._calculate_annualized_returns_for_window(window_returns)
-            
-            # ヘッジ区分ごとに集計
-            for hedge_status in ['なし', 'あり']:
-                result = self._analyze_window_by_hedge(
-                    annualized_returns, hedge_status, window_start_date, window_end_date
-                )
-                if result:
-                    self.rolling_results.append(result)
-        
+        self.rolling_results = self._analyze_rolling_windows(panel, self.analysis_period_months, verbose=True)
         self.rolling_results_df = pd.DataFrame(self.rolling_results)
         print(f"\n✓ ローリング分析完了: {len(self.rolling_results)} 結果")
         
         return self
     
-    def _calculate_annualized_returns_for_window(self, window_returns):
-        """ウィンドウ内の年率リターンを計算"""
-        results = []
+    def calculate_rolling_analysis_incremental(self, output_dir: str = "../output", min_windows: int = 12):
+        """
+        ローリング分析の差分更新
         
-        for fund_id in window_returns['fund_id'].unique():
-            fund_data = window_returns[window_returns['fund_id'] == fund_id].sort_values('month_end_date')
-            
-            if len(fund_data) != self.analysis_period_months:
-                continue
-            
-            # 幾何平均
-            monthly_rets = fund_data['monthly_return'].values
-            cumulative_return = np.prod(1 + monthly_rets)
-            annualized_return = cumulative_return ** (12 / self.analysis_period_months) - 1
-            
-            # ファンド属性
-            fund_attr = self.fund_attributes[self.fund_attributes['fund_id'] == fund_id]
-            if len(fund_attr) == 0:
+        前回保存した結果CSV（rolling_{N}month_analysis.csv）と状態ファイル
+        （rolling_{N}month_state.npz：ファンドごとの累積対数リターン・観測月数）を読み込み、
+        新しく追加された月を終点とするウィンドウだけを計算して追記します。
+        過去の月次リターンやファンド属性が変わっていた場合、前回の結果がない場合は
+        calculate_rolling_analysis による全期間の再計算に切り替えます。
+        
+        Parameters:
+        -----------
+        output_dir : str
+            前回の結果・状態ファイルのあるディレクトリ（save_results の出力先）
+        min_windows : int
+            最低ウィンドウ数（全期間を再計算する場合に使用）
+        """
+        window_months = self.analysis_period_months
+        print("\n" + "=" * 80)
+        print(f"ローリング{window_months}か月分析（差分更新）")
+        print("=" * 80)
+        
+        panel = self.dataset.panel
+        csv_path = Path(output_dir) / f"rolling_{window_months}month_analysis.csv"
+        previous = None
+        if csv_path.exists():
+            # 追記後の再保存で値が変わらないよう、浮動小数点は往復で一致する精度で読み込む
+            previous = pd.read_csv(csv_path, encoding='utf-8-sig', parse_dates=['window_start', 'window_end'],
+                                   float_precision='round_trip')
+        
+        window_starts, reason = new_window_starts(
+            load_rolling_state(state_path(output_dir, window_months)), panel, self.fund_attributes,
+            window_months, len(previous) if previous is not None else -1,
+            aum_weighting=self.aum_weighting, aum=self.dataset.aum if self.aum_weighting != 'latest' else None,
+            segment_keys=self.segment_keys, passive_keys=self.passive_keys,
+            partial_history=self.partial_history, min_months=self.min_months
+        )
+        if previous is None or window_starts is None:
+            print(f"⚠ 差分更新できないため全期間を再計算します（{reason if previous is not None else '前回の結果がありません'}）")
+            return self.calculate_rolling_analysis(min_windows=min_windows)
+        
+        print(f"新規ウィンドウ数: {len(window_starts)}（{reason}）")
+        new_results = self._analyze_rolling_windows(panel, window_months, verbose=True, window_starts=window_starts)
+        if new_results:
+            self.rolling_results_df = pd.concat([previous, pd.DataFrame(new_results)], ignore_index=True)
+        else:
+            self.rolling_results_df = previous
+        self.rolling_results = self.rolling_results_df.to_dict('records')
+        print(f"\n✓ ローリング分析完了: {len(self.rolling_results)} 結果（うち新規 {len(new_results)}）")
+        
+        return self
+    
+    def calculate_multi_horizon_analysis(self, horizons=(12, 36, 60, 120)):
+        """
+        複数ウィンドウ長の一括ローリング分析
+        
+        共通の累積対数リターンから、すべてのウィンドウ長・すべての起点を
+        まとめて計算し、(horizon_months, window_end, セグメントのキー列, segment) を
+        キーとする縦持ちの結果表を作成します。
+        
+        Parameters:
+        -----------
+        horizons : iterable of int
+            ウィンドウ長（月数）のリスト
+        """
+        print("\n" + "=" * 80)
+        print(f"マルチホライズン分析（{', '.join(f'{h}か月' for h in horizons)}）")
+        print("=" * 80)
+        
+        panel = self.dataset.panel
+        
+        tidy_rows = []
+        for horizon in horizons:
+            if panel.n_months < horizon:
+                print(f"  ⚠ {horizon}か月: データ期間が不足しています（実際: {panel.n_months}か月）")
                 continue
             
-            fund_attr = fund_attr.iloc[0]
-            
-            results.append({
-                'fund_id': fund_id,
-                'fund_type': fund_attr['fund_type'],
-                'currency_hedge': fund_attr['currency_hedge'],
-                'aum_latest': fund_attr['aum_latest'],
-                'annualized_return_3y': annualized_return
-            })
-        
-        return pd.DataFrame(results)
+            window_results = self._analyze_rolling_windows(panel, horizon, verbose=False)
+            for result in window_results:
+                tidy_rows.extend(self._to_tidy_rows(result, horizon, self.segment_keys))
+            print(f"  ✓ {horizon}か月: {panel.n_months - horizon + 1} ウィンドウ")
+        
+        self.multi_horizon_results = pd.DataFrame(tidy_rows)
+        print(f"\n✓ マルチホライズン分析完了: {len(self.multi_horizon_results)} 行")
+        
+        return self
     
-    def _analyze_window_by_hedge(self, annualized_returns, hedge_status, start_date, end_date):
-        """ヘッジ区分ごとのウィンドウ分析"""
+    def calculate_rolling_significance(self):
+        """
+        ローリング有意性の計算
         
-        # アクティブファンド
-        active_funds = annualized_returns[
-            (annualized_returns['fund_type'] == 'アクティブ') &
-            (annualized_returns['currency_hedge'] == hedge_status)
-        ]
+        各ウィンドウ・セグメントで「アクティブ全体 / 上位50% vs パッシブ」の
+        t検定（Student / Welch）、Cohen's d、Mann-Whitney U検定を全ウィンドウ一括で行います。
+        """
+        print("\n" + "=" * 80)
+        print(f"ローリング有意性（{self.analysis_period_months}か月）")
+        print("=" * 80)
         
-        # パッシブファンド
-        passive_funds = annualized_returns[
-            (annualized_returns['fund_type'] == 'パッシブ') &
-            (annualized_returns['currency_hedge'] == hedge_status)
-        ]
+        panel = self.dataset.panel
+        window_months = self.analysis_period_months
+        if panel.n_months < window_months:
+            raise ValueError(f"データ期間が不足しています（必要: {window_months}か月、実際: {panel.n_months}か月）")
+        
+        window_starts = np.arange(panel.n_months - window_months + 1)
+        attributes, panel_rows = panel.align_attributes(self.fund_attributes, self.segment_keys)
+        rolling_returns = self._rolling_returns(panel, attributes, panel_rows, window_starts, window_months)
+        
+        self.significance_results = pd.DataFrame(window_significance(
+            rolling_returns, attributes,
+            panel.months[window_starts], panel.months[window_starts + window_months - 1],
+            segment_keys=self.segment_keys, passive_keys=self.passive_keys
+        ))
+        
+        if len(self.significance_results) > 0:
+            keys = list(self.segment_keys)
+            significant = self.significance_results.groupby(
+                keys + ['comparison'], sort=False
+            )['significant_5pct'].agg(['sum', 'size'])
+            for group, row in significant.iterrows():
+                segment = dict(zip(keys, group[:-1]))
+                print(f"  {segment_title(segment)} / {group[-1]}: "
+                      f"5%有意 {row['sum']}/{row['size']} ウィンドウ")
+        
+        print(f"\n✓ ローリング有意性完了: {len(self.significance_results)} 結果")
+        
+        return self
+    
+    def calculate_rolling_risk_metrics(self, risk_free_rate: float = 0.0):
+        """
+        ローリングのリスク調整後指標の計算
         
-        if len(active_funds) == 0 or len(passive_funds) == 0:
-            return None
+        全ファンド・全ウィンドウのボラティリティ・シャープレシオ・ソルティノレシオ・最大ドローダウン、
+        同じセグメントのパッシブ平均に対するトラッキングエラー・インフォメーションレシオ・ベータ・アルファを
+        funds_core.metrics で一括計算します（ウィンドウ内のモーメントは累積和の差分）。
         
-        # 上位50％
-        active_sorted = active_funds.sort_values('annualized_return_3y', ascending=False)
-        top_50_count = int(np.ceil(0.5 * len(active_sorted)))
-        top_50_funds = active_sorted.iloc[:top_50_count]
+        Parameters:
+        -----------
+        risk_free_rate : float
+            無リスク金利（年率）
+        """
+        print("\n" + "=" * 80)
+        print(f"ローリングリスク指標（{self.analysis_period_months}か月）")
+        print("=" * 80)
         
-        # 等金額平均
-        active_all_mean = active_funds['annualized_return_3y'].mean()
-        active_top50_mean = top_50_funds['annualized_return_3y'].mean()
-        passive_mean = passive_funds['annualized_return_3y'].mean()
+        panel = self.dataset.panel
+        window_months = self.analysis_period_months
+        if panel.n_months < window_months:
+            raise ValueError(f"データ期間が不足しています（必要: {window_months}か月、実際: {panel.n_months}か月）")
+        
+        window_starts = np.arange(panel.n_months - window_months + 1)
+        attributes, panel_rows = panel.align_attributes(self.fund_attributes, self.segment_keys)
+        values = panel.values[panel_rows]
+        benchmark = passive_benchmark(values, attributes, self.segment_keys, self.passive_keys)
+        metrics = window_risk_metrics(values, benchmark, window_starts, window_months, risk_free_rate)
+        
+        # ウィンドウ全期間のデータがあるファンド・ウィンドウのみ（ウィンドウ順）
+        window_idx, fund_idx = np.nonzero(~np.isnan(metrics['volatility'].T))
+        keys = ['fund_id', 'fund_type', *self.segment_keys]
+        self.risk_metrics_results = pd.DataFrame({
+            'window_start': panel.months[window_starts][window_idx],
+            'window_end': panel.months[window_starts + window_months - 1][window_idx],
+            **{column: key_values(attributes, column).to_numpy()[fund_idx] for column in keys},
+            **{name: metric[fund_idx, window_idx] for name, metric in metrics.items()}
+        })
+        
+        print(f"✓ ローリングリスク指標完了: {len(self.risk_metrics_results)} 結果"
+              f"（{len(window_starts)} ウィンドウ、無リスク金利 {risk_free_rate:.2%}）")
         
-        # AUM加重平均
-        active_all_aum = np.average(
-            active_funds['annualized_return_3y'],
-            weights=active_funds['aum_latest']
-        )
-        active_top50_aum = np.average(
-            top_50_funds['annualized_return_3y'],
-            weights=top_50_funds['aum_latest']
-        )
-        passive_aum = np.average(
-            passive_funds['annualized_return_3y'],
-            weights=passive_funds['aum_latest']
+        return self
+    
+    def calculate_fund_excess_returns(self):
+        """
+        ファンド × ウィンドウの超過リターンの計算
+        
+        各ファンドのウィンドウ年率リターンから、同じセグメントのパッシブファンドの年率リターンの
+        等金額平均（ローリング分析結果の passive_mean_equal と同じ）を引きます。
+        途中設定・償還ファンドの扱いはローリング分析と同じです。HTMLレポートの個別ファンド表示に使います。
+        """
+        print("\n" + "=" * 80)
+        print(f"ファンド別超過リターン（{self.analysis_period_months}か月）")
+        print("=" * 80)
+        
+        panel = self.dataset.panel
+        window_months = self.analysis_period_months
+        if panel.n_months < window_months:
+            raise ValueError(f"データ期間が不足しています（必要: {window_months}か月、実際: {panel.n_months}か月）")
+        
+        window_starts = np.arange(panel.n_months - window_months + 1)
+        attributes, panel_rows = panel.align_attributes(self.fund_attributes, self.segment_keys)
+        rolling_returns = self._rolling_returns(panel, attributes, panel_rows, window_starts, window_months)
+        # パッシブ平均は欠損のないセルのみで計算されるため、月次リターンと同じ関数をウィンドウに適用できる
+        benchmark = passive_benchmark(rolling_returns, attributes, self.segment_keys, self.passive_keys)
+        self.fund_excess_returns = pd.DataFrame(
+            rolling_returns - benchmark,
+            index=pd.Index(attributes['fund_id'], name='fund_id'),
+            columns=pd.Index(panel.months[window_starts + window_months - 1], name='window_end')
         )
         
-        # 超過リターン
-        excess_all_equal = active_all_mean - passive_mean
-        excess_top50_equal = active_top50_mean - passive_mean
-        excess_all_aum = active_all_aum - passive_aum
-        excess_top50_aum = active_top50_aum - passive_aum
-        
-        return {
-            'window_start': start_date,
-            'window_end': end_date,
-            'currency_hedge': hedge_status,
-            'active_count': len(active_funds),
-            'passive_count': len(passive_funds),
-            'top_50_count': top_50_count,
-            'active_all_mean_equal': active_all_mean,
-            'active_top50_mean_equal': active_top50_mean,
-            'passive_mean_equal': passive_mean,
-            'excess_all_equal': excess_all_equal,
-            'excess_top50_equal': excess_top50_equal,
-            'active_all_mean_aum': active_all_aum,
-            'active_top50_mean_aum': active_top50_aum,
-            'passive_mean_aum': passive_aum,
-            'excess_all_aum': excess_all_aum,
-            'excess_top50_aum': excess_top50_aum
+        print(f"✓ ファンド別超過リターン完了: {len(attributes)} 本 × {len(window_starts)} ウィンドウ")
+        
+        return self
+    
+    def _analyze_rolling_windows(self, panel, window_months, verbose=False, window_starts=None):
+        """
+        指定ウィンドウ長の全起点（window_starts 指定時はその起点のみ）を分析
+        
+        Returns:
+        --------
+        list
+            ウィンドウ × セグメントごとの集計結果
+        """
+        all_dates = panel.months
+        if window_starts is None:
+            window_starts = np.arange(panel.n_months - window_months + 1)
+        
+        # 全ウィンドウ・全ファンドの年率リターンを累積対数リターンの差分で一括計算
+        # （行は属性データの並び順に揃える）
+        attributes, panel_rows = panel.align_attributes(self.fund_attributes, self.segment_keys)
+        
+        window_start_dates = all_dates[window_starts]
+        window_end_dates = all_dates[window_starts + window_months - 1]
+        
+        if verbose:
+            # 各ウィンドウの期間中に存続していたファンド数（途中で設定・償還されたファンドを含む）
+            alive_counts = self._universe().window_alive_counts(all_dates, window_starts, window_months)
+            for window_idx, (start_date, end_date) in enumerate(zip(window_start_dates, window_end_dates)):
+                print(f"\nウィンドウ {window_idx + 1}/{len(window_starts)}: "
+                      f"{start_date.strftime('%Y-%m')} ～ {end_date.strftime('%Y-%m')}"
+                      f"（存続ファンド {alive_counts[window_idx]} 本）")
+        
+        # ウィンドウ時点のAUMで加重する場合は ファンド × ウィンドウ のウェイトを一括計算
+        window_weights = None
+        if self.aum_weighting != 'latest':
+            window_weights = window_aum_weights(
+                self.dataset.aum[panel_rows], attributes['aum_latest'].to_numpy(dtype=np.float64),
+                window_starts, window_months, self.aum_weighting
+            )
+        
+        if self.workers > 1:
+            log_prefix, count_prefix = panel.prefix_sums()
+            return analyze_windows_parallel(
+                log_prefix[panel_rows], count_prefix[panel_rows], attributes,
+                all_dates, window_starts, window_months, self.workers, window_weights=window_weights,
+                segment_keys=self.segment_keys, passive_keys=self.passive_keys,
+                universe=self._universe().take(attributes['fund_id']),
+                partial_history=self.partial_history, min_months=self.min_months
+            )
+        
+        # ウィンドウ全期間のデータがない（partial_history で含めない）ファンドはNaNとなり、集計対象から外れる
+        rolling_returns = self._rolling_returns(panel, attributes, panel_rows, window_starts, window_months)
+        return aggregate_windows(rolling_returns, attributes, window_start_dates, window_end_dates,
+                                 window_weights=window_weights, segment_keys=self.segment_keys,
+                                 passive_keys=self.passive_keys)
+    
+    def _universe(self) -> UniverseIndex:
+        """ファンドの存続区間（設定日・償還日、償還日のない償還済みファンドはデータの最終月）"""
+        if self.universe is None:
+            self.universe = UniverseIndex.from_attributes(self.fund_attributes,
+                                                          last_observed_dates(self.dataset.panel))
+        return self.universe
+    
+    def _rolling_returns(self, panel, attributes, panel_rows, window_starts, window_months) -> np.ndarray:
+        """全ウィンドウの年率リターン（行は attributes の並び順、途中設定・償還ファンドの扱いを反映）"""
+        if self.partial_history == 'exclude':
+            return rolling_annualized_returns(panel, window_starts, window_months)[panel_rows]
+        log_prefix, count_prefix = panel.prefix_sums()
+        alive = self._universe().take(attributes['fund_id']).window_alive(panel.months, window_starts, window_months)
+        return partial_history_returns(log_prefix[panel_rows], count_prefix[panel_rows], window_starts,
+                                       window_months, alive, self.partial_history, self.min_months)
+    
+    @staticmethod
+    def _to_tidy_rows(result, horizon, segment_keys):
+        """ウィンドウ集計結果をセグメント単位の縦持ち行に変換"""
+        key = {
+            'horizon_months': horizon,
+            'window_start': result['window_start'],
+            'window_end': result['window_end'],
+            **{column: result[column] for column in segment_keys},
         }
+        return [
+            {**key, 'segment': 'アクティブ全体', 'fund_count': result['active_count'],
+             'mean_equal': result['active_all_mean_equal'], 'mean_aum': result['active_all_mean_aum'],
+             'excess_equal': result['excess_all_equal'], 'excess_aum': result['excess_all_aum']},
+            {**key, 'segment': 'アクティブ上位50%', 'fund_count': result['top_50_count'],
+             'mean_equal': result['active_top50_mean_equal'], 'mean_aum': result['active_top50_mean_aum'],
+             'excess_equal': result['excess_top50_equal'], 'excess_aum': result['excess_top50_aum']},
+            {**key, 'segment': 'パッシブ', 'fund_count': result['passive_count'],
+             'mean_equal': result['passive_mean_equal'], 'mean_aum': result['passive_mean_aum'],
+             'excess_equal': np.nan, 'excess_aum': np.nan},
+        ]
+    
+    def result_tables(self):
+        """
+        保存対象の結果表
+        
+        Returns:
+        --------
+        list of ResultTable
+            出力ファイル名・DataFrame・表示名
+        """
+        tables = []
+        
+        if self.rolling_results_df is not None:
+            # ローリング分析結果
+            tables.append(ResultTable(
+                f"rolling_{self.analysis_period_months}month_analysis.csv",
+                self.rolling_results_df,
+                f"ローリング{self.analysis_period_months}か月分析結果"
+            ))
+        
+        if self.rolling_results_df is not None and len(self.rolling_results_df) > 0:
+            # サマリー統計（アクティブ・パッシブの両方を含むセグメントがない場合は出力しない）
+            summary = self.rolling_results_df.groupby(list(self.segment_keys)).agg({
+                'excess_all_equal': ['mean', 'std', 'min', 'max'],
+                'excess_top50_equal': ['mean', 'std', 'min', 'max'],
+                'excess_all_aum': ['mean', 'std', 'min', 'max'],
+                'excess_top50_aum': ['mean', 'std', 'min', 'max']
+            }).round(4)
+            tables.append(ResultTable("rolling_analysis_summary.csv", summary, "ローリング分析サマリー", index=True))
+        
+        # ローリング有意性
+        if self.significance_results is not None:
+            tables.append(ResultTable(
+                f"rolling_{self.analysis_period_months}month_significance.csv",
+                self.significance_results,
+                f"ローリング{self.analysis_period_months}か月有意性"
+            ))
+        
+        # ローリングリスク指標
+        if self.risk_metrics_results is not None:
+            tables.append(ResultTable(
+                f"rolling_{self.analysis_period_months}month_risk_metrics.csv",
+                self.risk_metrics_results,
+                f"ローリング{self.analysis_period_months}か月リスク指標"
+            ))
+        
+        # マルチホライズン分析結果
+        if self.multi_horizon_results is not None:
+            tables.append(ResultTable(
+                "rolling_multi_horizon_analysis.csv", self.multi_horizon_results, "マルチホライズン分析結果"
+            ))
+        
+        return tables
     
     def save_results(self, output_dir: str = "../output"):
         """結果の保存"""
@@ -217,49 +531,102 @@ class RobustnessAnalyzer:
         print("ロバストネス分析結果保存")
         print("=" * 80)
         
-        output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True)
+        CsvSink(output_dir).submit(self.result_tables())
+        self.save_state(output_dir)
         
-        # ローリング分析結果
-        self.rolling_results_df.to_csv(
-            output_path / "rolling_36month_analysis.csv",
-            index=False, encoding='utf-8-sig'
-        )
-        print(f"✓ ローリング36か月分析結果保存: rolling_36month_analysis.csv")
-        
-        # サマリー統計
-        summary = self.rolling_results_df.groupby('currency_hedge').agg({
-            'excess_all_equal': ['mean', 'std', 'min', 'max'],
-            'excess_top50_equal': ['mean', 'std', 'min', 'max'],
-            'excess_all_aum': ['mean', 'std', 'min', 'max'],
-            'excess_top50_aum': ['mean', 'std', 'min', 'max']
-        }).round(4)
-        
-        summary.to_csv(
-            output_path / "rolling_analysis_summary.csv",
-            encoding='utf-8-sig'
-        )
-        print(f"✓ ローリング分析サマリー保存: rolling_analysis_summary.csv")
+        print(f"\n✓ すべての結果を {Path(output_dir)} に保存しました")
         
-        print(f"\n✓ すべての結果を {output_path} に保存しました")
+        return self
+    
+    def save_state(self, output_dir: str = "../output"):
+        """差分更新用の状態ファイルを保存（ローリング分析結果がある場合）"""
+        if self.rolling_results_df is None:
+            return self
+        
+        path = state_path(output_dir, self.analysis_period_months)
+        aum = self.dataset.aum if self.aum_weighting != 'latest' else None
+        save_rolling_state(path, self.dataset.panel, self.fund_attributes,
+                           self.analysis_period_months, len(self.rolling_results_df),
+                           aum_weighting=self.aum_weighting, aum=aum,
+                           segment_keys=self.segment_keys, passive_keys=self.passive_keys,
+                           partial_history=self.partial_history, min_months=self.min_months)
+        print(f"✓ 差分更新用の状態保存: {path.name}")
         
         return self
 
 
-def main():
+def parse_args(argv=None):
+    """コマンドライン引数の解析"""
+    parser = argparse.ArgumentParser(description="ロバストネス分析（ローリング分析）")
+    parser.add_argument('--window-months', type=int, default=36,
+                        help="ローリングウィンドウ長（月数、デフォルト36）")
+    parser.add_argument('--horizons', type=int, nargs='+', default=None,
+                        help="マルチホライズン分析のウィンドウ長（例: 12 36 60 120）")
+    parser.add_argument('--min-windows', type=int, default=12,
+                        help="最低ウィンドウ数（デフォルト12）")
+    parser.add_argument('--incremental', action='store_true',
+                        help="前回の結果に新しい月のウィンドウだけを追記する（過去データが変わった場合は全期間を再計算）")
+    parser.add_argument('--significance', action='store_true',
+                        help="ウィンドウごとのアクティブ vs パッシブの検定結果も出力する")
+    parser.add_argument('--risk-metrics', action='store_true',
+                        help="ファンド × ウィンドウのリスク調整後指標（シャープ・ソルティノ・最大DD・TE・IR・ベータ等）も出力する")
+    parser.add_argument('--risk-free-rate', type=float, default=0.0,
+                        help="シャープレシオ等の無リスク金利（年率、デフォルト0）")
+    parser.add_argument('--aum-weighting', choices=AUM_WEIGHTINGS, default=DEFAULT_AUM_WEIGHTING,
+                        help="AUM加重のウェイト（latest: 属性の最新AUM、start / end / average: 各ウィンドウ初月・最終月・平均の月末AUM）")
+    parser.add_argument('--segment-keys', nargs='+', default=list(DEFAULT_SEGMENT_KEYS),
+                        help="セグメントのキー列（例: currency_hedge investment_style、信託報酬の区分は expense_bucket）")
+    parser.add_argument('--passive-keys', nargs='*', default=None,
+                        help="パッシブファンドを対応付けるキー列（--segment-keys の一部。省略時は同じキー）")
+    parser.add_argument('--partial-history', choices=PARTIAL_HISTORY_TREATMENTS, default=DEFAULT_PARTIAL_HISTORY,
+                        help="ウィンドウ途中で設定・償還されたファンドの扱い（exclude: 除外、available: データのある月数で"
+                             "年率換算、cash: データのない月をリターン0としてウィンドウ全体で年率換算）")
+    parser.add_argument('--min-months', type=int, default=MIN_PARTIAL_MONTHS,
+                        help=f"available / cash で含めるファンドのウィンドウ内の最低データ月数（デフォルト{MIN_PARTIAL_MONTHS}）")
+    parser.add_argument('--daily-nav', action='store_true',
+                        help="daily_nav.csv（日次基準価額）から月次リターンを計算して分析する")
+    parser.add_argument('--float32-returns', action='store_true',
+                        help="月次リターンを float32 で保持してメモリを削減する")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="ウィンドウ分析のワーカープロセス数（2以上で共有メモリ＋プロセスプールによる並列計算）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """メイン実行関数"""
+    args = parse_args(argv)
     
     print("\n")
     print("=" * 80)
-    print("ロバストネス分析（ローリング36か月）")
+    print(f"ロバストネス分析（ローリング{args.window_months}か月）")
     print("=" * 80)
     
     try:
-        analyzer = RobustnessAnalyzer()
-        
-        analyzer.load_data() \
-                .calculate_rolling_analysis(min_windows=12) \
-                .save_results()
+        analyzer = RobustnessAnalyzer(analysis_period_months=args.window_months,
+                                      float32_returns=args.float32_returns,
+                                      workers=args.workers,
+                                      aum_weighting=args.aum_weighting,
+                                      segment_keys=args.segment_keys,
+                                      passive_keys=args.passive_keys,
+                                      partial_history=args.partial_history,
+                                      min_months=args.min_months)
+        
+        analyzer.load_data(daily_nav=args.daily_nav)
+        if args.incremental:
+            analyzer.calculate_rolling_analysis_incremental(min_windows=args.min_windows)
+        else:
+            analyzer.calculate_rolling_analysis(min_windows=args.min_windows)
+        
+        if args.significance:
+            analyzer.calculate_rolling_significance()
+        
+        if args.risk_metrics:
+            analyzer.calculate_rolling_risk_metrics(risk_free_rate=args.risk_free_rate)
+        
+        if args.horizons:
+            analyzer.calculate_multi_horizon_analysis(horizons=args.horizons)
+        
+        analyzer.save_results()
         
         print("\n" + "=" * 80)
         print("ロバストネス分析完了")
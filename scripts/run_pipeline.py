@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+パイプライン一括実行スクリプト
+- メイン分析 → ロバストネス分析 → 可視化（→ HTMLレポート）を1プロセスで実行
+- データは一度だけ読み込み、各ステージ間はDataFrameをメモリ上で受け渡す
+- CSVの保存は最後にまとめて行う（--async-write で可視化と並行して書き出し）
+"""
+
+import argparse
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from funds_core import (
+    AUM_WEIGHTINGS,
+    DEFAULT_AUM_WEIGHTING,
+    DEFAULT_PARTIAL_HISTORY,
+    DEFAULT_RENDER_PROFILE,
+    DEFAULT_SEGMENT_KEYS,
+    FIGURE_FORMATS,
+    MIN_PARTIAL_MONTHS,
+    PARTIAL_HISTORY_TREATMENTS,
+    RENDER_PROFILES,
+    CsvSink,
+    FundDataset,
+)
+from fund_performance_analysis import FundPerformanceAnalyzer
+from robustness_analysis import RobustnessAnalyzer
+
+
+@contextmanager
+def stage_timer(name: str, timings: dict):
+    """ステージの経過時間を記録する"""
+    start = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    """コマンドライン引数の解析"""
+    parser = argparse.ArgumentParser(description="分析パイプライン一括実行")
+    parser.add_argument('--base-date', default="2024-09-30",
+                        help="基準日（YYYY-MM-DD形式、デフォルト2024-09-30）")
+    parser.add_argument('--data-dir', default="../data", help="データディレクトリ")
+    parser.add_argument('--output-dir', default="../output", help="出力ディレクトリ")
+    parser.add_argument('--window-months', type=int, default=36,
+                        help="分析期間・ローリングウィンドウ長（月数、デフォルト36）")
+    parser.add_argument('--min-windows', type=int, default=12,
+                        help="最低ウィンドウ数（デフォルト12）")
+    parser.add_argument('--bootstrap-resamples', type=int, default=10000,
+                        help="超過リターンのブートストラップのリサンプル数（0で信頼区間を計算しない）")
+    parser.add_argument('--block-length', type=int, default=None,
+                        help="月のブロックブートストラップのブロック長（省略時はファンドのみ抽出）")
+    parser.add_argument('--top-fractions', type=float, nargs='+', default=[0.5],
+                        help="集計する上位の割合（例: 0.1 0.25 0.5。上位50%%以外は summary_statistics.csv の追加行）")
+    parser.add_argument('--risk-free-rate', type=float, default=0.0,
+                        help="シャープレシオ等の無リスク金利（年率、デフォルト0）")
+    parser.add_argument('--aum-weighting', choices=AUM_WEIGHTINGS, default=DEFAULT_AUM_WEIGHTING,
+                        help="AUM加重のウェイト（latest: 属性の最新AUM、start / end / average: 各ウィンドウ初月・最終月・平均の月末AUM）")
+    parser.add_argument('--segment-keys', nargs='+', default=list(DEFAULT_SEGMENT_KEYS),
+                        help="セグメントのキー列（例: currency_hedge investment_style、信託報酬の区分は expense_bucket）")
+    parser.add_argument('--passive-keys', nargs='*', default=None,
+                        help="パッシブファンドを対応付けるキー列（--segment-keys の一部。省略時は同じキー）")
+    parser.add_argument('--partial-history', choices=PARTIAL_HISTORY_TREATMENTS, default=DEFAULT_PARTIAL_HISTORY,
+                        help="期間途中で設定・償還されたファンドの扱い（exclude: 除外、available: データのある月数で"
+                             "年率換算、cash: データのない月をリターン0として期間全体で年率換算）")
+    parser.add_argument('--min-months', type=int, default=MIN_PARTIAL_MONTHS,
+                        help=f"available / cash で含めるファンドの最低データ月数（デフォルト{MIN_PARTIAL_MONTHS}）")
+    parser.add_argument('--daily-nav', action='store_true',
+                        help="daily_nav.csv（日次基準価額）から月次リターンを計算して分析する")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="ローリング分析のワーカープロセス数")
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help="図の描画のワーカープロセス数（2以上でプロセスプールによる並列描画）")
+    parser.add_argument('--no-render-cache', action='store_true',
+                        help="前回から変更のない図も含めてすべて描画し直す")
+    parser.add_argument('--render-profile', choices=list(RENDER_PROFILES), default=DEFAULT_RENDER_PROFILE,
+                        help="描画プロファイル（preview: 低解像度・余白を詰めずに preview/ へ、final: 300dpi）")
+    parser.add_argument('--render-format', choices=FIGURE_FORMATS, default=None,
+                        help="図の出力形式（省略時は PNG）")
+    parser.add_argument('--async-write', action='store_true',
+                        help="結果CSVをバックグラウンドで書き出し、可視化と並行させる")
+    parser.add_argument('--html-report', action='store_true',
+                        help="ファンド別超過リターンを含むHTMLレポート（rolling_report.html）も作成する")
+    parser.add_argument('--skip-visualization', action='store_true',
+                        help="可視化を実行しない")
+    return parser.parse_args(argv)
+
+
+def run_pipeline(args) -> dict:
+    """
+    パイプラインの実行
+
+    Returns:
+    --------
+    dict
+        ステージ名ごとの経過時間（秒）
+    """
+    timings = {}
+
+    with stage_timer('データ読み込み', timings):
+        if args.daily_nav:
+            dataset = FundDataset.load_daily_nav(args.data_dir)
+        else:
+            dataset = FundDataset.load(args.data_dir)
+
+    with stage_timer('メイン分析', timings):
+        analyzer = FundPerformanceAnalyzer(base_date=args.base_date, data_dir=args.data_dir,
+                                           analysis_period_months=args.window_months,
+                                           aum_weighting=args.aum_weighting, segment_keys=args.segment_keys,
+                                           passive_keys=args.passive_keys, top_fractions=args.top_fractions,
+                                           partial_history=args.partial_history, min_months=args.min_months)
+        analyzer.load_data(dataset) \
+                .validate_and_clean_data() \
+                .calculate_annualized_returns() \
+                .calculate_risk_metrics(risk_free_rate=args.risk_free_rate) \
+                .rank_and_segment_funds() \
+                .calculate_aggregate_statistics()
+        if args.bootstrap_resamples > 0:
+            analyzer.calculate_bootstrap_intervals(n_resamples=args.bootstrap_resamples,
+                                                   block_length=args.block_length)
+        analyzer.perform_statistical_tests()
+
+    with stage_timer('ロバストネス分析', timings):
+        robustness = RobustnessAnalyzer(data_dir=args.data_dir, analysis_period_months=args.window_months,
+                                        workers=args.workers, aum_weighting=args.aum_weighting,
+                                        segment_keys=args.segment_keys, passive_keys=args.passive_keys,
+                                        partial_history=args.partial_history, min_months=args.min_months)
+        robustness.load_data(dataset) \
+                  .calculate_rolling_analysis(min_windows=args.min_windows)
+        if args.html_report:
+            robustness.calculate_fund_excess_returns()
+
+    # 非同期の場合は書き出しを予約し、可視化と並行して進める
+    sink = CsvSink(args.output_dir, async_write=args.async_write)
+    print("\n" + "=" * 80)
+    print("結果保存")
+    print("=" * 80)
+    with stage_timer('結果保存（予約）' if args.async_write else '結果保存', timings):
+        sink.submit(analyzer.result_tables() + robustness.result_tables())
+        robustness.save_state(args.output_dir)
+
+    viz = None
+    if not args.skip_visualization:
+        # matplotlib の読み込みは可視化を行う場合のみ
+        from visualization import FundVisualization
+
+        with stage_timer('可視化', timings):
+            viz = FundVisualization(output_dir=args.output_dir, workers=args.render_workers,
+                                    use_cache=not args.no_render_cache, profile=args.render_profile,
+                                    figure_format=args.render_format, window_months=args.window_months,
+                                    segment_keys=args.segment_keys, passive_keys=args.passive_keys)
+            viz.set_results(annualized_returns=analyzer.annualized_returns,
+                            rolling_results=robustness.rolling_results_df) \
+               .plot_return_distribution_histogram() \
+               .plot_boxplot() \
+               .plot_rolling_excess_returns() \
+               .plot_top50_comparison() \
+               .render_figures()
+
+    if args.html_report:
+        from html_report import HtmlReport
+
+        with stage_timer('HTMLレポート', timings):
+            HtmlReport(output_dir=args.output_dir) \
+                .set_results(robustness, visualization=viz) \
+                .write_report()
+
+    if args.async_write:
+        with stage_timer('結果保存（完了待ち）', timings):
+            sink.close()
+
+    return timings
+
+
+def main(argv=None):
+    """メイン実行関数"""
+    args = parse_args(argv)
+
+    print("\n")
+    print("=" * 80)
+    print("分析パイプライン一括実行")
+    print("=" * 80)
+    print(f"基準日: {args.base_date}")
+    print(f"分析期間: 過去{args.window_months}か月")
+    print("=" * 80)
+
+    try:
+        timings = run_pipeline(args)
+
+        print("\n" + "=" * 80)
+        print("パイプライン完了")
+        print("=" * 80)
+        for name, seconds in timings.items():
+            print(f"  - {name}: {seconds:.2f} 秒")
+        print(f"  - 合計: {sum(timings.values()):.2f} 秒")
+        print(f"\n✓ すべての結果を {Path(args.output_dir)} に保存しました")
+
+    except Exception as e:
+        print(f"\n❌ エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,33 +4,97 @@
 - ヒストグラム
 - 箱ひげ図
 - ローリング超過リターン推移
+- 各図はデータ＋仕様の描画ジョブとして作成し、まとめて（プロセスプールで並列に）描画
+- データ・仕様が前回と同じ図は描画を省略（figure_manifest.json のフィンガープリントで判定）
+- 描画プロファイル: preview（低解像度・余白を詰めない・SVG も可、preview/ に出力）と final（300dpi）
 """
 
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
-# 日本語フォント設定
-plt.rcParams['font.family'] = 'Noto Sans CJK JP'
-plt.rcParams['axes.unicode_minus'] = False
+from funds_core import (
+    DEFAULT_RENDER_PROFILE,
+    DEFAULT_SEGMENT_KEYS,
+    FIGURE_FORMATS,
+    RENDER_PROFILES,
+    FigureJob,
+    aggregate_segment,
+    apply_profile,
+    cache_stats,
+    load_manifest,
+    profile_directory,
+    rank_active_funds,
+    render_figures,
+    segment_groups,
+    segment_name,
+    segment_title,
+    write_manifest,
+)
+
+
+def period_label(months: int) -> str:
+    """分析期間の表示名（12の倍数は「3年」、それ以外は「18か月」）"""
+    return f"{months // 12}年" if months % 12 == 0 else f"{months}か月"
 
 
 class FundVisualization:
     """ファンドパフォーマンス可視化クラス"""
     
-    def __init__(self, output_dir: str = "../output"):
-        """初期化"""
+    def __init__(self, output_dir: str = "../output", workers: int = 1, use_cache: bool = True,
+                 profile: str = DEFAULT_RENDER_PROFILE, figure_format: str = None, window_months: int = 36,
+                 segment_keys=DEFAULT_SEGMENT_KEYS, passive_keys=None):
+        """
+        初期化
+        
+        Parameters:
+        -----------
+        output_dir : str
+            出力ディレクトリ
+        workers : int
+            図の描画のワーカープロセス数。2以上の場合、plot_* で作成した描画ジョブを
+            render_figures でプロセスプール（Agg バックエンド）に分配します（出力は1の場合と同じ）
+        use_cache : bool
+            True の場合、前回のマニフェストとフィンガープリント（データ・仕様のハッシュ）が一致し、
+            ファイルが残っている図は描画を省略します
+        profile : str
+            描画プロファイル（'final': 300dpi・余白を詰める、'preview': 低解像度・余白を詰めない）。
+            preview の図とマニフェストは output_dir/preview に保存し、final のキャッシュとは独立です
+        figure_format : str, optional
+            出力形式（'png' / 'svg'、省略時は PNG）
+        window_months : int
+            分析期間・ローリングウィンドウ長（月数）。ローリング分析結果のファイル名と
+            図のタイトル・軸ラベル（36か月は「3年年率リターン」）に使用
+        segment_keys : sequence of str
+            セグメントのキー列（分析と同じキー）。図はセグメントごとに作成し、ファイル名・タイトルは
+            segment_name / segment_title から作ります（既定のヘッジ区分では hedge_なし 等）
+        passive_keys : sequence of str, optional
+            パッシブファンドを対応付けるキー列（segment_keys の一部。省略時は segment_keys）
+        """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.workers = workers
+        self.use_cache = use_cache
+        self.profile = profile
+        self.figure_format = figure_format
+        self.window_months = window_months
+        self.period = period_label(window_months)
+        self.segment_keys = tuple(segment_keys)
+        self.passive_keys = tuple(passive_keys) if passive_keys is not None else None
+        # 図・マニフェストの出力先（プロファイルごと）
+        self.figure_dir = profile_directory(self.output_dir, profile)
         
         # データ読み込み
         self.annualized_returns = None
         self.rolling_results = None
         
+        # 描画待ちのジョブと描画済みの図のマニフェスト
+        self.figure_jobs = []
+        self.manifest = []
+        
     def load_results(self):
         """分析結果の読み込み"""
         print("=" * 80)
@@ -40,22 +104,68 @@ class FundVisualization:
         # 年率リターン
         returns_path = self.output_dir / "annualized_returns_3y.csv"
         if returns_path.exists():
-            self.annualized_returns = pd.read_csv(returns_path)
+            self.annualized_returns = pd.read_csv(returns_path, encoding='utf-8-sig')
             print(f"✓ 年率リターンデータ読み込み完了")
         else:
             print(f"⚠ 年率リターンデータが見つかりません: {returns_path}")
         
         # ローリング分析結果
-        rolling_path = self.output_dir / "rolling_36month_analysis.csv"
+        rolling_path = self.output_dir / f"rolling_{self.window_months}month_analysis.csv"
         if rolling_path.exists():
-            self.rolling_results = pd.read_csv(rolling_path)
-            self.rolling_results['window_end'] = pd.to_datetime(self.rolling_results['window_end'])
+            self.rolling_results = pd.read_csv(rolling_path, encoding='utf-8-sig', parse_dates=['window_end'])
             print(f"✓ ローリング分析結果読み込み完了")
         else:
             print(f"⚠ ローリング分析結果が見つかりません: {rolling_path}")
         
         return self
     
+    def set_results(self, annualized_returns=None, rolling_results=None):
+        """
+        メモリ上の分析結果を設定（CSVを経由せずに可視化する場合）
+        
+        Parameters:
+        -----------
+        annualized_returns : pd.DataFrame, optional
+            FundPerformanceAnalyzer.annualized_returns
+        rolling_results : pd.DataFrame, optional
+            RobustnessAnalyzer.rolling_results_df
+        """
+        print("=" * 80)
+        print("可視化: 分析結果受け取り（メモリ上）")
+        print("=" * 80)
+        
+        if annualized_returns is not None:
+            self.annualized_returns = annualized_returns
+            print(f"✓ 年率リターンデータ受け取り完了")
+        
+        if rolling_results is not None:
+            self.rolling_results = rolling_results
+            print(f"✓ ローリング分析結果受け取り完了")
+        
+        return self
+    
+    def _segments(self) -> list:
+        """
+        年率リターンのセグメント（segment_keys の値の組合せ）ごとのアクティブ・パッシブファンド
+
+        Returns:
+        --------
+        list of tuple
+            (キーの値の dict, アクティブファンド, 対応するパッシブファンド)。
+            年率リターンにキー列がない場合は空
+        """
+        fund_returns = self.annualized_returns
+        try:
+            active, passive, passive_of = segment_groups(fund_returns, self.segment_keys, self.passive_keys)
+        except KeyError as e:
+            print(f"  ⚠ 年率リターンにセグメントのキー列 {e} がありません")
+            return []
+        segments = []
+        for code, segment in enumerate(active.labels.to_dict('records')):
+            passive_funds = fund_returns[(passive.codes == passive_of[code]) & (passive_of[code] >= 0)]
+            segments.append((segment, fund_returns[active.codes == code], passive_funds))
+        return segments
+    
     def plot_return_distribution_histogram(self):
         """年率リターン分布のヒストグラム"""
         if self.annualized_returns is None:
@@ -66,64 +176,27 @@ class FundVisualization:
         print("ヒストグラム作成")
         print("=" * 80)
         
-        for hedge_status in ['なし', 'あり']:
-            fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-            fig.suptitle(f'3年年率リターン分布（為替ヘッジ: {hedge_status}）', 
-                        fontsize=16, fontweight='bold')
-            
-            # アクティブファンド
-            active_data = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'アクティブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]['annualized_return_3y'] * 100
-            
-            # パッシブファンド
-            passive_data = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'パッシブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]['annualized_return_3y'] * 100
-            
-            if len(active_data) == 0:
-                print(f"  ⚠ アクティブファンドデータなし（ヘッジ{hedge_status}）")
-                plt.close(fig)
-                continue
-            
-            # アクティブのヒストグラム
-            axes[0].hist(active_data, bins=20, alpha=0.7, color='steelblue', edgecolor='black')
-            axes[0].axvline(active_data.mean(), color='red', linestyle='--', linewidth=2, 
-                          label=f'平均: {active_data.mean():.2f}%')
-            axes[0].axvline(active_data.median(), color='green', linestyle='--', linewidth=2,
-                          label=f'中央値: {active_data.median():.2f}%')
-            axes[0].set_xlabel('3年年率リターン (%)', fontsize=12)
-            axes[0].set_ylabel('ファンド数', fontsize=12)
-            axes[0].set_title('アクティブファンド', fontsize=14)
-            axes[0].legend()
-            axes[0].grid(alpha=0.3)
-            
-            # パッシブの参照線を追加
-            if len(passive_data) > 0:
-                axes[0].axvline(passive_data.mean(), color='orange', linestyle=':', linewidth=2,
-                              label=f'パッシブ平均: {passive_data.mean():.2f}%')
-                axes[0].legend()
-            
-            # 比較ヒストグラム
-            axes[1].hist(active_data, bins=20, alpha=0.5, color='steelblue', 
-                        label=f'アクティブ (n={len(active_data)})', edgecolor='black')
-            if len(passive_data) > 0:
-                axes[1].hist(passive_data, bins=10, alpha=0.5, color='orange',
-                           label=f'パッシブ (n={len(passive_data)})', edgecolor='black')
-            axes[1].set_xlabel('3年年率リターン (%)', fontsize=12)
-            axes[1].set_ylabel('ファンド数', fontsize=12)
-            axes[1].set_title('アクティブ vs パッシブ', fontsize=14)
-            axes[1].legend()
-            axes[1].grid(alpha=0.3)
-            
-            plt.tight_layout()
-            filename = f"histogram_returns_hedge_{hedge_status}.png"
-            plt.savefig(self.output_dir / filename, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            print(f"✓ ヒストグラム保存（ヘッジ{hedge_status}）: {filename}")
+        for segment, active_funds, passive_funds in self._segments():
+            title = segment_title(segment)
+            active_data = active_funds['annualized_return_3y'] * 100
+            passive_data = passive_funds['annualized_return_3y'] * 100
+            
+            self.figure_jobs.append(FigureJob(
+                f"histogram_returns_{segment_name(segment)}.png", 'histogram',
+                {
+                    'active': active_data.to_numpy(),
+                    'passive': passive_data.to_numpy(),
+                    'active_mean': active_data.mean(),
+                    'active_median': active_data.median(),
+                    'passive_mean': passive_data.mean() if len(passive_data) > 0 else np.nan,
+                },
+                {
+                    'title': f'{self.period}年率リターン分布（{title}）',
+                    'label': f'ヒストグラム（{title}）',
+                    'xlabel': f'{self.period}年率リターン (%)',
+                    'figsize': (14, 5),
+                }
+            ))
         
         return self
     
@@ -137,52 +210,21 @@ class FundVisualization:
         print("箱ひげ図作成")
         print("=" * 80)
         
-        for hedge_status in ['なし', 'あり']:
-            # データ抽出
-            active_data = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'アクティブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]['annualized_return_3y'] * 100
-            
-            passive_data = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'パッシブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]['annualized_return_3y'] * 100
-            
-            if len(active_data) == 0:
-                print(f"  ⚠ アクティブファンドデータなし（ヘッジ{hedge_status}）")
-                continue
-            
-            # 箱ひげ図
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            data_to_plot = [active_data]
-            labels = ['アクティブ']
-            
-            if len(passive_data) > 0:
-                data_to_plot.append(passive_data)
-                labels.append('パッシブ')
-            
-            bp = ax.boxplot(data_to_plot, labels=labels, patch_artist=True,
-                           showmeans=True, meanline=True)
-            
-            # 色設定
-            colors = ['steelblue', 'orange']
-            for patch, color in zip(bp['boxes'], colors[:len(data_to_plot)]):
-                patch.set_facecolor(color)
-                patch.set_alpha(0.6)
-            
-            ax.set_ylabel('3年年率リターン (%)', fontsize=12)
-            ax.set_title(f'3年年率リターン分布（為替ヘッジ: {hedge_status}）', 
-                        fontsize=14, fontweight='bold')
-            ax.grid(axis='y', alpha=0.3)
-            
-            plt.tight_layout()
-            filename = f"boxplot_returns_hedge_{hedge_status}.png"
-            plt.savefig(self.output_dir / filename, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            print(f"✓ 箱ひげ図保存（ヘッジ{hedge_status}）: {filename}")
+        for segment, active_funds, passive_funds in self._segments():
+            title = segment_title(segment)
+            active_data = active_funds['annualized_return_3y'] * 100
+            passive_data = passive_funds['annualized_return_3y'] * 100
+            
+            self.figure_jobs.append(FigureJob(
+                f"boxplot_returns_{segment_name(segment)}.png", 'boxplot',
+                {'active': active_data.to_numpy(), 'passive': passive_data.to_numpy()},
+                {
+                    'title': f'{self.period}年率リターン分布（{title}）',
+                    'label': f'箱ひげ図（{title}）',
+                    'ylabel': f'{self.period}年率リターン (%)',
+                    'figsize': (10, 6),
+                }
+            ))
         
         return self
     
@@ -196,46 +238,30 @@ class FundVisualization:
         print("ローリング超過リターン推移グラフ作成")
         print("=" * 80)
         
-        for hedge_status in ['なし', 'あり']:
-            data = self.rolling_results[self.rolling_results['currency_hedge'] == hedge_status]
-            
-            if len(data) == 0:
-                print(f"  ⚠ データなし（ヘッジ{hedge_status}）")
-                continue
-            
-            fig, axes = plt.subplots(2, 1, figsize=(14, 10))
-            fig.suptitle(f'ローリング36か月超過リターン推移（為替ヘッジ: {hedge_status}）',
-                        fontsize=16, fontweight='bold')
-            
-            # 等金額平均
-            axes[0].plot(data['window_end'], data['excess_all_equal'] * 100,
-                        marker='o', label='アクティブ全体 vs パッシブ', linewidth=2)
-            axes[0].plot(data['window_end'], data['excess_top50_equal'] * 100,
-                        marker='s', label='アクティブ上位50% vs パッシブ', linewidth=2)
-            axes[0].axhline(0, color='black', linestyle='--', linewidth=1)
-            axes[0].set_ylabel('超過リターン (%, 等金額平均)', fontsize=12)
-            axes[0].set_title('等金額平均', fontsize=14)
-            axes[0].legend()
-            axes[0].grid(alpha=0.3)
-            
-            # AUM加重平均
-            axes[1].plot(data['window_end'], data['excess_all_aum'] * 100,
-                        marker='o', label='アクティブ全体 vs パッシブ', linewidth=2, color='C2')
-            axes[1].plot(data['window_end'], data['excess_top50_aum'] * 100,
-                        marker='s', label='アクティブ上位50% vs パッシブ', linewidth=2, color='C3')
-            axes[1].axhline(0, color='black', linestyle='--', linewidth=1)
-            axes[1].set_xlabel('ウィンドウ終了月', fontsize=12)
-            axes[1].set_ylabel('超過リターン (%, AUM加重平均)', fontsize=12)
-            axes[1].set_title('AUM加重平均', fontsize=14)
-            axes[1].legend()
-            axes[1].grid(alpha=0.3)
-            
-            plt.tight_layout()
-            filename = f"rolling_excess_returns_hedge_{hedge_status}.png"
-            plt.savefig(self.output_dir / filename, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            print(f"✓ ローリング超過リターン推移保存（ヘッジ{hedge_status}）: {filename}")
+        keys = list(self.segment_keys)
+        missing = [key for key in keys if key not in self.rolling_results.columns]
+        if missing:
+            print(f"  ⚠ ローリング分析結果にセグメントのキー列 {missing} がありません"
+                  f"（分析と同じ --segment-keys を指定してください）")
+            return self
+        
+        for group, data in self.rolling_results.groupby(keys, sort=False):
+            segment = dict(zip(keys, np.atleast_1d(group)))
+            title = segment_title(segment)
+            
+            self.figure_jobs.append(FigureJob(
+                f"rolling_excess_returns_{segment_name(segment)}.png", 'rolling',
+                {
+                    'window_end': data['window_end'].to_numpy(),
+                    **{column: (data[column] * 100).to_numpy()
+                       for column in ('excess_all_equal', 'excess_top50_equal', 'excess_all_aum', 'excess_top50_aum')}
+                },
+                {
+                    'title': f'ローリング{self.window_months}か月超過リターン推移（{title}）',
+                    'label': f'ローリング超過リターン推移（{title}）',
+                    'figsize': (14, 10),
+                }
+            ))
         
         return self
     
@@ -249,88 +275,110 @@ class FundVisualization:
         print("上位50%比較バーチャート作成")
         print("=" * 80)
         
-        summary_data = []
-        
-        for hedge_status in ['なし', 'あり']:
-            active_funds = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'アクティブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]
-            
-            passive_funds = self.annualized_returns[
-                (self.annualized_returns['fund_type'] == 'パッシブ') &
-                (self.annualized_returns['currency_hedge'] == hedge_status)
-            ]
-            
-            if len(active_funds) == 0 or len(passive_funds) == 0:
+        # セグメントごとのバーチャート（パッシブのないセグメントの枠は空のまま）
+        segments = self._segments()
+        panels = []
+        for idx, (segment, active_funds, passive_funds) in enumerate(segments):
+            if len(passive_funds) == 0:
                 continue
             
             # 上位50%
-            active_sorted = active_funds.sort_values('annualized_return_3y', ascending=False)
-            top_50_count = int(np.ceil(0.5 * len(active_sorted)))
-            top_50_funds = active_sorted.iloc[:top_50_count]
-            
-            summary_data.append({
-                'hedge': hedge_status,
-                'category': 'アクティブ全体',
-                'return': active_funds['annualized_return_3y'].mean() * 100
-            })
-            summary_data.append({
-                'hedge': hedge_status,
-                'category': 'アクティブ上位50%',
-                'return': top_50_funds['annualized_return_3y'].mean() * 100
-            })
-            summary_data.append({
-                'hedge': hedge_status,
-                'category': 'パッシブ',
-                'return': passive_funds['annualized_return_3y'].mean() * 100
+            ranked_active, _ = rank_active_funds(active_funds)
+            aggregated = aggregate_segment(ranked_active, passive_funds)
+            
+            panels.append({
+                'index': idx,
+                'title': segment_title(segment),
+                'categories': np.array(['アクティブ全体', 'アクティブ上位50%', 'パッシブ']),
+                'values': np.array([aggregated['active_all_mean_equal'], aggregated['active_top50_mean_equal'],
+                                    aggregated['passive_mean_equal']]) * 100,
             })
         
-        if len(summary_data) == 0:
+        if len(panels) == 0:
             print("  ⚠ 比較データなし")
             return self
         
-        summary_df = pd.DataFrame(summary_data)
+        self.figure_jobs.append(FigureJob(
+            "comparison_bar_chart.png", 'comparison',
+            {'n_panels': len(segments), 'panels': panels},
+            {
+                'title': f'{self.period}年率リターン比較',
+                'label': '比較バーチャート',
+                'ylabel': f'{self.period}年率リターン (%)',
+                'figsize': (max(14, 5 * len(segments)), 6),
+            }
+        ))
         
-        # バーチャート
-        fig, axes = plt.subplots(1, 2, figsize=(14, 6))
-        fig.suptitle('3年年率リターン比較', fontsize=16, fontweight='bold')
+        return self
+    
+    def render_figures(self):
+        """
+        描画待ちのジョブをまとめて描画・保存し、マニフェスト（figure_manifest.json）を書き出す
         
-        for idx, hedge_status in enumerate(['なし', 'あり']):
-            data = summary_df[summary_df['hedge'] == hedge_status]
-            
-            if len(data) == 0:
-                continue
-            
-            ax = axes[idx]
-            bars = ax.bar(data['category'], data['return'], 
-                         color=['steelblue', 'darkblue', 'orange'],
-                         alpha=0.7, edgecolor='black', linewidth=1.5)
-            
-            # 値ラベル
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                       f'{height:.2f}%',
-                       ha='center', va='bottom', fontsize=11, fontweight='bold')
-            
-            ax.set_ylabel('3年年率リターン (%)', fontsize=12)
-            ax.set_title(f'為替ヘッジ: {hedge_status}', fontsize=14)
-            ax.grid(axis='y', alpha=0.3)
-            ax.set_ylim(bottom=0)
+        workers が2以上の場合はプロセスプールで並列に描画します。
+        マニフェストはジョブの作成順のため、ワーカー数によらず同じ内容です。
+        use_cache の場合、前回から変更のない図は描画せず、キャッシュのヒット・ミスの件数を
+        マニフェストに記録します（final では前回の final 以降に変更した図だけが描画されます。
+        比較の基準は直前のプレビューではなく前回の final の出力です）。
+        描画した図ごとの時間と、時間のかかった図を表示します。
+        """
+        print("\n" + "=" * 80)
+        print(f"図の描画（{len(self.figure_jobs)} 枚、ワーカー {self.workers}、プロファイル {self.profile}）")
+        print("=" * 80)
         
-        plt.tight_layout()
-        filename = "comparison_bar_chart.png"
-        plt.savefig(self.output_dir / filename, dpi=300, bbox_inches='tight')
-        plt.close()
+        jobs, self.figure_jobs = self.figure_jobs, []
+        jobs = [apply_profile(job, self.profile, self.figure_format) for job in jobs]
+        previous = load_manifest(self.figure_dir) if self.use_cache else None
+        rendered = render_figures(jobs, self.figure_dir, self.workers, previous)
+        for job, entry in zip(jobs, rendered):
+            if entry['cached']:
+                print(f"✓ {job.spec['label']}は変更なし（キャッシュ）: {entry['filename']}")
+            else:
+                print(f"✓ {job.spec['label']}保存: {entry['filename']}（{entry['seconds']:.2f} 秒）")
+        stats = cache_stats(rendered)
+        print(f"  キャッシュ: ヒット {stats['hits']} 枚 / ミス {stats['misses']} 枚")
         
-        print(f"✓ 比較バーチャート保存: {filename}")
+        # 描画時間（ワーカーごとの時間の合計。並列の場合は経過時間より長くなる）
+        timed = [(entry['seconds'], job.spec['label']) for job, entry in zip(jobs, rendered) if not entry['cached']]
+        if timed:
+            slowest, label = max(timed)
+            print(f"  描画時間: 合計 {sum(seconds for seconds, _ in timed):.2f} 秒"
+                  f"（最長: {label} {slowest:.2f} 秒）")
+        
+        # 同じファイルを描画し直した場合は新しい行で置き換える
+        rendered_names = {entry['filename'] for entry in rendered}
+        self.manifest = [entry for entry in self.manifest if entry['filename'] not in rendered_names] + rendered
+        path = write_manifest(self.manifest, self.figure_dir)
+        print(f"✓ マニフェスト保存: {path.relative_to(self.output_dir)}")
         
         return self
 
 
-def main():
+def parse_args(argv=None):
+    """コマンドライン引数の解析"""
+    parser = argparse.ArgumentParser(description="分析結果の可視化")
+    parser.add_argument('--output-dir', default="../output", help="分析結果・図の出力ディレクトリ")
+    parser.add_argument('--window-months', type=int, default=36,
+                        help="分析期間・ローリングウィンドウ長（月数、デフォルト36。分析と同じ値）")
+    parser.add_argument('--segment-keys', nargs='+', default=list(DEFAULT_SEGMENT_KEYS),
+                        help="セグメントのキー列（分析と同じキー）")
+    parser.add_argument('--passive-keys', nargs='*', default=None,
+                        help="パッシブファンドを対応付けるキー列（--segment-keys の一部。省略時は同じキー）")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="図の描画のワーカープロセス数（2以上でプロセスプールによる並列描画）")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="前回から変更のない図も含めてすべて描画し直す")
+    parser.add_argument('--profile', choices=list(RENDER_PROFILES), default=DEFAULT_RENDER_PROFILE,
+                        help="描画プロファイル（preview: 低解像度・余白を詰めずに preview/ へ、"
+                             "final: 300dpi。final では前回の final から変更のあった図だけを描画）")
+    parser.add_argument('--format', dest='figure_format', choices=FIGURE_FORMATS, default=None,
+                        help="出力形式（省略時は PNG）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """メイン実行関数"""
+    args = parse_args(argv)
     
     print("\n")
     print("=" * 80)
@@ -338,13 +386,17 @@ def main():
     print("=" * 80)
     
     try:
-        viz = FundVisualization()
+        viz = FundVisualization(output_dir=args.output_dir, workers=args.workers,
+                               use_cache=not args.no_cache, profile=args.profile,
+                               figure_format=args.figure_format, window_months=args.window_months,
+                               segment_keys=args.segment_keys, passive_keys=args.passive_keys)
         
         viz.load_results() \
            .plot_return_distribution_histogram() \
            .plot_boxplot() \
            .plot_rolling_excess_returns() \
-           .plot_top50_comparison()
+           .plot_top50_comparison() \
+           .render_figures()
         
         print("\n" + "=" * 80)
         print("可視化完了")
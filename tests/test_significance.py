@@ -0,0 +1,33 @@
+"""
+2標本検定カーネル（funds_core.significance）と scipy.stats の一致の確認
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy import stats
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from funds_core import two_sample_tests  # noqa: E402
+
+
+@pytest.mark.parametrize('x, y', [
+    ([0.05, 0.08, 0.02, 0.11, 0.07], [0.06]),   # パッシブが1本（ヘッジ区分ごとに1本のテンプレート構成）
+    ([0.06], [0.05, 0.08, 0.02, 0.11, 0.07]),
+    ([0.05, 0.08, 0.02, 0.11, 0.07], [0.06, 0.04, 0.09]),
+])
+def test_student_t_matches_scipy(x, y):
+    result = two_sample_tests(np.array([x]), np.array([y]))
+    expected = stats.ttest_ind(x, y)
+    assert result.t_student[0] == pytest.approx(expected.statistic, rel=1e-12)
+    assert result.p_student[0] == pytest.approx(expected.pvalue, rel=1e-12)
+    assert np.isfinite(result.cohens_d[0])
+
+
+def test_welch_undefined_for_single_value():
+    result = two_sample_tests(np.array([[0.05, 0.08, 0.02, 0.11, 0.07]]), np.array([[0.06]]))
+    assert np.isnan(result.t_welch[0])
+    assert np.isnan(result.p_welch[0])